@@ -27,6 +27,10 @@ class GolbeSetting(object):
     }
 exadmin.site.register(views.CommAdminView, GolbeSetting)
 
+class FormSetting(object):
+    form_class_cache = True
+exadmin.site.register(views.ModelFormAdminView, FormSetting)
+
 class MaintainInline(object):
     model = MaintainLog
     extra = 1
@@ -143,7 +147,9 @@ class AccessRecordAdmin(object):
     refresh_times = (3, 5, 10)
     data_charts = {
         "user_count": {'title': u"User Report", "x-field": "date", "y-field": ("user_count", "view_count"), "order": ('date',)},
-        "avg_count": {'title': u"Avg Report", "x-field": "date", "y-field": ('avg_count',), "order": ('date',)}
+        "avg_count": {'title': u"Avg Report", "x-field": "date", "y-field": ('avg_count',), "order": ('date',)},
+        "month_count": {'title': u"Monthly Report", "x-field": "date", "y-field": ("user_count", "view_count"),
+            "aggregate": "sum", "x-bucket": "month"},
     }
 
 exadmin.site.register(Host, HostAdmin)
@@ -29,4 +29,40 @@ class Side(layout.Column):
     css_class = "column form-column sidebar span3"
 
 class Container(layout.Div):
-    css_class = "form-container row-fluid"
\ No newline at end of file
+    css_class = "form-container row-fluid"
+
+def _copy_object(layout):
+    # copy.copy looks up __setstate__ on the new object, which recurses in the
+    # __getattr__ of layout objects until it fails, so copy the instance dict
+    obj = layout.__class__.__new__(layout.__class__)
+    obj.__dict__.update(layout.__dict__)
+    return obj
+
+def freeze_layout(layout):
+    """
+    Compile ``layout`` to a render plan. The plan is a copy of the layout objects with
+    tuples of fields, so it can be shared by requests and is never changed.
+    """
+    if isinstance(layout, (list, tuple)):
+        return tuple([freeze_layout(f) for f in layout])
+    if not hasattr(layout, 'fields'):
+        return layout
+    plan = _copy_object(layout)
+    plan.fields = tuple([freeze_layout(f) for f in layout.fields])
+    return plan
+
+def copy_layout(layout):
+    """
+    Returns a working layout of a plan or a layout. Only the layout objects and their
+    ``fields`` and ``attrs`` are copied, field names and other values are shared, so
+    the changes of request (wrap or replace fields, append fieldsets) stay in the copy.
+    """
+    if isinstance(layout, (list, tuple)):
+        return type(layout)([copy_layout(f) for f in layout])
+    if not hasattr(layout, 'fields'):
+        return layout
+    obj = _copy_object(layout)
+    obj.fields = [copy_layout(f) for f in layout.fields]
+    if isinstance(getattr(layout, 'attrs', None), dict):
+        obj.attrs = layout.attrs.copy()
+    return obj
@@ -0,0 +1,30 @@
+import time
+from optparse import make_option
+
+from django.core.management.base import NoArgsCommand
+
+from exadmin.plugins.export import get_export_jobs, reclaim_export_jobs, clean_export_jobs, run_export_job
+
+
+class Command(NoArgsCommand):
+    help = "Run the pending export jobs of admin lists, for the lists with export_job = 'command'."
+
+    option_list = NoArgsCommand.option_list + (
+        make_option('--loop', action='store_true', dest='loop', default=False,
+            help='Keep waiting for new jobs instead of exiting when no job is pending.'),
+        make_option('--interval', type='int', dest='interval', default=5,
+            help='Seconds to wait between checks of pending jobs with --loop.'),
+    )
+
+    def handle_noargs(self, **options):
+        while True:
+            # Jobs of crashed workers are pending again, and expired files are deleted
+            reclaim_export_jobs()
+            clean_export_jobs()
+            jobs = list(get_export_jobs('pending').values_list('pk', flat=True))
+            for pk in jobs:
+                if run_export_job(pk) and int(options.get('verbosity', 1)) > 0:
+                    self.stdout.write('Export job %s finished.\n' % pk)
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
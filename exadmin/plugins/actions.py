@@ -22,6 +22,7 @@ def action_checkbox(obj):
     return checkbox.render(ACTION_CHECKBOX_NAME, force_unicode(obj.pk))
 action_checkbox.short_description = mark_safe('<input type="checkbox" id="action-toggle" />')
 action_checkbox.allow_tags = True
+action_checkbox.field_depends = ()
 
 class BaseActionView(ModelAdminView):
     action_name = None
@@ -143,7 +144,7 @@ class ActionPlugin(BaseAdminPlugin):
 
             new_context = {
                 'selection_note': _('0 of %(cnt)s selected') % {'cnt': len(av.result_list)},
-                'selection_note_all': selection_note_all % {'total_count': av.result_count},
+                'selection_note_all': selection_note_all % {'total_count': av.result_count_label},
                 'action_choices': self.get_action_choices(),
                 'actions_selection_counter': self.actions_selection_counter,
             }
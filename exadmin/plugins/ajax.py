@@ -31,7 +31,8 @@ class AjaxListPlugin(BaseAjaxPlugin):
             enumerate(filter(lambda c:c.field_name in base_fields, r.cells))]) \
             for r in av.results()]
 
-        return self.render_response({'headers': headers, 'objects': objects, 'total_count': av.result_count, 'has_more': av.has_more})
+        return self.render_response({'headers': headers, 'objects': objects, 'total_count': av.result_count, \
+            'total_count_label': unicode(av.result_count_label), 'has_more': av.has_more})
 
 class JsonErrorDict(forms.util.ErrorDict):
 
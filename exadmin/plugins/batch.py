@@ -39,7 +39,7 @@ class BatchChangeAction(BaseActionView):
             "formfield_callback": edit_view.formfield_for_dbfield,    # 设置生成表单字段的回调函数
         }
         # 使用 modelform_factory 生成 Form 类
-        return modelform_factory(self.model, **defaults)
+        return edit_view.get_form_class(modelform_factory, self.model, **defaults)
 
     def do_action(self, queryset):
         if not self.has_change_permission():
@@ -12,7 +12,7 @@ from django.http import QueryDict
 from exadmin.sites import site
 from exadmin.views import ModelAdminView, BaseAdminPlugin, ListAdminView
 from exadmin.views.list import COL_LIST_VAR, ORDER_VAR
-from exadmin.views.dashboard import widget_manager, BaseWidget, PartialBaseWidget
+from exadmin.views.dashboard import widget_manager, BaseWidget, PartialListWidget
 from exadmin.filters import FILTER_PREFIX, SEARCH_VAR
 from exadmin.plugins.relate import RELATE_PREFIX
 
@@ -25,6 +25,8 @@ class BookmarkPlugin(BaseAdminPlugin):
     # [{'title': "Female", 'query': {'gender': True}, 'order': ('-age'), 'cols': ('first_name', 'age', 'phones'), 'search': 'Tom'}]
     list_bookmarks = []
     show_bookmarks = True
+    active_methods = ('get',)
+    active_attrs = ('show_bookmarks',)
 
     def get_context(self, context):
         if not self.show_bookmarks:
@@ -119,7 +121,7 @@ class BookmarkAdmin(object):
         return Bookmark.objects.filter(user=self.user)
         
 @widget_manager.register
-class BookmarkWidget(PartialBaseWidget):
+class BookmarkWidget(PartialListWidget):
     widget_type = 'bookmark'
     description = 'Bookmark Widget, can show user\'s bookmark list data in widget.'
     template = "admin/widgets/list.html"
@@ -137,25 +139,13 @@ class BookmarkWidget(PartialBaseWidget):
         if not self.title:
             self.title = unicode(bookmark)
 
-        req = self.make_get_request("", data.items())
-        self.list_view = self.get_view_class(ListAdminView, model, list_per_page=10, list_editable=[])(req)
+        self.list_view = self.get_list_view(model, data.items())
 
     def has_perm(self):
         return True
 
     def context(self, context):
-        list_view = self.list_view
-        list_view.make_result_list()
-
-        base_fields = list_view.base_list_display
-        if len(base_fields) > 5:
-            base_fields = base_fields[0:5]
-
-        context['result_headers'] = [c for c in list_view.result_headers().cells if c.field_name in base_fields]
-        context['results'] = [[o for i,o in \
-            enumerate(filter(lambda c:c.field_name in base_fields, r.cells))] \
-            for r in list_view.results()]
-        context['result_count'] = list_view.result_count
+        super(BookmarkWidget, self).context(context)
         context['page_url'] = self.bookmark.url
 
 site.register(Bookmark, BookmarkAdmin)
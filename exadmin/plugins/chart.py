@@ -1,5 +1,6 @@
 
 import datetime, decimal, calendar
+import hashlib
 
 from django import forms
 from django.template import loader
@@ -8,15 +9,119 @@ from django.core.serializers.json import DjangoJSONEncoder
 from django.http import HttpResponse
 from django.utils import simplejson
 from django.utils.encoding import smart_unicode
-from django.db import models
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, models
+from django.db.models.sql.datastructures import EmptyResultSet
+from django.db.backends.util import typecast_timestamp
 from django.utils.http import urlencode
+from django.utils import timezone
 from django.utils.translation import ugettext as _
 
 from exadmin.sites import site
-from exadmin.views import BaseAdminPlugin, ListAdminView
+from exadmin.views import BaseAdminPlugin, ListAdminView, filter_hook
 from exadmin.views.dashboard import ModelBaseWidget, widget_manager
 from exadmin.util import lookup_field, label_for_field
 
+# Aggregations of y fields in data_charts
+CHART_AGGREGATES = {'sum': models.Sum, 'avg': models.Avg, 'count': models.Count, 'min': models.Min, 'max': models.Max}
+# Buckets of date x field, weeks are merged from days as databases do not truncate to week
+CHART_BUCKETS = ('day', 'week', 'month', 'year')
+# Sql of shifting a datetime column by seconds, for the backends without time zones
+CHART_OFFSET_SQL = {'postgresql': "(%s + INTERVAL '%d seconds')", 'mysql': "(%s + INTERVAL %d SECOND)",
+    'sqlite': "datetime(%s, '%+d seconds')", 'oracle': "(%s + %d / 86400)"}
+# Params of the x range of chart viewport, in the units of flot axis (ms for time axis)
+CHART_X_FROM = '_x_from'
+CHART_X_TO = '_x_to'
+
+def _to_number(value):
+    if isinstance(value, datetime.datetime):
+        return calendar.timegm(value.timetuple()) * 1000 + value.microsecond / 1000
+    if isinstance(value, datetime.date):
+        return calendar.timegm(value.timetuple()) * 1000
+    if isinstance(value, datetime.time):
+        return ((value.hour * 60 + value.minute) * 60 + value.second) * 1000 + value.microsecond / 1000
+    return float(value)
+
+def lttb(points, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling of (x, y) points sorted by x. The first
+    and last points are kept, and from each bucket between them the point making the
+    largest triangle with the point kept before and the average of next bucket.
+    """
+    if threshold >= len(points) or threshold < 3:
+        return points
+    values = [(_to_number(x), float(y)) for x, y in points]
+    sampled = [points[0]]
+    every = (len(points) - 2) / float(threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start, end = int(i * every) + 1, int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, len(points))
+        next_bucket = values[end:next_end] or values[-1:]
+        avg_x = sum([v[0] for v in next_bucket]) / len(next_bucket)
+        avg_y = sum([v[1] for v in next_bucket]) / len(next_bucket)
+
+        ax, ay = values[a]
+        max_area, max_index = -1, start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (values[j][1] - ay) - (ax - values[j][0]) * (avg_y - ay))
+            if area > max_area:
+                max_area, max_index = area, j
+        sampled.append(points[max_index])
+        a = max_index
+    sampled.append(points[-1])
+    return sampled
+
+def minmax(points, threshold):
+    """
+    Envelope downsampling of (x, y) points sorted by x, keeps the lowest and highest
+    points of each of ``threshold / 2`` buckets in x order.
+    """
+    if threshold >= len(points) or threshold < 2:
+        return points
+    buckets = threshold / 2
+    every = len(points) / float(buckets)
+    sampled = []
+    for i in range(buckets):
+        bucket = points[int(i * every):int((i + 1) * every)]
+        if not bucket:
+            continue
+        low, high = bucket.index(min(bucket, key=lambda p: p[1])), bucket.index(max(bucket, key=lambda p: p[1]))
+        sampled.extend([bucket[k] for k in sorted(set([low, high]))])
+    return sampled
+
+CHART_DOWNSAMPLES = {'lttb': lttb, 'minmax': minmax}
+
+def get_offset_changes(tz, start, end):
+    """
+    Returns the UTC offsets of ``tz`` from naive UTC ``start`` to ``end``, as a list of
+    (naive UTC time the offset starts, offset in seconds) sorted by time. The first
+    offset starts at None. Offsets are compared day by day, and the time of a change
+    is found by bisection to the second.
+    """
+    def offset_at(t):
+        offset = timezone.localtime(timezone.make_aware(t, timezone.utc), tz).utcoffset()
+        return offset.days * 86400 + offset.seconds
+
+    changes = [(None, offset_at(start))]
+    t = start.replace(microsecond=0)
+    while t < end:
+        offset = offset_at(t + datetime.timedelta(days=1))
+        if offset != changes[-1][1]:
+            low, high = 0, 86400
+            while high - low > 1:
+                middle = (low + high) / 2
+                if offset_at(t + datetime.timedelta(seconds=middle)) == offset:
+                    high = middle
+                else:
+                    low = middle
+            changes.append((t + datetime.timedelta(seconds=high), offset))
+        t += datetime.timedelta(days=1)
+    return changes
+
+CHART_CACHE_KEY = 'exadmin_chart_%s'
+
 @widget_manager.register
 class ChartWidget(ModelBaseWidget):
     widget_type = 'chart'
@@ -68,6 +173,9 @@ class ChartWidget(ModelBaseWidget):
 
 class JSONEncoder(DjangoJSONEncoder):
     def default(self, o):
+        # Time axis shows the local time, as the time values of list
+        if isinstance(o, datetime.datetime) and timezone.is_aware(o):
+            o = timezone.localtime(o)
         if isinstance(o, (datetime.date, datetime.datetime)):
             return calendar.timegm(o.timetuple()) * 1000
         elif isinstance(o, decimal.Decimal):
@@ -81,6 +189,8 @@ class JSONEncoder(DjangoJSONEncoder):
 class ChartsPlugin(BaseAdminPlugin):
 
     data_charts = {}
+    active_methods = ('get',)
+    active_attrs = ('data_charts',)
 
     def get_chart_url(self, name, v):
         return self.admin_view.model_admin_url('chart', name) + self.admin_view.get_query_string()
@@ -103,8 +213,33 @@ class ChartsPlugin(BaseAdminPlugin):
             nodes.append(loader.render_to_string('admin/blocks/charts.html', context_instance=context))
 
 class ChartsView(ListAdminView):
+    """
+    Json data of a chart in ``data_charts``. A chart shows the values of its 'y-field'
+    for the 'x-field' of the rows in current list page, or if it has 'aggregate'
+    ('sum', 'avg', 'count', 'min', 'max', or a dict of them by y field), the values
+    aggregated by the database over the whole filtered list, grouped by the x field
+    value, or by the 'x-bucket' ('day', 'week', 'month' or 'year') of a date x field.
+    Buckets of datetimes are in the current time zone.
+
+    A chart with 'max-points' shows the points of the whole filtered list instead of
+    the page. Series longer than it (or ``chart_max_points`` for bucket charts) are
+    downsampled by 'downsample' ('lttb' or 'minmax'). These charts are zoomable, the
+    viewport range is passed by the ``_x_from`` and ``_x_to`` params, and only the
+    rows in it are read.
+
+    Series are cached for ``chart_cache_timeout`` seconds (or the 'cache-timeout' of
+    chart), before they are downsampled. A bucket or 'max-points' chart with 'incremental' and a date or time x
+    field, whose rows are only added with increasing x, is refreshed on cache hits
+    by reading the rows from the last cached x (the last bucket) and merging them
+    into the cached series.
+    """
 
     data_charts = {}
+    # Points of a series of bucket charts, more are downsampled
+    chart_max_points = 1000
+    # Seconds to cache chart series, 0 for no cache. Cache is not expired by changes
+    # of rows, incremental charts only read the new rows.
+    chart_cache_timeout = 0
 
     def get_ordering(self):
         if self.chart.has_key('order'):
@@ -122,21 +257,45 @@ class ChartsView(ListAdminView):
         y_fields = self.chart['y-field']
         self.y_fields = (y_fields,) if type(y_fields) not in (list, tuple) else y_fields
 
-        datas = [{"data":[], "label": label_for_field(i, self.model, model_admin=self)} for i in self.y_fields]
-
-        self.make_result_list()
-        
-        for obj in self.result_list:
-            xf, attrs, value = lookup_field(self.x_field, obj, self)
-            for i, yfname in enumerate(self.y_fields):
-                yf, yattrs, yv = lookup_field(yfname, obj, self)
-                datas[i]["data"].append((value, yv))
+        self.x_range = self.get_x_range()
+        self.since = None
+        max_points = self.chart.get('max-points')
+        zoomable = bool(max_points or self.chart.get('aggregate') and self.chart.get('x-bucket'))
+
+        timeout = self.chart.get('cache-timeout', self.chart_cache_timeout)
+        cache_key = timeout and self.get_chart_cache_key(name)
+        cached = cache_key and cache.get(cache_key)
+        if cached:
+            datas, option = cached
+            # Write back only new points, the cache expires in timeout after the miss
+            changed = zoomable and self.chart.get('incremental') and not self.x_range and \
+                self.append_chart_datas(datas)
+        else:
+            datas, option = self.get_chart_datas()
+            changed = True
+
+        # The series are cached as they are read, and downsampled for each response, so
+        # the rows merged by incremental charts are not sampled from sampled points.
+        if cache_key and changed:
+            cache.set(cache_key, (datas, option), timeout)
+
+        downsample = CHART_DOWNSAMPLES.get(self.chart.get('downsample', 'lttb'))
+        if zoomable and downsample:
+            sampled = []
+            for data in datas:
+                points = [p for p in data['data'] if p[0] is not None and p[1] is not None]
+                if len(points) > (max_points or self.chart_max_points):
+                    points = downsample(points, max_points or self.chart_max_points)
+                sampled.append(dict(data, data=points))
+        else:
+            sampled = datas
+        datas, option = sampled, dict(option)
 
-        option = {'series': {'lines': { 'show': True }, 'points': { 'show': False }},
-                'grid': { 'hoverable': True, 'clickable': True }}
+        option = dict({'series': {'lines': { 'show': True }, 'points': { 'show': False }},
+                'grid': { 'hoverable': True, 'clickable': True }}, **option)
         try:
             xfield = self.opts.get_field(self.x_field)
-            if type(xfield) in (models.DateTimeField, models.DateField, models.TimeField):
+            if 'xaxis' not in option and type(xfield) in (models.DateTimeField, models.DateField, models.TimeField):
                 option['xaxis'] = { 'mode': "time", 'tickLength': 5}
                 if type(xfield) is models.DateField:
                     option['xaxis']['timeformat'] = "%y/%m/%d";
@@ -149,11 +308,280 @@ class ChartsView(ListAdminView):
             
         option.update(self.chart.get('option', {}))
 
-        content = {'data': datas, 'option': option}
+        content = {'data': datas, 'option': option, 'zoomable': zoomable}
         json = simplejson.dumps(content, cls=JSONEncoder, ensure_ascii=False)
 
         return HttpResponse(json)
 
+    def get_chart_datas(self):
+        """
+        Returns the series of chart and the options made with them.
+        """
+        datas = [{"data":[], "label": label_for_field(i, self.model, model_admin=self)} for i in self.y_fields]
+        option = {}
+
+        if self.chart.get('aggregate'):
+            self.get_aggregate_datas(datas, option)
+        elif self.chart.get('max-points'):
+            self.get_point_datas(datas)
+        else:
+            self.make_result_list()
+
+            for obj in self.result_list:
+                xf, attrs, value = lookup_field(self.x_field, obj, self)
+                for i, yfname in enumerate(self.y_fields):
+                    yf, yattrs, yv = lookup_field(yfname, obj, self)
+                    datas[i]["data"].append((value, yv))
+        return datas, option
+
+    def append_chart_datas(self, datas):
+        """
+        Merge the rows from the last x of cached series into them. Buckets are read
+        again from the last bucket, which may have got new rows, points are read
+        after the last point. Returns True if the series are changed.
+        """
+        try:
+            field = self.opts.get_field(self.x_field)
+        except models.FieldDoesNotExist:
+            return False
+        last_x = max([d['data'][-1][0] for d in datas if d['data']] or [None])
+        if last_x is None or not isinstance(field, (models.DateField, models.TimeField)):
+            return False
+
+        since = last_x
+        if settings.USE_TZ and isinstance(since, datetime.datetime) and timezone.is_naive(since):
+            # Values of the backends without time zone support are in UTC
+            since = timezone.make_aware(since, timezone.utc)
+        bucket = self.chart.get('aggregate') and self.chart.get('x-bucket')
+        self.since = (since, bool(bucket))
+        new_datas, option = self.get_chart_datas()
+        changed = False
+        for data, new_data in zip(datas, new_datas):
+            points = data['data']
+            if bucket:
+                points = [p for p in points if p[0] < last_x]
+            points = points + list(new_data['data'])
+            if points != data['data']:
+                data['data'], changed = points, True
+        return changed
+
+    @filter_hook
+    def get_chart_cache_key(self, name):
+        """
+        Key of the cached series, made of the model, chart name, the sorted params and
+        the sql of ``queryset()`` which is the rows scope of user.
+        """
+        base_queryset = self.queryset()
+        try:
+            scope = base_queryset.query.get_compiler(base_queryset.db).as_sql()
+        except EmptyResultSet:
+            scope = None
+        params = sorted([(k, v) for k, v in self.request.GET.items() if v != ''])
+        key = (self.opts.app_label, self.opts.module_name, name, params, scope)
+        return CHART_CACHE_KEY % hashlib.md5(repr(key)).hexdigest()
+
+    def get_x_range(self):
+        """
+        Returns the (from, to) values of x field of the viewport range params, in the
+        python type of field. None if no range.
+        """
+        try:
+            x_range = [float(self.request.GET[CHART_X_FROM]), float(self.request.GET[CHART_X_TO])]
+        except (KeyError, ValueError):
+            return None
+        try:
+            field = self.opts.get_field(self.x_field)
+        except models.FieldDoesNotExist:
+            return None
+        if isinstance(field, (models.DateField, models.TimeField)):
+            values = [datetime.datetime.utcfromtimestamp(v / 1000) for v in x_range]
+            if isinstance(field, models.DateTimeField):
+                if settings.USE_TZ:
+                    values = [timezone.make_aware(v, timezone.get_current_timezone()) for v in values]
+            elif isinstance(field, models.DateField):
+                values = [v.date() for v in values]
+            else:
+                values = [v.time() for v in values]
+            return values
+        return x_range
+
+    def get_chart_queryset(self):
+        self.base_queryset = self.queryset()
+        queryset = self.list_queryset = self.get_list_queryset()
+        if self.x_range:
+            queryset = queryset.filter(**{'%s__gte' % self.x_field: self.x_range[0], \
+                '%s__lte' % self.x_field: self.x_range[1]})
+        if self.since:
+            since, inclusive = self.since
+            queryset = queryset.filter(**{'%s__%s' % (self.x_field, inclusive and 'gte' or 'gt'): since})
+        return queryset
+
+    def get_point_datas(self, datas):
+        """
+        Points of the whole filtered list, by values of the fields when columns are
+        model fields.
+        """
+        queryset = self.get_chart_queryset().order_by(self.x_field)
+        fields = (self.x_field,) + tuple(self.y_fields)
+        try:
+            for f in fields:
+                if '__' not in f:
+                    self.opts.get_field(f)
+        except models.FieldDoesNotExist:
+            rows = ([lookup_field(f, obj, self)[2] for f in fields] for obj in queryset.iterator())
+        else:
+            rows = queryset.values_list(*fields).iterator()
+
+        for row in rows:
+            for i, data in enumerate(datas):
+                data['data'].append((row[0], row[i + 1]))
+
+    @filter_hook
+    def get_aggregate_queryset(self, bucket):
+        """
+        Returns the values queryset of the chart, one row of aggregated y fields for
+        each x value or bucket, made by a single GROUP BY query of the filtered list.
+        """
+        aggregate = self.chart['aggregate']
+        aggregates = {}
+        for i, yfname in enumerate(self.y_fields):
+            func = isinstance(aggregate, dict) and aggregate.get(yfname, 'sum') or aggregate
+            aggregates['_y%d' % i] = CHART_AGGREGATES[func](yfname)
+            if bucket == 'week' and func == 'avg':
+                # Days are merged into weeks, averages are weighted by the count of
+                # values they are made of
+                aggregates['_n%d' % i] = models.Count(yfname)
+
+        queryset = self.get_chart_queryset().order_by()
+        if bucket:
+            column, params = self.get_local_column_sql(self.opts.get_field(self.x_field), queryset)
+            x_sql = connection.ops.date_trunc_sql(bucket == 'week' and 'day' or bucket, column)
+            queryset = queryset.extra(select={'_x': x_sql}, select_params=params).values('_x')
+        else:
+            queryset = queryset.values(self.x_field)
+        return queryset.annotate(**aggregates).order_by(bucket and '_x' or self.x_field)
+
+    def get_local_column_sql(self, field, queryset):
+        """
+        Returns the sql and params of the x field column in the current time zone, so
+        the buckets start at local midnight. Datetimes are stored in UTC with USE_TZ.
+        Backends without the named time zone shift each row by the offset of its time,
+        the offset changes in the x range of rows are made into a CASE of the sql.
+        """
+        qn = connection.ops.quote_name
+        column = '%s.%s' % (qn(self.opts.db_table), qn(field.column))
+        if not settings.USE_TZ or not isinstance(field, models.DateTimeField):
+            return column, []
+
+        tz = timezone.get_current_timezone()
+        if connection.vendor == 'postgresql' and hasattr(tz, 'zone'):
+            return '(%s AT TIME ZONE %%s)' % column, [tz.zone]
+        if connection.vendor == 'sqlite' and \
+                timezone.get_current_timezone_name() == timezone.get_default_timezone_name():
+            # The time zone of process is TIME_ZONE
+            return "datetime(%s, 'localtime')" % column, []
+
+        shift_sql = CHART_OFFSET_SQL.get(connection.vendor, '%s')
+        if self.x_range:
+            x_range = self.x_range
+        else:
+            x_range = queryset.aggregate(_min=models.Min(self.x_field), _max=models.Max(self.x_field))
+            x_range = (x_range['_min'], x_range['_max'])
+        if None in x_range:
+            return column, []
+        changes = get_offset_changes(tz, *[timezone.is_aware(x) and timezone.make_naive(x, timezone.utc) or x \
+            for x in x_range])
+
+        sql = shift_sql % (column, changes[-1][1])
+        if len(changes) > 1:
+            sql = 'CASE %s ELSE %s END' % (' '.join(['WHEN %s < %%s THEN %s' % (column, shift_sql % (column, offset)) \
+                for since, offset in changes[:-1]]), sql)
+        return sql, [connection.ops.value_to_db_datetime(since) for since, offset in changes[1:]]
+
+    def get_aggregate_datas(self, datas, option):
+        bucket = self.chart.get('x-bucket')
+        if bucket is not None and bucket not in CHART_BUCKETS:
+            raise ValueError('Unknown x-bucket of chart: %s' % bucket)
+        rows = list(self.get_aggregate_queryset(bucket))
+        x_key = bucket and '_x' or self.x_field
+
+        def to_number(value):
+            return isinstance(value, decimal.Decimal) and float(value) or value
+
+        if bucket:
+            is_date = not isinstance(self.opts.get_field(self.x_field), models.DateTimeField)
+            for row in rows:
+                x = row[x_key]
+                # Some backends (sqlite) return the truncated dates as strings
+                if isinstance(x, basestring):
+                    x = typecast_timestamp(x)
+                if is_date and isinstance(x, datetime.datetime):
+                    x = x.date()
+                elif isinstance(x, datetime.datetime):
+                    # The value is local time, whatever time zone the backend gives it
+                    x = x.replace(tzinfo=None)
+                row[x_key] = x
+            if bucket == 'week':
+                rows = self.merge_week_rows(rows)
+            if not is_date and settings.USE_TZ:
+                tz = timezone.get_current_timezone()
+                for row in rows:
+                    if row[x_key] is not None:
+                        row[x_key] = timezone.make_aware(row[x_key], tz)
+        else:
+            # Category x values are shown as ticks
+            labels = self.get_category_labels([row[x_key] for row in rows])
+            option['xaxis'] = {'ticks': [(i, label) for i, label in enumerate(labels)]}
+            for i, row in enumerate(rows):
+                row[x_key] = i
+
+        for i, data in enumerate(datas):
+            data['data'] = [(row[x_key], to_number(row['_y%d' % i])) for row in rows]
+
+    def get_category_labels(self, values):
+        """
+        Returns the labels of category x values, the display of choices, or the objects
+        of a relation loaded by one query.
+        """
+        try:
+            field = self.opts.get_field(self.x_field)
+        except models.FieldDoesNotExist:
+            field = None
+        if field is not None and field.flatchoices:
+            choices = dict(field.flatchoices)
+            return [smart_unicode(choices.get(value, value)) for value in values]
+        if field is not None and isinstance(field.rel, models.ManyToOneRel):
+            objs = field.rel.to._default_manager.in_bulk([value for value in values if value is not None])
+            return [smart_unicode(objs.get(value, value)) for value in values]
+        return [smart_unicode(value) for value in values]
+
+    def merge_week_rows(self, rows):
+        aggregate = self.chart['aggregate']
+        weeks = []
+        for row in rows:
+            week = row['_x'] - datetime.timedelta(days=row['_x'].weekday())
+            if not weeks or weeks[-1]['_x'] != week:
+                weeks.append(dict(row, _x=week))
+                continue
+            merged = weeks[-1]
+            for i, yfname in enumerate(self.y_fields):
+                func = isinstance(aggregate, dict) and aggregate.get(yfname, 'sum') or aggregate
+                key, a, b = '_y%d' % i, merged['_y%d' % i], row['_y%d' % i]
+                if a is None or b is None:
+                    merged[key] = a if b is None else b
+                elif func in ('sum', 'count'):
+                    merged[key] = a + b
+                elif func == 'min':
+                    merged[key] = min(a, b)
+                elif func == 'max':
+                    merged[key] = max(a, b)
+                else:
+                    n = '_n%d' % i
+                    merged[key] = (a * merged[n] + b * row[n]) / float(merged[n] + row[n])
+                if func == 'avg':
+                    merged['_n%d' % i] += row['_n%d' % i]
+        return weeks
+
 site.register_plugin(ChartsPlugin, ListAdminView)
 site.register_modelview(r'^chart/(.+)/$', ChartsView, name='%s_%s_chart')
 
@@ -1,10 +1,10 @@
 
 
 from django.utils.translation import ugettext as _
-from django.core.urlresolvers import reverse
 from django.db import models
 
 from exadmin.sites import site
+from exadmin.util import quote
 from exadmin.views import BaseAdminPlugin, ListAdminView
 
 class DetailsPlugin(BaseAdminPlugin):
@@ -18,11 +18,11 @@ class DetailsPlugin(BaseAdminPlugin):
             rel_obj = getattr(obj, field_name)
             if rel_obj and self.has_model_perm(rel_obj.__class__, 'view'):
                 opts = rel_obj._meta
-                item_res_uri = reverse('%s:%s_%s_detail' % (self.admin_site.app_name, opts.app_label, opts.module_name), \
-                        args=(getattr(rel_obj, opts.pk.attname),))
+                item_res_uri = self.admin_site.reverse('%s:%s_%s_detail' % (self.admin_site.app_name, \
+                        opts.app_label, opts.module_name), quote(getattr(rel_obj, opts.pk.attname)))
                 if item_res_uri:
-                    edit_url = reverse('%s:%s_%s_change' % (self.admin_site.app_name, opts.app_label, opts.module_name), \
-                        args=(getattr(rel_obj, opts.pk.attname),))
+                    edit_url = self.admin_site.reverse('%s:%s_%s_change' % (self.admin_site.app_name, \
+                        opts.app_label, opts.module_name), quote(getattr(rel_obj, opts.pk.attname)))
                     item.btns.append('<a data-res-uri="%s" data-edit-uri="%s" class="details-handler" rel="tooltip" title="%s"><i class="icon-info-sign"></i></a>' \
                         % (item_res_uri, edit_url, _(u'Details of %s' % str(rel_obj))))
         return item
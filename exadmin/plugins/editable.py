@@ -10,7 +10,7 @@ from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext as _
 from exadmin.plugins.ajax import JsonErrorDict
 from exadmin.sites import site
-from exadmin.util import lookup_field, display_for_field, label_for_field, unquote, boolean_icon
+from exadmin.util import lookup_field, display_for_field, label_for_field, quote, unquote, boolean_icon
 from exadmin.views import BaseAdminPlugin, ModelFormAdminView, ListAdminView
 from exadmin.views.base import csrf_protect_m, filter_hook
 from exadmin.views.edit import ModelFormAdminUtil
@@ -20,6 +20,8 @@ from exadmin.views.list import EMPTY_CHANGELIST_VALUE
 class EditablePlugin(BaseAdminPlugin):
 
     list_editable = []
+    active_methods = ('get',)
+    active_attrs = ('list_editable',)
 
     def __init__(self, admin_view):
         super(EditablePlugin, self).__init__(admin_view)
@@ -50,7 +52,7 @@ class EditablePlugin(BaseAdminPlugin):
                 )
                 data_attr = {
                     'name': field_name,
-                    'action': self.admin_view.model_admin_url('patch', pk),
+                    'action': self.admin_view.model_admin_url('patch', quote(pk)),
                     'title': _(u"Enter %s") % field_label,
                     'field': form[field_name]
                 }
@@ -61,6 +63,10 @@ class EditablePlugin(BaseAdminPlugin):
                     self.editable_need_fields[field_name] = item.field
         return item
 
+    def get_list_projection(self, projection, ordering):
+        # Forms of editable cells are built with all fields of the row
+        return None
+
     # Media
     def get_media(self, media):
         if self.editable_need_fields:
@@ -124,7 +130,7 @@ class EditPatchView(ModelFormAdminView, ListAdminView):
             "fields": fields,
             "formfield_callback": self.formfield_for_dbfield,
         }
-        form_class = modelform_factory(self.model, **defaults)
+        form_class = self.get_form_class(modelform_factory, self.model, **defaults)
         form = form_class(instance=self.org_obj, data=request.POST, files=request.FILES)
         form.prefix = str(pk)
 
@@ -1,15 +1,40 @@
+import Queue
 import StringIO
 import datetime
+import decimal
+import logging
+import os
+import re
+import tempfile
+import threading
+import uuid
+import zipfile
 
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist, PermissionDenied
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.servers.basehttp import FileWrapper
+from django.db import connection, connections
+from django.db.models import get_model
+from django.db.models.query import prefetch_related_objects
+from django.http import HttpResponse, HttpResponseRedirect, Http404
 from django.template import loader
+from django.template.response import TemplateResponse
+from django.test.client import RequestFactory
 from django.utils import simplejson
-from django.utils.encoding import smart_unicode
+from django.utils.datastructures import SortedDict
+from django.utils.encoding import force_unicode, smart_unicode
 from django.utils.html import escape
+from django.utils.importlib import import_module
+from django.utils.http import urlencode
+from django.utils import timezone, translation
 from django.utils.translation import ugettext_lazy as _
 from django.utils.xmlutils import SimplerXMLGenerator
+from xml.sax.saxutils import escape as xml_escape, quoteattr
+from exadmin.models import UserSettings
 from exadmin.sites import site
-from exadmin.views import BaseAdminPlugin, ListAdminView
+from exadmin.views import BaseAdminPlugin, ListAdminView, ModelAdminView, filter_hook
+from exadmin.views.list import ALL_VAR, EMPTY_CHANGELIST_VALUE, ResultRow, ResultItem
 
 try:
     import xlwt
@@ -17,14 +42,209 @@ try:
 except:
     has_xlwt = False
 
+XLSX_CONTENT_TYPES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+%s
+</Types>'''
+XLSX_SHEET_CONTENT_TYPE = '<Override PartName="/xl/worksheets/sheet%d.xml" ' \
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+XLSX_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>'''
+XLSX_WORKBOOK = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets>%s</sheets>
+</workbook>'''
+XLSX_WORKBOOK_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+%s
+<Relationship Id="rIdStyles" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>'''
+XLSX_SHEET_REL = '<Relationship Id="rId%d" ' \
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet%d.xml"/>'
+# Cell styles are the ones of xls export: default, datetime, date, time and header
+XLSX_STYLES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<numFmts count="3">
+<numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm:ss"/>
+<numFmt numFmtId="165" formatCode="yyyy-mm-dd"/>
+<numFmt numFmtId="166" formatCode="hh:mm:ss"/>
+</numFmts>
+<fonts count="2">
+<font><sz val="11"/><name val="Calibri"/></font>
+<font><b/><sz val="11"/><color rgb="FFFF0000"/><name val="Times New Roman"/></font>
+</fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="5">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="165" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="166" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="4" fontId="1" fillId="0" borderId="0" xfId="0" applyNumberFormat="1" applyFont="1"/>
+</cellXfs>
+</styleSheet>'''
+XLSX_SHEET_HEAD = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n' \
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+XLSX_SHEET_TAIL = '</sheetData></worksheet>'
+XLSX_MAX_ROWS = 1048576
+
+# Export jobs are kept in user settings, files are written to EXADMIN_EXPORT_ROOT
+EXPORT_JOB_KEY = 'export_job:%s'
+EXPORT_JOB_ROOT = getattr(settings, 'EXADMIN_EXPORT_ROOT', os.path.join(tempfile.gettempdir(), 'exadmin_export'))
+# Running jobs not updated for EXADMIN_EXPORT_JOB_TIMEOUT seconds are taken as crashed
+# and run again, at most EXPORT_JOB_ATTEMPTS times. Finished jobs and their files are
+# deleted after EXADMIN_EXPORT_JOB_EXPIRE seconds.
+EXPORT_JOB_TIMEOUT = getattr(settings, 'EXADMIN_EXPORT_JOB_TIMEOUT', 3600)
+EXPORT_JOB_EXPIRE = getattr(settings, 'EXADMIN_EXPORT_JOB_EXPIRE', 86400)
+EXPORT_JOB_ATTEMPTS = 3
+EXPORT_JOB_TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+XLSX_EPOCH = datetime.datetime(1899, 12, 30)
+
+# Characters not allowed in xml documents
+_xml_invalid_re = re.compile(u'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_xml_name_invalid_re = re.compile(r'[^\w.-]')
+_sheet_name_invalid_re = re.compile(r'[\[\]:*?/\\]')
+
+class XlsxWriter(object):
+    """
+    Minimal SpreadsheetML writer. Rows are written to a temporary file of the sheet
+    as they come, and a new sheet is started when a sheet has ``max_rows`` rows, with
+    the header row written again. Only inline strings are used, so nothing but the
+    current row is kept in memory.
+    """
+    STYLES = {'default': 0, 'datetime': 1, 'date': 2, 'time': 3, 'header': 4}
+
+    def __init__(self, sheet_name, header=None, max_rows=XLSX_MAX_ROWS):
+        self.sheet_name = _sheet_name_invalid_re.sub('_', smart_unicode(sheet_name))
+        self.header = header
+        self.max_rows = max_rows
+        self.sheets = []
+        self.columns = []
+        self.rowx = 0
+
+    def _column(self, colx):
+        while len(self.columns) <= colx:
+            n, name = len(self.columns) + 1, ''
+            while n:
+                n, r = divmod(n - 1, 26)
+                name = chr(65 + r) + name
+            self.columns.append(name)
+        return self.columns[colx]
+
+    def _cell(self, ref, value, style):
+        if value is None:
+            return '<c r="%s"/>' % ref
+        if isinstance(value, bool):
+            return '<c r="%s" t="b"><v>%d</v></c>' % (ref, value)
+        if isinstance(value, (int, long, float, decimal.Decimal)):
+            return '<c r="%s" s="%d"><v>%s</v></c>' % (ref, self.STYLES[style or 'default'], \
+                isinstance(value, float) and repr(value) or value)
+        if isinstance(value, datetime.datetime):
+            if timezone.is_aware(value):
+                value = timezone.make_naive(value, timezone.get_current_timezone())
+            delta = value - XLSX_EPOCH
+            return '<c r="%s" s="%d"><v>%r</v></c>' % (ref, self.STYLES[style or 'datetime'], \
+                delta.days + (delta.seconds + delta.microseconds / 1000000.0) / 86400)
+        if isinstance(value, datetime.date):
+            return '<c r="%s" s="%d"><v>%d</v></c>' % (ref, self.STYLES[style or 'date'], \
+                (value - XLSX_EPOCH.date()).days)
+        if isinstance(value, datetime.time):
+            return '<c r="%s" s="%d"><v>%r</v></c>' % (ref, self.STYLES[style or 'time'], \
+                (value.hour * 3600 + value.minute * 60 + value.second + value.microsecond / 1000000.0) / 86400)
+        text = xml_escape(_xml_invalid_re.sub(u'', smart_unicode(value)))
+        return (u'<c r="%s" t="inlineStr" s="%d"><is><t xml:space="preserve">%s</t></is></c>' % \
+            (ref, self.STYLES[style or 'default'], text)).encode('utf-8')
+
+    def _new_sheet(self):
+        fd, path = tempfile.mkstemp(suffix='.xml')
+        self.file = os.fdopen(fd, 'wb')
+        self.file.write(XLSX_SHEET_HEAD)
+        self.sheets.append(path)
+        self.rowx = 0
+        if self.header is not None:
+            self._write_row(self.header, 'header')
+
+    def _write_row(self, values, style):
+        self.rowx += 1
+        self.file.write('<row r="%d">%s</row>' % (self.rowx, ''.join([self._cell('%s%d' % \
+            (self._column(colx), self.rowx), value, style) for colx, value in enumerate(values)])))
+
+    def write_row(self, values):
+        if not self.sheets or self.rowx >= self.max_rows:
+            if self.sheets:
+                self.file.write(XLSX_SHEET_TAIL)
+                self.file.close()
+            self._new_sheet()
+        self._write_row(values, None)
+
+    def save(self, output):
+        """
+        Zip the sheets into ``output`` file object, and remove the temporary files.
+        """
+        if not self.sheets:
+            self._new_sheet()
+        self.file.write(XLSX_SHEET_TAIL)
+        self.file.close()
+
+        sheet_ids = range(1, len(self.sheets) + 1)
+        names = [self.sheet_name[:31]] + [(u'%s (%d)' % (self.sheet_name[:25], i)) for i in sheet_ids[1:]]
+        zf = zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED)
+        try:
+            zf.writestr('[Content_Types].xml', XLSX_CONTENT_TYPES % ''.join([XLSX_SHEET_CONTENT_TYPE % i for i in sheet_ids]))
+            zf.writestr('_rels/.rels', XLSX_RELS)
+            zf.writestr('xl/workbook.xml', (XLSX_WORKBOOK % u''.join([u'<sheet name=%s sheetId="%d" r:id="rId%d"/>' % \
+                (quoteattr(name), i, i) for i, name in zip(sheet_ids, names)])).encode('utf-8'))
+            zf.writestr('xl/_rels/workbook.xml.rels', XLSX_WORKBOOK_RELS % ''.join([XLSX_SHEET_REL % (i, i) for i in sheet_ids]))
+            zf.writestr('xl/styles.xml', XLSX_STYLES)
+            for i, path in zip(sheet_ids, self.sheets):
+                zf.write(path, 'xl/worksheets/sheet%d.xml' % i)
+        finally:
+            zf.close()
+            self.close()
+
+    def close(self):
+        """
+        Remove the temporary files of sheets, also used when the writing is aborted.
+        """
+        if self.sheets and not self.file.closed:
+            self.file.close()
+        for path in self.sheets:
+            os.remove(path)
+        self.sheets = []
+
 class ExportPlugin(BaseAdminPlugin):
 
-    list_export = ('xls', 'csv', 'xml', 'json')
-    export_mimes = {'xls': 'application/vnd.ms-excel', 'csv': 'text/csv', 'xml': 'application/xhtml+xml', 'json': 'application/json'}
-    export_names = {'xls': 'Excel', 'csv': 'CSV', 'xml': 'XML', 'json': 'JSON'}
-    
+    # 'xls' (Excel 97, by xlwt, 65536 rows a sheet) is still available if listed
+    list_export = ('xlsx', 'csv', 'xml', 'json', 'ndjson')
+    export_mimes = {'xls': 'application/vnd.ms-excel', 'csv': 'text/csv', 'xml': 'application/xhtml+xml', 'json': 'application/json',
+        'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'ndjson': 'application/x-ndjson'}
+    export_names = {'xlsx': 'Excel', 'xls': 'Excel 97', 'csv': 'CSV', 'xml': 'XML', 'json': 'JSON', 'ndjson': 'JSON Lines'}
+    active_methods = ('get',)
+    active_attrs = ('list_export',)
+    # Types exported by streaming every row of the filtered queryset when all datas
+    # are exported, instead of the rows of rendered list
+    export_stream_types = ('csv', 'xlsx', 'xml', 'ndjson')
+    # Rows loaded and formatted at a time by streaming export
+    export_chunk_size = 1000
+    # Rows of a xlsx sheet, more rows are written to new sheets
+    export_xlsx_max_rows = XLSX_MAX_ROWS
+    # Export all datas by background jobs instead of in the request: 'thread' runs
+    # jobs in a worker thread of the web process, 'command' leaves them to the
+    # ``run_export_jobs`` management command. None for no job.
+    export_job = None
+
     def init_request(self, *args, **kwargs):
         self.list_export = [f for f in self.list_export if f != 'xls' or has_xlwt]
+        self.is_export = self.request.GET.get('_do_') == 'export'
+        self.is_stream_export = self.is_export and ALL_VAR in self.request.GET and \
+            self.request.GET.get('export_type', 'csv') in self.export_stream_types
 
     def get_results(self, context):
         headers = [c for c in context['result_headers'].cells if c.export]
@@ -70,6 +290,51 @@ class ExportPlugin(BaseAdminPlugin):
         output.seek(0)
         return output.getvalue()
 
+    def _format_typed_cell(self, item):
+        # Keep the values of boolean, date, time and number fields, other cells are
+        # the display text, not escaped
+        if item.field is not None and not item.field.flatchoices and item.field.rel is None and \
+            (item.value is None or isinstance(item.value, (bool, int, long, float, decimal.Decimal, datetime.date, datetime.time))):
+            return item.value
+        return smart_unicode(item.text)
+
+    # Cells of xlsx keep the values, so they get the date and time styles
+    _format_xlsx_cell = _format_ndjson_cell = _format_xml_cell = _format_typed_cell
+
+    def write_xlsx(self, headers, rows):
+        """
+        Write rows to a xlsx file, returns the temporary file of it.
+        """
+        export_header = (self.request.GET.get('export_xls_header', 'off') == 'on')
+        writer = XlsxWriter(_(u'Sheet') + " " + self.opts.verbose_name, \
+            export_header and headers or None, self.export_xlsx_max_rows)
+        output = tempfile.TemporaryFile()
+        try:
+            for row in rows:
+                writer.write_row(row)
+            writer.save(output)
+        except:
+            writer.close()
+            output.close()
+            raise
+        output.seek(0)
+        return output
+
+    def get_xlsx_export(self, context):
+        headers = [c for c in context['result_headers'].cells if c.export]
+        rows = [[self._format_xlsx_cell(c) for c in r.cells if c.export] for r in context['results']]
+        output = self.write_xlsx([smart_unicode(h.text) for h in headers], rows)
+        try:
+            return output.read()
+        finally:
+            output.close()
+
+    def get_xlsx_stream(self, headers, chunks):
+        # Zip needs the whole sheets, so the file is made before sending, the rows are
+        # still loaded by chunk and the file is sent by blocks.
+        return FileWrapper(self.write_xlsx([smart_unicode(h.text) for h in headers], \
+            (row for rows in chunks for row in rows)))
+
     def _format_csv_text(self, t):
         t = t.replace('"', '""').replace(',', '\,')
         if isinstance(t, basestring):
@@ -88,39 +353,85 @@ class ExportPlugin(BaseAdminPlugin):
 
         return '\r\n'.join(stream)
 
-    def _to_xml(self, xml, data):
-        if isinstance(data, (list, tuple)):
-            for item in data:
-                xml.startElement("row", {})
-                self._to_xml(xml, item)
-                xml.endElement("row")
-        elif isinstance(data, dict):
-            for key, value in data.iteritems():
-                xml.startElement(key, {})
-                self._to_xml(xml, value)
-                xml.endElement(key)
-        else:
-            xml.characters(smart_unicode(data))
+    def _get_csv_line(self, row):
+        return (u','.join(map(self._format_csv_text, row)) + u'\r\n').encode('utf-8')
 
-    def get_xml_export(self, context):
+    def get_csv_stream(self, headers, chunks):
+        if self.request.GET.get('export_csv_header', 'off') == 'on':
+            yield self._get_csv_line([smart_unicode(h.text) for h in headers])
+        for rows in chunks:
+            yield ''.join([self._get_csv_line(row) for row in rows])
+
+    def get_json_export(self, context):
         results = self.get_results(context)
+        return simplejson.dumps({'objects': results}, ensure_ascii=False, \
+            indent=(self.request.GET.get('export_json_format', 'off') == 'on') and 4 or None)
+
+    def _get_export_keys(self, headers):
+        # Keys of rows in streaming json and xml are the column names, which are
+        # stable for loaders and valid xml names
+        keys = []
+        for h in headers:
+            name = _xml_name_invalid_re.sub('_', getattr(h.field_name, '__name__', h.field_name))
+            if not (name[:1].isalpha() or name[:1] == '_'):
+                name = '_' + name
+            keys.append(name)
+        return keys
+
+    def _to_json_value(self, value):
+        if isinstance(value, (datetime.date, datetime.time)):
+            return value.isoformat()
+        return value
+
+    def get_ndjson_stream(self, headers, chunks):
+        keys = self._get_export_keys(headers)
+        for rows in chunks:
+            yield ''.join([simplejson.dumps(SortedDict(zip(keys, map(self._to_json_value, row))), \
+                cls=DjangoJSONEncoder, ensure_ascii=False).encode('utf-8') + '\n' for row in rows])
+
+    def get_ndjson_export(self, context):
+        headers = [c for c in context['result_headers'].cells if c.export]
+        rows = [[self._format_ndjson_cell(c) for c in r.cells if c.export] for r in context['results']]
+        return ''.join(self.get_ndjson_stream(headers, [rows]))
+
+    def get_xml_export(self, context):
+        # The rows of page are written as the rows of all datas
+        headers = [c for c in context['result_headers'].cells if c.export]
+        rows = [[self._format_xml_cell(c) for c in r.cells if c.export] for r in context['results']]
+        return ''.join(self.get_xml_stream(headers, [rows]))
+
+    def get_xml_stream(self, headers, chunks):
+        """
+        Write rows by ``SimplerXMLGenerator``, the buffer is sent and emptied after
+        each chunk.
+        """
+        keys = self._get_export_keys(headers)
+        newline = self.request.GET.get('export_xml_format', 'off') == 'on' and '\n' or ''
         stream = StringIO.StringIO()
-        
         xml = SimplerXMLGenerator(stream, "utf-8")
         xml.startDocument()
         xml.startElement("objects", {})
-        
-        self._to_xml(xml, results)
-        
+
+        for rows in chunks:
+            for row in rows:
+                stream.write(newline)
+                xml.startElement("row", {})
+                for key, value in zip(keys, row):
+                    if value is None:
+                        xml.addQuickElement(key, attrs={'null': 'true'})
+                        continue
+                    if isinstance(value, bool):
+                        value = value and 'true' or 'false'
+                    xml.addQuickElement(key, _xml_invalid_re.sub(u'', smart_unicode(self._to_json_value(value))))
+                xml.endElement("row")
+            yield stream.getvalue()
+            stream.seek(0)
+            stream.truncate()
+
+        stream.write(newline)
         xml.endElement("objects")
         xml.endDocument()
-        
-        return stream.getvalue().split('\n')[1]
-
-    def get_json_export(self, context):
-        results = self.get_results(context)
-        return simplejson.dumps({'objects': results}, ensure_ascii=False, \
-            indent=(self.request.GET.get('export_json_format', 'off') == 'on') and 4 or None)
+        yield stream.getvalue()
 
     def get_response(self, response, context, *args, **kwargs):
         if self.request.GET.get('_do_') != 'export':
@@ -135,16 +446,156 @@ class ExportPlugin(BaseAdminPlugin):
         response.write(getattr(self, 'get_%s_export' % file_type)(context))
         return response
 
+    def _format_export_cell(self, item):
+        return escape(smart_unicode(item.text))
+
+    def get_export_chunks(self, headers, format_cell=None):
+        """
+        Load the rows of the filtered queryset chunk by chunk, and yield the cell values
+        of each chunk. A chunk is sought from the last row of previous one by the list
+        ordering, or sliced by offset if the rows can not be sought by it, so only a
+        chunk of rows is fetched from the database at a time. Cells are formatted by the
+        compiled column renders, relations of the columns are loaded once for each chunk.
+        """
+        format_cell = format_cell or self._format_export_cell
+        view = self.admin_view
+        renders = [(h.field_name, view.get_column_render(h.field_name)) for h in headers]
+        lookups = view.get_prefetch_lookups()
+
+        def format_chunk(objs):
+            if lookups:
+                prefetch_related_objects(objs, lookups)
+            rows = []
+            for obj in objs:
+                row, values = ResultRow(), []
+                for field_name, render in renders:
+                    item = ResultItem(field_name, row)
+                    try:
+                        render(item, obj)
+                    except (AttributeError, ObjectDoesNotExist):
+                        item.text = EMPTY_CHANGELIST_VALUE
+                    values.append(format_cell(item))
+                rows.append(values)
+            return rows
+
+        size = self.export_chunk_size
+        fields = view.get_keyset_fields()
+        queryset = view.list_queryset
+        if fields:
+            queryset = queryset.order_by(*[(desc and '-' or '') + name for name, desc in fields])
+
+        offset, values = 0, None
+        while True:
+            if fields is None:
+                objs = list(queryset[offset:offset + size])
+                offset += size
+            else:
+                objs = list((values and view.seek_queryset(queryset, fields, values) or queryset)[:size])
+                values = objs and dict([(name, view.get_keyset_value(objs[-1], name)) for name, desc in fields])
+            if objs:
+                yield format_chunk(objs)
+            if len(objs) < size:
+                break
+
+    def get_export_stream(self, progress=None):
+        """
+        Returns the content iterator of exporting all rows of the filtered queryset,
+        ``progress(rows, total)`` is called after each chunk if given. Rows are
+        queried while iterating.
+        """
+        view = self.admin_view
+        view.base_queryset = view.queryset()
+        view.list_queryset = view.get_list_queryset()
+        view.ordering_field_columns = view.get_ordering_field_columns()
+
+        headers = [h for h in view.result_headers().cells if h.export]
+        file_type = self.request.GET.get('export_type', 'csv')
+        chunks = self.get_export_chunks(headers, getattr(self, '_format_%s_cell' % file_type, None))
+
+        if progress is not None:
+            def count_chunks(chunks, total):
+                rows = 0
+                progress(rows, total)
+                for chunk in chunks:
+                    yield chunk
+                    rows += len(chunk)
+                    progress(rows, total)
+            chunks = count_chunks(chunks, view.get_count(view.list_queryset)[0])
+
+        return getattr(self, 'get_%s_stream' % file_type)(headers, chunks)
+
+    def get_response_stream(self):
+        """
+        Returns the export stream for the content of a response. Django closes the
+        connection of request by ``request_finished`` before the content is sent, so
+        the rows are queried by a connection opened again while sending, which is
+        closed by the stream when it ends or the client goes away. The language and time
+        zone of request are activated while the rows are formatted.
+        """
+        stream = self.get_export_stream()
+        using = self.admin_view.list_queryset.db
+        language, tz = translation.get_language(), timezone.get_current_timezone()
+
+        def send():
+            conn = connections[using]
+            reopened = conn.connection is None
+            translation.activate(language)
+            timezone.activate(tz)
+            try:
+                for block in stream:
+                    yield block
+            finally:
+                if reopened:
+                    conn.close()
+                translation.deactivate()
+                timezone.deactivate()
+        return send()
+
+    def get_stream_response(self):
+        file_type = self.request.GET.get('export_type', 'csv')
+        response = HttpResponse(self.get_response_stream(), mimetype="%s; charset=UTF-8" % self.export_mimes[file_type])
+
+        file_name = self.opts.verbose_name.replace(' ', '_')
+        response['Content-Disposition'] = ('attachment; filename=%s.%s' % (file_name, file_type)).encode('utf-8')
+        return response
+
+    def create_export_job(self):
+        """
+        Save the job of exporting with the list params of request for current user,
+        and queue it to the worker thread in 'thread' mode.
+        """
+        job_id = uuid.uuid4().hex
+        job = UserSettings(user=self.user, key=EXPORT_JOB_KEY % job_id)
+        job.set_json({
+            'model': '%s.%s' % (self.opts.app_label, self.opts.module_name),
+            'path': self.request.path,
+            'params': urlencode(sorted([(k, v) for k, v in self.admin_view.params.items() if v != ''])),
+            'type': self.request.GET.get('export_type', 'csv'),
+            'status': 'pending', 'rows': 0, 'total': None, 'attempts': 0,
+            'created': datetime.datetime.now().strftime(EXPORT_JOB_TIME_FORMAT),
+        })
+        job.save()
+        if self.export_job == 'thread':
+            queue_export_job(job.pk, self.admin_site)
+        return job_id
+
     # View Methods
+    def get_result_list(self, __):
+        if self.is_stream_export:
+            if self.export_job:
+                return HttpResponseRedirect(self.admin_view.model_admin_url('export', self.create_export_job()))
+            return self.get_stream_response()
+        return __()
+
     def result_header(self, item, field_name, row):
-        if self.request.GET.get('_do_') == 'export':
+        if self.is_export:
             item.export = True
             if item.attr and not getattr(item.attr, 'allow_export', False):
                 item.export = False
         return item
 
     def result_item(self, item, obj, field_name, row):
-        if self.request.GET.get('_do_') == 'export':
+        if self.is_export:
             item.export = True
             if item.field is None and not getattr(item.attr, 'allow_export', False):
                 item.export = False
@@ -158,7 +609,210 @@ class ExportPlugin(BaseAdminPlugin):
             })
             nodes.append(loader.render_to_string('admin/exports.html', context_instance=context))
 
+def get_export_jobs(status):
+    """
+    Returns the queryset of export jobs of ``status``. The status is kept in the json
+    value of user settings, so it is matched by the text of value in the query.
+    """
+    return UserSettings.objects.filter(key__startswith=EXPORT_JOB_KEY % '', \
+        value__contains='"status": %s' % simplejson.dumps(status)).order_by('pk')
+
+def update_export_job(job, **kwargs):
+    """
+    Update the data of job only if it was not changed by others since it was loaded.
+    Returns True if updated.
+    """
+    value = job.value
+    data = job.json_value()
+    data.update(kwargs)
+    job.set_json(data)
+    return UserSettings.objects.filter(pk=job.pk, value=value).update(value=job.value) > 0
+
+def _export_job_age(data, name):
+    time = datetime.datetime.strptime(data.get(name) or data['created'], EXPORT_JOB_TIME_FORMAT)
+    return datetime.datetime.now() - time
+
+def _export_job_path(job, data):
+    return os.path.join(EXPORT_JOB_ROOT, '%s.%s' % (job.key.split(':')[-1], data['type']))
+
+def _remove_export_file(path):
+    if path and os.path.exists(path):
+        os.remove(path)
+
+def reclaim_export_job(job, timeout=EXPORT_JOB_TIMEOUT):
+    """
+    Set the running job back to pending if it was not updated for ``timeout`` seconds,
+    as its worker is taken as crashed, or set it failed after ``EXPORT_JOB_ATTEMPTS``
+    runs. Returns True if the job is pending again.
+    """
+    data = job.json_value()
+    if data['status'] != 'running' or _export_job_age(data, 'updated') < datetime.timedelta(seconds=timeout):
+        return False
+    _remove_export_file(_export_job_path(job, data))
+    if data.get('attempts', 1) >= EXPORT_JOB_ATTEMPTS:
+        update_export_job(job, status='failed', error=u'Export job timed out.', \
+            finished=datetime.datetime.now().strftime(EXPORT_JOB_TIME_FORMAT))
+        return False
+    return update_export_job(job, status='pending', rows=0, total=None)
+
+def reclaim_export_jobs(timeout=EXPORT_JOB_TIMEOUT):
+    """
+    Reclaim the stale running jobs by ``reclaim_export_job``, returns the pks of jobs
+    which are pending again.
+    """
+    return [job.pk for job in get_export_jobs('running') if reclaim_export_job(job, timeout)]
+
+def clean_export_jobs(expire=EXPORT_JOB_EXPIRE):
+    """
+    Delete the done and failed jobs finished ``expire`` seconds ago, with their files.
+    """
+    for status in ('done', 'failed'):
+        for job in get_export_jobs(status):
+            data = job.json_value()
+            if _export_job_age(data, 'finished') >= datetime.timedelta(seconds=expire):
+                _remove_export_file(data.get('file'))
+                job.delete()
+
+def run_export_job(job_pk, admin_site=site):
+    """
+    Run the export job saved in user settings of ``job_pk``. The list view is made
+    again with the params and the user of job, and the file is written to
+    ``EXPORT_JOB_ROOT``. The job is updated after each chunk of rows, which tells
+    ``reclaim_export_job`` it is alive. Returns False if the job is not pending or is
+    taken by another worker.
+    """
+    try:
+        job = UserSettings.objects.select_related('user').get(pk=job_pk)
+    except UserSettings.DoesNotExist:
+        return False
+    data = job.json_value()
+    if data['status'] != 'pending':
+        return False
+
+    # Take the job only if it was not changed by others
+    now = lambda: datetime.datetime.now().strftime(EXPORT_JOB_TIME_FORMAT)
+    if not update_export_job(job, status='running', attempts=data.get('attempts', 0) + 1, updated=now()):
+        return False
+    data = job.json_value()
+
+    def save(**kwargs):
+        data.update(kwargs, updated=now())
+        job.set_json(data)
+        UserSettings.objects.filter(pk=job.pk).update(value=job.value)
+
+    path = None
+    try:
+        # A request of the list page, as made by the handler and middlewares
+        request = RequestFactory().get('%s?%s' % (data.get('path', '/'), data['params']))
+        request.user = job.user
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+        model = get_model(*data['model'].split('.'))
+        view = admin_site.get_view_class(ListAdminView, admin_site._registry[model])(request)
+        plugin = [p for p in view.plugins if isinstance(p, ExportPlugin)][0]
+
+        if not os.path.isdir(EXPORT_JOB_ROOT):
+            os.makedirs(EXPORT_JOB_ROOT)
+        path = _export_job_path(job, data)
+        output = open(path, 'wb')
+        try:
+            for block in plugin.get_export_stream(lambda rows, total: save(rows=rows, total=total)):
+                output.write(block)
+        finally:
+            output.close()
+        save(status='done', file=path, finished=now())
+    except Exception, e:
+        logging.error(e, exc_info=True)
+        _remove_export_file(path)
+        save(status='failed', error=smart_unicode(e), finished=now())
+    return True
+
+_export_queue = Queue.Queue()
+_export_worker = []
+_export_worker_lock = threading.Lock()
+
+def _export_worker_loop():
+    while True:
+        job_pk, admin_site = _export_queue.get()
+        try:
+            run_export_job(job_pk, admin_site)
+            clean_export_jobs()
+        except Exception, e:
+            logging.error(e, exc_info=True)
+        finally:
+            # Connections are per thread, do not keep it open between jobs
+            connection.close()
+
+def queue_export_job(job_pk, admin_site=site):
+    """
+    Queue the job to the export worker thread of this process, started on first use.
+    """
+    _export_queue.put((job_pk, admin_site))
+    with _export_worker_lock:
+        if not _export_worker or not _export_worker[0].is_alive():
+            worker = threading.Thread(target=_export_worker_loop, name='exadmin-export')
+            worker.daemon = True
+            worker.start()
+            _export_worker[:] = [worker]
+
+class ExportJobView(ModelAdminView):
+    """
+    Progress of export job, and the file of it when done.
+    """
+    export_job_template = None
+
+    def init_request(self, job_id, *args, **kwargs):
+        if not self.has_view_permission():
+            raise PermissionDenied
+        try:
+            self.job = UserSettings.objects.get(user=self.user, key=EXPORT_JOB_KEY % job_id)
+        except UserSettings.DoesNotExist:
+            raise Http404
+        self.job_id = job_id
+        # Jobs of a crashed process are run again by the worker of this process,
+        # the ``run_export_jobs`` command reclaims them itself
+        if getattr(self, 'export_job', None) == 'thread' and reclaim_export_job(self.job):
+            queue_export_job(self.job.pk, self.admin_site)
+        self.job_data = self.job.json_value()
+
+    def get_progress(self):
+        data = self.job_data
+        if data['status'] == 'done':
+            return 100
+        return data.get('total') and min(99, data['rows'] * 100 / data['total']) or 0
+
+    @filter_hook
+    def get_context(self):
+        context = super(ExportJobView, self).get_context()
+        context.update({
+            'title': _(u'Export %s') % force_unicode(self.opts.verbose_name_plural),
+            'job': self.job_data,
+            'progress': self.get_progress(),
+            'download_url': self.model_admin_url('export', self.job_id) + '?download',
+            'changelist_url': self.model_admin_url('changelist'),
+        })
+        return context
+
+    @filter_hook
+    def get(self, request, *args, **kwargs):
+        data = self.job_data
+        if 'download' in request.GET:
+            if data['status'] != 'done' or not os.path.exists(data['file']):
+                raise Http404
+            response = HttpResponse(FileWrapper(open(data['file'], 'rb')), \
+                mimetype="%s; charset=UTF-8" % ExportPlugin.export_mimes[data['type']])
+            response['Content-Length'] = os.path.getsize(data['file'])
+            file_name = self.opts.verbose_name.replace(' ', '_')
+            response['Content-Disposition'] = ('attachment; filename=%s.%s' % (file_name, data['type'])).encode('utf-8')
+            return response
+
+        if request.is_ajax() or '_format' in request.GET:
+            return HttpResponse(simplejson.dumps({'status': data['status'], 'rows': data['rows'], \
+                'total': data['total'], 'progress': self.get_progress()}), mimetype='application/json')
+
+        return TemplateResponse(request, self.export_job_template or self.get_template_list('export_job.html'), \
+            self.get_context(), current_app=self.admin_site.name)
 
 site.register_plugin(ExportPlugin, ListAdminView)
+site.register_modelview(r'^export/(\w+)/$', ExportJobView, name='%s_%s_export')
 
 
@@ -1,7 +1,7 @@
 import operator
 from exadmin import widgets
 
-from exadmin.util import get_fields_from_path, lookup_needs_distinct
+from exadmin.util import get_fields_from_path, lookup_needs_distinct, prepare_lookup_value
 from django.core.exceptions import SuspiciousOperation, ImproperlyConfigured
 from django.db import models
 from django.db.models.fields import FieldDoesNotExist
@@ -84,7 +84,10 @@ class FilterPlugin(BaseAdminPlugin):
                     raise SuspiciousOperation("Filtering by %s not allowed" % key)
 
         self.filter_specs = []
-        if self.list_filter:
+        if self.admin_view.list_partial:
+            # Partial lists have no filter menus, the params are only used as lookups
+            lookup_params = dict([(k, prepare_lookup_value(k, v)) for k, v in lookup_params.items()])
+        elif self.list_filter:
             for list_filter in self.list_filter:
                 if callable(list_filter):
                     # This is simply a custom list filter class.
@@ -1,11 +1,9 @@
-import copy
-
 from django import forms
 from django.forms.formsets import all_valid, DELETION_FIELD_NAME
 from django.forms.models import inlineformset_factory, BaseInlineFormSet
 from django.template import loader, Context
 from django.template.loader import render_to_string
-from exadmin.layout import FormHelper, Layout, flatatt, Container, Column, Field, Fieldset
+from exadmin.layout import FormHelper, Layout, flatatt, Container, Column, Field, Fieldset, copy_layout
 from exadmin.sites import site
 from exadmin.views import BaseAdminPlugin, ModelFormAdminView, DetailAdminView, filter_hook
 
@@ -134,7 +132,7 @@ class InlineModelAdmin(ModelFormAdminView):
             "can_delete": can_delete,
         }
         defaults.update(kwargs)
-        return inlineformset_factory(self.parent_model, self.model, **defaults)
+        return self.get_form_class(inlineformset_factory, self.parent_model, self.model, **defaults)
 
     @filter_hook
     def instance_form(self, **kwargs):
@@ -157,17 +155,9 @@ class InlineModelAdmin(ModelFormAdminView):
         style = style_manager.get_style('one' if self.max_num == 1 else self.style)(self, instance)
 
         if len(instance):
-            layout = copy.deepcopy(self.form_layout)
-
-            if layout is None:
-                layout = Layout(*instance[0].fields.keys())
-            elif type(layout) in (list, tuple) and len(layout) > 0:
-                layout = Layout(*layout)
-
-                rendered_fields = [i[1] for i in layout.get_field_names()]
-                layout.extend([f for f in instance[0].fields.keys() if f not in rendered_fields])
-       
-            helper.add_layout(layout)
+            fields = instance[0].fields.keys()
+            helper.add_layout(self.get_compiled_layout(('form_layout',), tuple(fields), \
+                lambda: self.compile_form_layout(fields)))
 
             style.update_layout(helper)
 
@@ -179,6 +169,19 @@ class InlineModelAdmin(ModelFormAdminView):
 
         return instance
 
+    def compile_form_layout(self, fields):
+        layout = copy_layout(self.form_layout)
+
+        if layout is None:
+            layout = Layout(*fields)
+        elif type(layout) in (list, tuple) and len(layout) > 0:
+            layout = Layout(*layout)
+
+            rendered_fields = [i[1] for i in layout.get_field_names()]
+            layout.extend([f for f in fields if f not in rendered_fields])
+
+        return layout
+
     def has_auto_field(self, form):
         if form._meta.model._meta.has_auto_field:
             return True
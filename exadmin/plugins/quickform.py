@@ -24,7 +24,7 @@ class QuickFormPlugin(BaseAdminPlugin):
                 "fields": self.request.GET['_field'].split(','),
                 "formfield_callback": self.admin_view.formfield_for_dbfield,
             }
-            return modelform_factory(self.model, **defaults)
+            return self.admin_view.get_form_class(modelform_factory, self.model, **defaults)
         return __()
 
     def get_context(self, context):
@@ -50,7 +50,7 @@ class RelatedFieldWidgetWrapper(forms.Widget):
     def __deepcopy__(self, memo):
         obj = copy.copy(self)
         obj.widget = copy.deepcopy(self.widget, memo)
-        obj.attrs = self.widget.attrs
+        obj.attrs = obj.widget.attrs
         memo[id(self)] = obj
         return obj
 
@@ -10,6 +10,8 @@ REFRESH_VAR = '_refresh'
 class RefreshPlugin(BaseAdminPlugin):
 
     refresh_times = []
+    active_methods = ('get',)
+    active_attrs = ('refresh_times',)
 
     # Media
     def get_media(self, media):
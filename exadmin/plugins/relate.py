@@ -1,5 +1,4 @@
 # coding=UTF-8
-from django.core.urlresolvers import reverse
 from django.utils.encoding import force_unicode
 from django.utils.encoding import smart_str
 from django.utils.safestring import mark_safe
@@ -51,12 +50,12 @@ class RelateMenuPlugin(BaseAdminPlugin):
             link = ''.join(('<li class="with_menu_btn">',
 
             '<a href="%s?%s=%s" title="%s"><i class="icon icon-th-list"></i> %s</a>' % \
-                (reverse('%s:%s_%s_changelist' % (self.admin_site.app_name, label, model_name)), \
+                (self.admin_site.reverse('%s:%s_%s_changelist' % (self.admin_site.app_name, label, model_name)), \
                     RELATE_PREFIX + lookup_name, str(instance.pk), verbose_name, verbose_name) if view_perm else \
             '<a><span class="muted"><i class="icon icon-blank"></i> %s</span></a>' % verbose_name, 
 
             '<a class="add_link dropdown-menu-btn" href="%s?%s=%s"><i class="icon icon-plus pull-right"></i></a>' % \
-                (reverse('%s:%s_%s_add' % (self.admin_site.app_name, label, model_name)), \
+                (self.admin_site.reverse('%s:%s_%s_add' % (self.admin_site.app_name, label, model_name)), \
                     RELATE_PREFIX + lookup_name, str(instance.pk)) if add_perm else "",
 
              '</li>'))
@@ -65,6 +64,7 @@ class RelateMenuPlugin(BaseAdminPlugin):
         return '<div class="dropdown related_menu pull-left"><a class="relate_menu dropdown-toggle" data-toggle="dropdown"><i class="icon icon-list"></i></a>%s</div>' % ul_html
     related_link.short_description = '&nbsp;'
     related_link.allow_tags = True
+    related_link.field_depends = ()
 
     def get_list_display(self, list_display):
         if self.use_related_menu and len(self.get_related_list()):
@@ -115,6 +115,8 @@ class RelateObject(object):
 
 class BaseRelateDisplayPlugin(BaseAdminPlugin):
 
+    active_params = (RELATE_PREFIX,)
+
     def init_request(self, *args, **kwargs):
         self.relate_obj = None
         for k, v in self.request.REQUEST.items():
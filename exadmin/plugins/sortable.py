@@ -10,6 +10,8 @@ SORTBY_VAR = '_sort_by'
 class SortablePlugin(BaseAdminPlugin):
 
     sortable_fields = ['sort']
+    active_methods = ('get',)
+    active_attrs = ('sortable_fields',)
 
     # Media
     def get_media(self, media):
@@ -18,9 +18,7 @@ class ThemePlugin(BaseAdminPlugin):
     # {'name': 'Blank Theme', 'description': '...', 'css': 'http://...', 'thumbnail': '...'}
     user_themes = None
     default_theme = static('exadmin/css/bootstrap-exadmin.css')
-
-    def init_request(self, *args, **kwargs):
-        return self.enable_themes
+    active_attrs = ('enable_themes',)
 
     def _get_theme(self):
         if self.user:
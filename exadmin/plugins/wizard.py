@@ -18,6 +18,7 @@ class WizardFormPlugin(BaseAdminPlugin):
 
     wizard_form_list = None
     wizard_for_update = False
+    active_attrs = ('wizard_form_list',)
 
     storage_name = 'django.contrib.formtools.wizard.storage.session.SessionStorage'
     form_list = None
@@ -86,9 +86,7 @@ class ReversionPlugin(BaseAdminPlugin):
     ignore_duplicate_revisions = False
 
     reversion_enable = False
-
-    def init_request(self, *args, **kwargs):
-        return self.reversion_enable
+    active_attrs = ('reversion_enable',)
 
     @property
     def revision_context_manager(self):
@@ -555,9 +553,7 @@ class ActionRevisionPlugin(BaseAdminPlugin):
 
     revision_manager = default_revision_manager
     reversion_enable = False
-
-    def init_request(self, *args, **kwargs):
-        return self.reversion_enable
+    active_attrs = ('reversion_enable',)
 
     @property
     def revision_context_manager(self):
@@ -3,15 +3,19 @@ from functools import update_wrapper
 
 from django.conf import settings
 from django.core.exceptions import ImproperlyConfigured
-from django.core.urlresolvers import reverse
+from django.core.urlresolvers import reverse, get_script_prefix, get_urlconf, NoReverseMatch
 from django.db.models.base import ModelBase
 from django.http import HttpResponseRedirect
 from django.views.decorators.cache import never_cache
 from django.views.decorators.csrf import csrf_protect
+from django.utils.encoding import smart_unicode, iri_to_uri
 
 reload(sys)
 sys.setdefaultencoding( "utf-8" )
 
+# Args placeholder to resolve url templates
+URL_ARG_PLACEHOLDER = '__EXADMIN_ARG%d__'
+
 class AlreadyRegistered(Exception):
     pass
 
@@ -35,9 +39,41 @@ class AdminSite(object):
         self._registry_plugins = {} # view_class class -> plugin_class class
 
         self._admin_view_cache = {}
+        self._url_templates = {}
+        # Form classes and compiled form layouts of views, cleared when the registry is changed
+        self._form_class_cache = {}
+        self._form_layout_cache = {}
 
         self.check_dependencies()
 
+    def reverse(self, viewname, *args, **kwargs):
+        """
+        Reverse the url of admin view with positional args (primary keys in general).
+        The url of a name is resolved once into a format string with placeholders of
+        args, then later urls are made by string format with the args, as ``reverse`` does.
+        Primary keys are passed quoted by ``exadmin.util.quote``, as to ``reverse``.
+        """
+        current_app = kwargs.get('current_app')
+        key = (viewname, len(args), current_app, get_script_prefix(), get_urlconf())
+        template = self._url_templates.get(key)
+        if template is None:
+            placeholders = [URL_ARG_PLACEHOLDER % i for i in range(len(args))]
+            try:
+                url = reverse(viewname, args=placeholders, current_app=current_app)
+            except NoReverseMatch:
+                url = None
+            # Fall back to reverse if url patterns do not take the args as they are
+            if url is not None and all([url.count(p) == 1 for p in placeholders]):
+                template = url.replace('%', '%%')
+                for p in placeholders:
+                    template = template.replace(p, '%s')
+            else:
+                template = False
+            self._url_templates[key] = template
+        if template is False:
+            return reverse(viewname, args=args, current_app=current_app)
+        return template % tuple([iri_to_uri(smart_unicode(arg)) for arg in args])
+
     def copy_registry(self):
         import copy
         return {
@@ -54,6 +90,8 @@ class AdminSite(object):
         self._registry_views = data['views']
         self._registry_modelviews = data['modelviews']
         self._registry_plugins = data['plugins']
+        self._form_class_cache.clear()
+        self._form_layout_cache.clear()
 
     def register_modelview(self, path, admin_view_class, name):
         from exadmin.views.base import BaseAdminView
@@ -70,6 +108,8 @@ class AdminSite(object):
         from exadmin.views.base import BaseAdminPlugin
         if issubclass(plugin_class, BaseAdminPlugin):
             self._registry_plugins.setdefault(admin_view_class, []).append(plugin_class)
+            self._form_class_cache.clear()
+            self._form_layout_cache.clear()
         else:
             raise ImproperlyConfigured(u'The registered plugin class %s isn\'t subclass of %s' % \
                 (plugin_class.__name__, BaseAdminPlugin.__name__))
@@ -78,6 +118,8 @@ class AdminSite(object):
         from exadmin.views.base import BaseAdminView
         if isinstance(model_or_iterable, ModelBase) or issubclass(model_or_iterable, BaseAdminView):
             model_or_iterable = [model_or_iterable]
+        self._form_class_cache.clear()
+        self._form_layout_cache.clear()
         for model in model_or_iterable:
             if isinstance(model, ModelBase):
                 if model._meta.abstract:
@@ -119,6 +161,8 @@ class AdminSite(object):
         from exadmin.views.base import BaseAdminView
         if isinstance(model_or_iterable, (ModelBase, BaseAdminView)):
             model_or_iterable = [model_or_iterable]
+        self._form_class_cache.clear()
+        self._form_layout_cache.clear()
         for model in model_or_iterable:
             if isinstance(model, ModelBase):
                 if model not in self._registry:
@@ -235,13 +279,24 @@ class AdminSite(object):
             option_classes.append(klass)
         merges = filter(lambda x:x, option_classes)
         new_class_name = ''.join([c.__name__ for c in merges])
+        # Classes made with opts are cached apart from the class without them
+        cache_key = opts and '%s%r' % (new_class_name, sorted(opts.items())) or new_class_name
 
-        if not self._admin_view_cache.has_key(new_class_name):
+        if not self._admin_view_cache.has_key(cache_key):
+            from exadmin.views.base import get_filter_hooks
             plugins = self.get_plugins(view_class, option_class)
-            self._admin_view_cache[new_class_name] = MergeAdminMetaclass(new_class_name, tuple(merges), \
+            if 'plugin_classes' in opts:
+                # Only the allowed plugins, in the order they are registered
+                allowed = tuple(opts.pop('plugin_classes'))
+                plugins = [p for p in plugins if issubclass(p, allowed)]
+            new_class = MergeAdminMetaclass(new_class_name, tuple(merges), \
                 dict({'plugin_classes': plugins, 'admin_site': self}, **opts))
+            # Precompile plugin filters of every hook once per merged class
+            new_class.filter_hooks = get_filter_hooks(new_class, plugins)
+            new_class.setup_class()
+            self._admin_view_cache[cache_key] = new_class
 
-        return self._admin_view_cache[new_class_name]
+        return self._admin_view_cache[cache_key]
 
     def create_admin_view(self, admin_view_class):
         return self.get_view_class(admin_view_class).as_view()
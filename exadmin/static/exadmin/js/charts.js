@@ -9,17 +9,44 @@ $(document).ready(function(){
         }).appendTo("body").fadeIn(200);
     }
 
-    $.fn.chart = function(){
-      $(this).each(function(){
-        var $chart = $(this);
-
-        if($chart.data('chart-obj')) return;
+    function bindZoom($chart, chart, url){
+        // Drag on a zoomable chart loads the selected x range at full resolution,
+        // double click loads the whole chart again.
+        var start = null;
+        var $mask = $('<div class="chart-zoom"></div>').css({
+            position: 'absolute', display: 'none', top: 0, bottom: 0,
+            background: 'rgba(0, 136, 204, 0.2)'
+        }).appendTo($chart);
 
-        $chart.html('<span class="muted"><i class="icon icon-spinner icon-spin"></i> Loading chart...</span>');
+        $chart.bind('mousedown.zoom', function(e){
+            start = e.pageX - $chart.offset().left;
+            e.preventDefault();
+        }).bind('mousemove.zoom', function(e){
+            if (start === null) return;
+            var x = e.pageX - $chart.offset().left;
+            $mask.css({left: Math.min(start, x), width: Math.abs(x - start)}).show();
+        }).bind('mouseup.zoom', function(e){
+            if (start === null) return;
+            var end = e.pageX - $chart.offset().left, offset = chart.getPlotOffset().left;
+            $mask.hide();
+            if (Math.abs(end - start) > 5) {
+                var xaxis = chart.getAxes().xaxis,
+                    from = xaxis.c2p(Math.min(start, end) - offset),
+                    to = xaxis.c2p(Math.max(start, end) - offset);
+                loadChart($chart, url + (url.indexOf('?') < 0 ? '?' : '&') +
+                    '_x_from=' + Math.floor(from) + '&_x_to=' + Math.ceil(to), url);
+            }
+            start = null;
+        }).bind('dblclick.zoom', function(){
+            loadChart($chart, url, url);
+        });
+    }
 
-        $.getJSON($chart.data('chart-url'), function(data){
+    function loadChart($chart, url, baseUrl){
+        $.getJSON(url, function(data){
             var chart = $.plot($chart, data.data, data.option);
             var previousPoint = null;
+            $chart.unbind('plothover').unbind('.zoom');
             $chart.bind("plothover", function (event, pos, item) {
                 if (item) {
                     if (previousPoint != item.dataIndex) {
@@ -37,12 +64,26 @@ $(document).ready(function(){
                     previousPoint = null;            
                 }
             });
+            if (data.zoomable) {
+                bindZoom($chart, chart, baseUrl);
+            }
             $chart.data('chart-obj', chart);
         });
+    }
+
+    $.fn.chart = function(){
+      $(this).each(function(){
+        var $chart = $(this);
+
+        if($chart.data('chart-obj')) return;
+
+        $chart.html('<span class="muted"><i class="icon icon-spinner icon-spin"></i> Loading chart...</span>');
+
+        loadChart($chart, $chart.data('chart-url'), $chart.data('chart-url'));
       })
     }
 
-    $('.chart-tab a').click(function(e){
+    $(document).on('click', '.chart-tab a', function(e){
       e.preventDefault();
       $(this).tab('show');
 
@@ -50,4 +91,10 @@ $(document).ready(function(){
     });
     $('.chart-tab a:first').click();
     $('.chart.init').chart();
+
+    // Widgets loaded by the dashboard page
+    $(document).on('widget-loaded', '.box', function(){
+      $(this).find('.chart-tab a:first').click();
+      $(this).find('.chart.init').chart();
+    });
 });
\ No newline at end of file
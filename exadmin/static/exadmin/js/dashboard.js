@@ -1,5 +1,6 @@
 jQuery(function() {
-  $( ".btn-quick-form" ).click(function(){
+  // Bound on the document, so the buttons of widgets loaded from the widget url work too
+  $(document).on('click', '.btn-quick-form', function(){
     var btn = $(this),
         form_url;
     if(btn.is('a')){
@@ -68,7 +69,40 @@ jQuery(function() {
     return false;
   });
 
-  $('.btn-quick-form').on('post-success', function(e){
+  $(document).on('post-success', '.btn-quick-form', function(e){
     window.location.reload();
   });
-});
\ No newline at end of file
+
+  // Widget frames are loaded from the widget url, widgets with refresh seconds are
+  // loaded again on their own.
+  function loadWidget($box){
+    $.get($box.data('widget-url'), function(html){
+      var $widget = $(html);
+      $box.replaceWith($widget);
+      $widget.find('.exform').exform();
+      $widget.find('.box-title').prepend("<i class='icon icon-chevron-up chevron'></i>");
+      $widget.trigger('widget-loaded');
+      refreshWidget($widget);
+    });
+  }
+
+  function refreshWidget($box){
+    var refresh = parseInt($box.data('widget-refresh'));
+    if(!refresh) return;
+    setTimeout(function(){
+      // Do not replace a widget while its options are being edited
+      if($box.find('.modal.in').length){
+        refreshWidget($box);
+      } else {
+        loadWidget($box);
+      }
+    }, refresh * 1000);
+  }
+
+  $('.dashboard .box.widget-frame').each(function(){
+    loadWidget($(this));
+  });
+  $('.dashboard .box[data-widget-refresh]').not('.widget-frame').each(function(){
+    refreshWidget($(this));
+  });
+});
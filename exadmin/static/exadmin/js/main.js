@@ -27,12 +27,9 @@
   }
 
   // dashboard widget
-  $('.widget-form').each(function(e){
-    var el = $(this);
-    el.find('.btn-remove').click(function(){
-      el.find('input[name=_delete]').val('on');
-      return true;
-    });
+  $(document).on('click', '.widget-form .btn-remove', function(){
+    $(this).closest('.widget-form').find('input[name=_delete]').val('on');
+    return true;
   });
 
   // g-search
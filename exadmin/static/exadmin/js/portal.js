@@ -28,7 +28,7 @@ jQuery(function() {
             .end()
         .find( ".box-content" );
 
-    $( ".box-title .icon.chevron" ).click(function() {
+    $( document ).on( "click", ".box-title .icon.chevron", function() {
         $( this ).toggleClass( "icon-chevron-up" ).toggleClass( "icon-chevron-down" );
         $( this ).parents( ".box:first" ).find( ".box-content" ).toggle('fast');
     });
@@ -1,10 +1,12 @@
 
 ;(function($){
 
-  $('form.widget-form').on('post-success', function(e, data){
-    $(this).data('ajaxform').clean()
-    $('.alert-success #change-link').attr('href', data['change_url'])
-    $('.alert-success').show()
+  // Bound on the document, so the forms of widgets loaded from the widget url work too
+  $(document).on('post-success', 'form.widget-form', function(e, data){
+    var form = $(this)
+    form.data('ajaxform').clean()
+    form.find('.alert-success #change-link').attr('href', data['change_url'])
+    form.find('.alert-success').show()
   })
 
   var AjaxForm = function(element, options) {
@@ -15,7 +15,11 @@ def view_block(context, block_name, *args, **kwargs):
     for view in [admin_view] + admin_view.plugins:
         if hasattr(view, method_name) and callable(getattr(view, method_name)):
             block_func = getattr(view, method_name)
-            result = block_func(context, nodes, *args, **kwargs)
+            if admin_view.profiler is not None:
+                result = admin_view.profiler.call(method_name, admin_view.profiler.get_name(view), \
+                    block_func, context, nodes, *args, **kwargs)
+            else:
+                result = block_func(context, nodes, *args, **kwargs)
             if result and type(result) in (str, unicode):
                 nodes.append(result)
     if nodes:
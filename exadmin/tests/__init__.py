@@ -1,3 +1,3 @@
 from exadmin.tests.sites import *
 from exadmin.tests.views import *
-from exadmin.tests.plugins import *
\ No newline at end of file
+from exadmin.tests.plugins import *
@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase as DjangoTestCase
+from django.test.client import RequestFactory, Client
+from django.utils.importlib import import_module
+
+
+class AdminRequestFactory(RequestFactory):
+    """
+    Request factory of admin views, the requests have the ``user`` and a ``session``.
+    """
+    def __init__(self, user, **defaults):
+        super(AdminRequestFactory, self).__init__(**defaults)
+        self.user = user
+
+    def request(self, **request):
+        request = super(AdminRequestFactory, self).request(**request)
+        request.user = self.user
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+        return request
+
+class TestCase(DjangoTestCase):
+
+    def get_user(self):
+        # Not saved, so the users of test data are not changed
+        return User(username='admin', is_staff=True, is_superuser=True)
+
+    def get_factory(self, user=None, **defaults):
+        return AdminRequestFactory(user or self.get_user(), **defaults)
+
+    def get_client(self):
+        return Client()
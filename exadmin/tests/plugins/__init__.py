@@ -0,0 +1,2 @@
+from exadmin.tests.plugins.export import *
+from exadmin.tests.plugins.chart import *
@@ -0,0 +1,197 @@
+from exadmin.tests.base import TestCase
+from django.contrib.auth.models import User
+
+from exadmin.sites import AdminSite
+from exadmin.views import ListAdminView
+
+class ChartAggregateTest(TestCase):
+
+    def setUp(self):
+        import datetime
+        for i in range(20):
+            User.objects.create(username='user%d' % i, is_staff=bool(i % 2), \
+                date_joined=datetime.datetime(2013, 1, 1 + i % 3, 10, i))
+
+    def get_view(self, chart):
+        from exadmin.plugins.chart import ChartsView
+
+        site = AdminSite('test', 'test_app')
+        site.register(User, type('UserChartAdmin', (object,), {'data_charts': {'chart': chart}}))
+        return site.get_view_class(ChartsView, site._registry[User])(self.get_factory().get('/'))
+
+    def get_datas(self, chart, queries=1):
+        from django.utils import simplejson
+
+        view = self.get_view(chart)
+        with self.assertNumQueries(queries):
+            return simplejson.loads(view.get(view.request, 'chart').content)
+
+    def test_bucket_aggregate(self):
+        content = self.get_datas({'title': 'Joined', 'x-field': 'date_joined', 'y-field': ('id',), \
+            'aggregate': 'count', 'x-bucket': 'day'})
+        self.assertEqual([y for x, y in content['data'][0]['data']], [7, 7, 6])
+        self.assertEqual(content['option']['xaxis']['mode'], 'time')
+
+    def test_local_buckets(self):
+        import calendar, datetime
+        from django.utils import timezone
+
+        # 05:30 of next day in UTC
+        User.objects.create(username='user20', date_joined=timezone.make_aware( \
+            datetime.datetime(2013, 1, 3, 23, 30), timezone.get_default_timezone()))
+        content = self.get_datas({'title': 'Joined', 'x-field': 'date_joined', 'y-field': ('id',), \
+            'aggregate': 'count', 'x-bucket': 'day'})
+        self.assertEqual(content['data'][0]['data'], [[calendar.timegm((2013, 1, d, 0, 0, 0)) * 1000, c] \
+            for d, c in ((1, 7), (2, 7), (3, 7))])
+
+    def test_category_aggregate(self):
+        content = self.get_datas({'title': 'Staff', 'x-field': 'is_staff', 'y-field': ('id',), \
+            'aggregate': {'id': 'count'}})
+        self.assertEqual(content['data'][0]['data'], [[0, 10], [1, 10]])
+        self.assertEqual(content['option']['xaxis']['ticks'], [[0, 'False'], [1, 'True']])
+
+    def test_incremental_cache(self):
+        import datetime
+        from django.core.cache import cache
+
+        chart = {'title': 'Joined', 'x-field': 'date_joined', 'y-field': ('id',), 'aggregate': 'count', \
+            'x-bucket': 'day', 'cache-timeout': 60, 'incremental': True}
+        from exadmin.plugins import chart as chart_plugin
+
+        writes = []
+        class WriteCounter(object):
+            def __getattr__(self, name):
+                return getattr(cache, name)
+            def set(self, *args):
+                writes.append(args[0])
+                return cache.set(*args)
+
+        cache.clear()
+        chart_plugin.cache = WriteCounter()
+        try:
+            self.get_datas(chart)
+            # Hits without new rows do not write the cache, so it expires in timeout
+            self.get_datas(chart)
+            self.assertEqual(len(writes), 1)
+
+            User.objects.create(username='user20', date_joined=datetime.datetime(2013, 1, 3, 12))
+            # Rows of cached buckets are not read again
+            User.objects.filter(username='user0').delete()
+            content = self.get_datas(chart)
+            self.assertEqual([y for x, y in content['data'][0]['data']], [7, 7, 7])
+            self.assertEqual(len(writes), 2)
+        finally:
+            chart_plugin.cache = cache
+            cache.clear()
+
+    def test_incremental_naive_since(self):
+        import datetime
+        from django.core.cache import cache
+
+        chart = {'title': 'Joined', 'x-field': 'date_joined', 'y-field': ('id',), 'max-points': 100, \
+            'cache-timeout': 60, 'incremental': True}
+        cache.clear()
+        # Naive cached x is in UTC, the rows of 2013-01-03 are at 16:02 to 16:17 UTC
+        label = self.get_datas(chart)['data'][0]['label']
+        cache.set(self.get_view(chart).get_chart_cache_key('chart'), \
+            ([{'data': [(datetime.datetime(2013, 1, 3, 16), 0)], 'label': label}], {}), 60)
+        content = self.get_datas(chart)
+        self.assertEqual(len(content['data'][0]['data']), 7)
+        cache.clear()
+
+    def test_downsample(self):
+        from exadmin.plugins.chart import lttb, minmax
+
+        points = [(i, (i % 10) * (i % 7)) for i in range(1000)]
+        sampled = lttb(points, 100)
+        self.assertEqual(len(sampled), 100)
+        self.assertEqual((sampled[0], sampled[-1]), (points[0], points[-1]))
+        self.assertEqual(sampled, sorted(sampled))
+
+        sampled = minmax(points, 100)
+        self.assertTrue(len(sampled) <= 100)
+        self.assertIn(max(points, key=lambda p: p[1]), sampled)
+        self.assertIn(min(points, key=lambda p: p[1]), sampled)
+
+    def test_week_average(self):
+        import datetime
+
+        view = self.get_view({'title': 'Joined', 'x-field': 'date_joined', 'y-field': ('id',), \
+            'aggregate': 'avg', 'x-bucket': 'week'})
+        view.chart = view.data_charts['chart']
+        view.x_field, view.y_fields, view.x_range, view.since = 'date_joined', ('id',), None, None
+        self.assertEqual(sorted(view.get_aggregate_queryset('week')[0].keys()), ['_n0', '_x', '_y0'])
+
+        # Averages of days are weighted by the count of their values
+        rows = view.merge_week_rows([{'_x': datetime.date(2013, 1, 7), '_y0': 10.0, '_n0': 1}, \
+            {'_x': datetime.date(2013, 1, 8), '_y0': 20.0, '_n0': 3}, {'_x': datetime.date(2013, 1, 9), '_y0': None, '_n0': 0}])
+        self.assertEqual(rows, [{'_x': datetime.date(2013, 1, 7), '_y0': 17.5, '_n0': 4}])
+
+    def test_offset_changes(self):
+        import calendar, datetime
+        from django.utils import timezone
+
+        class ShiftZone(datetime.tzinfo):
+            # UTC before 2013-03-10 06:00 UTC, UTC+1 after
+            change = datetime.datetime(2013, 3, 10, 6)
+
+            def utcoffset(self, dt):
+                return datetime.timedelta(hours=dt.replace(tzinfo=None) >= self.change and 1 or 0)
+
+            def fromutc(self, dt):
+                dt = dt.replace(tzinfo=None)
+                return (dt + datetime.timedelta(hours=dt >= self.change and 1 or 0)).replace(tzinfo=self)
+
+            def dst(self, dt):
+                return datetime.timedelta(0)
+
+            def tzname(self, dt):
+                return 'Shift'
+
+        User.objects.all().delete()
+        for username, joined in (('before', datetime.datetime(2013, 3, 9, 23, 30)), \
+                ('after', datetime.datetime(2013, 3, 10, 23, 30))):
+            User.objects.create(username=username, date_joined=timezone.make_aware(joined, timezone.utc))
+
+        timezone.activate(ShiftZone())
+        try:
+            content = self.get_datas({'title': 'Joined', 'x-field': 'date_joined', 'y-field': ('id',), \
+                'aggregate': 'count', 'x-bucket': 'day'}, 2)
+        finally:
+            timezone.deactivate()
+        # Each row is shifted by the offset of its time, not by the offset of now
+        self.assertEqual(content['data'][0]['data'], [[calendar.timegm((2013, 3, d, 0, 0, 0)) * 1000, 1] \
+            for d in (9, 11)])
+
+    def test_relation_ticks(self):
+        from django.utils import simplejson
+        from exadmin.models import UserSettings
+        from exadmin.plugins.chart import ChartsView
+
+        for user in User.objects.filter(username__in=['user1', 'user2']):
+            UserSettings.objects.create(user=user, key='key', value='{}')
+        site = AdminSite('test', 'test_app')
+        site.register(UserSettings, type('SettingsChartAdmin', (object,), {'data_charts': {'chart': \
+            {'title': 'Settings', 'x-field': 'user', 'y-field': ('id',), 'aggregate': 'count'}}}))
+        view = site.get_view_class(ChartsView, site._registry[UserSettings])(self.get_factory().get('/'))
+
+        # The users of ticks are loaded by one query
+        with self.assertNumQueries(2):
+            content = simplejson.loads(view.get(view.request, 'chart').content)
+        self.assertEqual(sorted([label for i, label in content['option']['xaxis']['ticks']]), ['user1', 'user2'])
+
+    def test_cached_raw_points(self):
+        import datetime
+        from django.core.cache import cache
+
+        chart = {'title': 'Joined', 'x-field': 'date_joined', 'y-field': ('id',), 'max-points': 5, \
+            'cache-timeout': 60, 'incremental': True}
+        cache.clear()
+        self.assertEqual(len(self.get_datas(chart)['data'][0]['data']), 5)
+        User.objects.create(username='user20', date_joined=datetime.datetime(2013, 1, 4))
+        self.assertEqual(len(self.get_datas(chart)['data'][0]['data']), 5)
+
+        # The cached series keep all points, new rows are merged into them
+        datas, option = cache.get(self.get_view(chart).get_chart_cache_key('chart'))
+        self.assertEqual(len(datas[0]['data']), 21)
+        cache.clear()
@@ -0,0 +1,211 @@
+from exadmin.tests.base import TestCase
+from django.contrib.auth.models import User, Group
+
+from exadmin.sites import AdminSite
+from exadmin.views import ListAdminView
+
+class UserExportAdmin(object):
+    list_display = ('username', 'groups')
+    export_chunk_size = 25
+
+class ExportStreamTest(TestCase):
+
+    def setUp(self):
+        group = Group.objects.create(name='group')
+        for i in range(60):
+            User.objects.create(username='user%d' % i).groups.add(group)
+
+    def test_stream_export(self):
+        from exadmin.plugins.export import ExportPlugin
+
+        site = AdminSite('test', 'test_app')
+        site.register_plugin(ExportPlugin, ListAdminView)
+        site.register(User, UserExportAdmin)
+        request = self.get_factory().get('/', {'_do_': 'export', 'export_type': 'csv', \
+            'export_csv_header': 'on', 'all': 'on'})
+        view = site.get_view_class(ListAdminView, site._registry[User])(request)
+
+        # Rows are queried while the response is sent, a query for each chunk of 25 rows
+        # sought from the last row of previous chunk, and a prefetch query for each chunk
+        with self.assertNumQueries(0):
+            response = view.get_result_list()
+        with self.assertNumQueries(6):
+            content = ''.join(response)
+        lines = content.splitlines()
+        self.assertEqual(len(lines), 61)
+        self.assertEqual(lines[0], '"username","groups"')
+        self.assertEqual(lines[1], '"user59","group"')
+
+    def test_typed_stream_export(self):
+        from django.utils import simplejson
+        from exadmin.plugins.export import ExportPlugin
+
+        site = AdminSite('test', 'test_app')
+        site.register_plugin(ExportPlugin, ListAdminView)
+        site.register(User, type('UserTypedAdmin', (UserExportAdmin,), {
+            'list_display': ('username', 'is_staff', 'last_login'), 'list_per_page': 100}))
+        view_class = site.get_view_class(ListAdminView, site._registry[User])
+
+        def export(export_type):
+            response = view_class(self.get_factory().get('/', {'_do_': 'export', 'export_type': export_type, 'all': 'on'})).get_result_list()
+            return ''.join(response)
+
+        lines = export('ndjson').splitlines()
+        self.assertEqual(len(lines), 60)
+        row = simplejson.loads(lines[0])
+        self.assertEqual(row.keys(), ['username', 'is_staff', 'last_login'])
+        self.assertEqual(row['is_staff'], False)
+        self.assertEqual(row['last_login'], User.objects.get(username='user59').last_login.isoformat())
+
+        content = export('xml')
+        self.assertTrue(content.endswith('</objects>'))
+        self.assertIn('<row><username>user59</username><is_staff>false</is_staff>', content)
+
+        # The rows of a page are written as the rows of all datas
+        for export_type in ('xml', 'ndjson'):
+            view = view_class(self.get_factory().get('/', {'_do_': 'export', 'export_type': export_type}))
+            view.url_for_result = lambda result: '#%s' % result.pk
+            view.make_result_list()
+            plugin = [p for p in view.plugins if isinstance(p, ExportPlugin)][0]
+            page = getattr(plugin, 'get_%s_export' % export_type)({'result_headers': view.result_headers(), 'results': view.results()})
+            self.assertEqual(page, export(export_type))
+
+    def test_export_chunks(self):
+        from exadmin.plugins.export import ExportPlugin
+
+        site = AdminSite('test', 'test_app')
+        site.register_plugin(ExportPlugin, ListAdminView)
+        site.register(User, type('UserOrderedAdmin', (UserExportAdmin,), {
+            'list_display': ('username',), 'ordering': ('is_staff', 'username')}))
+        User.objects.filter(username__endswith='7').update(is_staff=True)
+        expected = list(User.objects.order_by('is_staff', 'username', '-pk').values_list('username', flat=True))
+
+        def export(keyset):
+            view = site.get_view_class(ListAdminView, site._registry[User])(self.get_factory().get('/', \
+                {'_do_': 'export', 'export_type': 'csv', 'all': 'on'}))
+            plugin = [p for p in view.plugins if isinstance(p, ExportPlugin)][0]
+            if not keyset:
+                view.get_keyset_fields = lambda: None
+            return [line.strip('"') for line in ''.join(plugin.get_export_stream()).splitlines()]
+
+        # Sought by the ordering fields, or sliced by offset
+        self.assertEqual(export(True), expected)
+        self.assertEqual(export(False), expected)
+
+    def test_page_export_items(self):
+        from exadmin.plugins.export import ExportPlugin
+
+        site = AdminSite('test', 'test_app')
+        site.register_plugin(ExportPlugin, ListAdminView)
+        site.register(User, type('UserPageAdmin', (UserExportAdmin,), {
+            'list_per_page': 10, 'url_for_result': lambda self, result: '#%s' % result.pk}))
+        view = site.get_view_class(ListAdminView, site._registry[User])( \
+            self.get_factory().get('/', {'_do_': 'export', 'export_type': 'csv'}))
+        view.make_result_list()
+
+        rows = [view.result_headers()] + view.results()
+        cells = sum([row.cells for row in rows], [])
+        self.assertEqual(len(cells), 22)
+        self.assertTrue(all([c.export for c in cells]))
+        # Export flags are kept in the slots, rows and cells have no instance dict
+        self.assertFalse([o for o in rows + cells if hasattr(o, '__dict__')])
+
+    def test_xlsx_sheet_rollover(self):
+        import datetime, StringIO, zipfile
+        from exadmin.plugins.export import XlsxWriter
+
+        writer = XlsxWriter('Users', ['name', 'joined'], max_rows=3)
+        for i in range(5):
+            writer.write_row([u'user%d' % i, datetime.date(2013, 1, i + 1)])
+        output = StringIO.StringIO()
+        writer.save(output)
+
+        zf = zipfile.ZipFile(output)
+        self.assertIn('name="Users (2)"', zf.read('xl/workbook.xml'))
+        # Each sheet starts with the header row, and keeps the date style
+        sheet = zf.read('xl/worksheets/sheet2.xml')
+        self.assertEqual(sheet.count('<row '), 3)
+        self.assertIn('<c r="A1" t="inlineStr" s="4"><is><t xml:space="preserve">name</t></is></c>', sheet)
+        self.assertIn('<c r="B3" s="2"><v>41278</v></c>', sheet)
+
+    def test_export_job(self):
+        import os
+        from exadmin.plugins.export import ExportPlugin, ExportJobView, EXPORT_JOB_KEY, run_export_job
+        from exadmin.models import UserSettings
+
+        site = AdminSite('test', 'test_app')
+        site.register_plugin(ExportPlugin, ListAdminView)
+        site.register_modelview(r'^export/(\w+)/$', ExportJobView, name='%s_%s_export')
+        site.register(User, type('UserJobAdmin', (UserExportAdmin,), {'export_job': 'command'}))
+        request = self.get_factory().get('/', {'_do_': 'export', 'export_type': 'csv', 'all': 'on'})
+        request.user = User.objects.create(username='exporter', is_superuser=True)
+        view = site.get_view_class(ListAdminView, site._registry[User])(request)
+        view.model_admin_url = lambda name, *args: '/%s/%s/' % (name, '/'.join(args))
+
+        job_id = view.get_result_list()['Location'].split('/')[-2]
+        job = UserSettings.objects.get(user=request.user, key=EXPORT_JOB_KEY % job_id)
+        self.assertEqual(job.json_value()['status'], 'pending')
+
+        self.assertTrue(run_export_job(job.pk, site))
+        self.assertFalse(run_export_job(job.pk, site))
+        data = UserSettings.objects.get(pk=job.pk).json_value()
+        self.assertEqual((data['status'], data['rows'], data['total']), ('done', 61, 61))
+        self.assertEqual(len(open(data['file']).read().splitlines()), 61)
+        os.remove(data['file'])
+
+    def test_export_job_command(self):
+        import os
+        from django.core.management import call_command
+        from exadmin.models import UserSettings
+        from exadmin.plugins.export import EXPORT_JOB_KEY
+
+        # Jobs run by the list view of the site, with all the plugins of it
+        user = User.objects.create(username='exporter', is_superuser=True)
+        job = UserSettings(user=user, key=EXPORT_JOB_KEY % 'command')
+        job.set_json({'model': 'auth.user', 'path': '/auth/user/', 'params': '_do_=export&all=on&export_type=csv&o=username&_q_=user1', \
+            'type': 'csv', 'status': 'pending', 'rows': 0, 'total': None})
+        job.save()
+
+        call_command('run_export_jobs', verbosity=0)
+        data = UserSettings.objects.get(pk=job.pk).json_value()
+        self.assertEqual((data['status'], data['rows']), ('done', 11))
+        self.assertEqual(open(data['file']).read().splitlines()[0].split(',')[0], '"user1"')
+        os.remove(data['file'])
+
+    def test_export_job_reclaim(self):
+        import datetime, os
+        from exadmin.models import UserSettings
+        from exadmin.plugins import export
+
+        user = User.objects.create(username='exporter', is_superuser=True)
+        two_hours_ago = (datetime.datetime.now() - datetime.timedelta(hours=2)).strftime(export.EXPORT_JOB_TIME_FORMAT)
+
+        def create_job(name, **data):
+            job = UserSettings(user=user, key=export.EXPORT_JOB_KEY % name)
+            job.set_json(dict({'model': 'auth.user', 'params': '', 'type': 'csv', 'rows': 10, 'total': 60, \
+                'created': two_hours_ago, 'updated': two_hours_ago}, **data))
+            job.save()
+            return job
+
+        stale = create_job('stale', status='running', attempts=1)
+        crashing = create_job('crashing', status='running', attempts=export.EXPORT_JOB_ATTEMPTS)
+        alive = create_job('alive', status='running', attempts=1, updated=datetime.datetime.now().strftime(export.EXPORT_JOB_TIME_FORMAT))
+        create_job('pending', status='pending')
+
+        # Jobs of a status are filtered by the query
+        self.assertEqual([j.pk for j in export.get_export_jobs('running')], [stale.pk, crashing.pk, alive.pk])
+        self.assertEqual(export.reclaim_export_jobs(), [stale.pk])
+        status = lambda job: UserSettings.objects.get(pk=job.pk).json_value()['status']
+        self.assertEqual([status(stale), status(crashing), status(alive)], ['pending', 'failed', 'running'])
+
+        # Finished jobs are deleted with their files when expired
+        path = os.path.join(export.EXPORT_JOB_ROOT, 'expired.csv')
+        if not os.path.isdir(export.EXPORT_JOB_ROOT):
+            os.makedirs(export.EXPORT_JOB_ROOT)
+        open(path, 'w').close()
+        expired = create_job('expired', status='done', file=path, finished=two_hours_ago)
+        export.clean_export_jobs(3600)
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(UserSettings.objects.filter(pk=expired.pk).exists())
+        # The job failed by reclaim is just finished
+        self.assertEqual(UserSettings.objects.filter(key__startswith=export.EXPORT_JOB_KEY % '').count(), 4)
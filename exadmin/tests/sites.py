@@ -86,3 +86,37 @@ class AdminSiteTest(TestCase):
         self.assertEqual(app_name, 'test_app')
         self.assertEqual(namespace, 'test')
 
+
+class AdminSiteReverseTest(TestCase):
+    urls = 'exadmin.tests.urls'
+
+    def test_url_template(self):
+        from exadmin.tests.urls import site
+
+        self.assertEqual(site.reverse('test:exadmin_modela_change', 'a_2Fb'), '/admin/exadmin/modela/a_2Fb/update/')
+        self.assertEqual(site.reverse('test:exadmin_modela_change', 12), '/admin/exadmin/modela/12/update/')
+        self.assertIn('/admin/exadmin/modela/%s/update/', site._url_templates.values())
+
+    def test_reverse_fallback(self):
+        from django.core.urlresolvers import NoReverseMatch
+        from exadmin.tests.urls import site
+
+        # Args are checked by the url pattern, so the url is not made from a template
+        self.assertEqual(site.reverse('test:exadmin_modela_number', 12), '/admin/exadmin/modela/12/number/')
+        self.assertIn(False, site._url_templates.values())
+        self.assertRaises(NoReverseMatch, site.reverse, 'test:exadmin_modela_number', 'a')
+
+    def test_result_url(self):
+        from exadmin.tests.urls import site
+        from exadmin.views import ListAdminView
+
+        perms = []
+        user = self.get_user()
+        user.has_perm = lambda perm: perms.append(perm) or perm.startswith('exadmin.change_')
+        view = site.get_view_class(ListAdminView, site._registry[ModelA])(self.get_factory(user).get('/'))
+        del perms[:]
+
+        self.assertEqual(view.url_for_result(ModelA(id='a/b')), '/admin/exadmin/modela/a_2Fb/update/')
+        self.assertEqual(view.url_for_result(ModelA(id=2)), '/admin/exadmin/modela/2/update/')
+        # The model permission is checked once, not for each row
+        self.assertEqual(perms, ['exadmin.change_modela'])
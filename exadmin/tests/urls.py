@@ -0,0 +1,20 @@
+from django.conf.urls import patterns, include, url
+
+from exadmin.sites import AdminSite
+from exadmin.views import ListAdminView, UpdateAdminView, DetailAdminView
+
+from models import ModelA
+
+class ModelAAdmin(object):
+    pass
+
+site = AdminSite('test', 'test_app')
+site.register(ModelA, ModelAAdmin)
+site.register_modelview(r'^$', ListAdminView, name='%s_%s_changelist')
+site.register_modelview(r'^(.+)/update/$', UpdateAdminView, name='%s_%s_change')
+site.register_modelview(r'^(.+)/detail/$', DetailAdminView, name='%s_%s_detail')
+site.register_modelview(r'^(\d+)/number/$', DetailAdminView, name='%s_%s_number')
+
+urlpatterns = patterns('',
+    url(r'^admin/', include(site.urls)),
+)
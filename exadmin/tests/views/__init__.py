@@ -1,2 +1,4 @@
 from exadmin.tests.views.base import *
-from exadmin.tests.views.model import *
\ No newline at end of file
+from exadmin.tests.views.model import *
+from exadmin.tests.views.list import *
+from exadmin.tests.views.dashboard import *
@@ -0,0 +1,244 @@
+import functools
+import inspect
+import sys
+import threading
+import time
+from inspect import getargspec
+
+from exadmin.tests.base import TestCase
+from django.contrib.auth.models import User
+from django.db import connection
+from django.http import HttpResponse
+
+from exadmin.sites import AdminSite
+from exadmin.views import BaseAdminView, BaseAdminPlugin, filter_hook
+from exadmin.views import base as views_base
+from exadmin.views.base import PROFILE_HEADER, HookProfiler
+
+def legacy_filter_hook(func):
+    """
+    The ``filter_hook`` implementation before the filter dispatch table, only used
+    as the baseline of hook benchmark.
+    """
+    tag = func.__name__
+
+    def filter_chain(filters, token, func, *args, **kwargs):
+        if token == -1:
+            return func()
+        else:
+            def _inner_method():
+                fm = filters[token]
+                fargs = getargspec(fm)[0]
+                if len(fargs) == 1:
+                    result = func()
+                    if result is None:
+                        return fm()
+                return fm(func if fargs[1] == '__' else func(), *args, **kwargs)
+            return filter_chain(filters, token-1, _inner_method, *args, **kwargs)
+
+    @functools.wraps(func)
+    def method(self, *args, **kwargs):
+        def _inner_method():
+            return func(self, *args, **kwargs)
+        filters = [(getattr(getattr(p, tag), 'priority', 10), getattr(p, tag)) \
+            for p in self.plugins if callable(getattr(p, tag, None))]
+        filters = [f for p,f in sorted(filters, key=lambda x:x[0])]
+        return filter_chain(filters, len(filters)-1, _inner_method, *args, **kwargs)
+    return method
+
+class HookTestView(BaseAdminView):
+
+    @filter_hook
+    def get_items(self):
+        return ['view']
+
+    @filter_hook
+    def result_item(self, obj, field_name):
+        return [obj, field_name]
+
+    @legacy_filter_hook
+    def legacy_result_item(self, obj, field_name):
+        return [obj, field_name]
+
+    def get(self, request):
+        return HttpResponse(','.join(self.get_items()))
+
+class AppendPlugin(BaseAdminPlugin):
+
+    def get_items(self, items):
+        items.append('append')
+        return items
+
+class LazyPlugin(BaseAdminPlugin):
+
+    def get_items(self, __):
+        return ['lazy'] + __()
+
+class FirstPlugin(BaseAdminPlugin):
+
+    def get_items(self, items):
+        items.append('first')
+        return items
+    get_items.priority = 1
+
+class InactivePlugin(BaseAdminPlugin):
+
+    def init_request(self, *args, **kwargs):
+        return False
+
+    def get_items(self, items):
+        items.append('inactive')
+        return items
+
+def make_item_plugin(i):
+    def result_item(self, item, obj, field_name):
+        item.append(i)
+        return item
+    return type('ItemPlugin%d' % i, (BaseAdminPlugin,), {
+        'result_item': result_item, 'legacy_result_item': result_item})
+
+class FilterHookTest(TestCase):
+
+    def get_site(self):
+        site = AdminSite('test', 'test_app')
+        site.register_view(r"^test/$", HookTestView, 'test')
+        return site
+
+    def get_view(self, site):
+        return site.get_view_class(HookTestView)(self.get_factory().get('test/'))
+
+    def test_dispatch_table(self):
+        site = self.get_site()
+        site.register_plugin(AppendPlugin, HookTestView)
+        site.register_plugin(FirstPlugin, HookTestView)
+
+        c = site.get_view_class(HookTestView)
+        self.assertIn('get_items', c.filter_hooks)
+        self.assertEqual([c.plugin_classes[i] for i, style in c.filter_hooks['get_items']], \
+            [FirstPlugin, AppendPlugin])
+
+    def test_filter_order(self):
+        site = self.get_site()
+        site.register_plugin(AppendPlugin, HookTestView)
+        site.register_plugin(LazyPlugin, HookTestView)
+        site.register_plugin(FirstPlugin, HookTestView)
+        site.register_plugin(InactivePlugin, HookTestView)
+
+        self.assertEqual(self.get_view(site).get_items(), ['lazy', 'view', 'append', 'first'])
+
+    def test_dispatch_calls(self):
+        site = self.get_site()
+        for i in range(10):
+            site.register_plugin(make_item_plugin(i), HookTestView)
+        view = self.get_view(site)
+
+        calls = []
+        def counted_getargspec(func):
+            calls.append(func)
+            return inspect.getargspec(func)
+
+        def count(module, method):
+            del calls[:]
+            module.getargspec = counted_getargspec
+            try:
+                for i in xrange(5):
+                    result = method('obj', 'name')
+            finally:
+                module.getargspec = inspect.getargspec
+            return result, len(calls)
+
+        legacy_result, legacy_calls = count(sys.modules[__name__], view.legacy_result_item)
+        result, dispatch_calls = count(views_base, view.result_item)
+        self.assertEqual(result, legacy_result)
+        # The legacy hook resolves the argument style of each plugin on every call
+        self.assertEqual(legacy_calls, 50)
+        self.assertEqual(dispatch_calls, 0)
+
+class GetOnlyPlugin(BaseAdminPlugin):
+    active_methods = ('get',)
+
+    def get_items(self, items):
+        items.append('get')
+        return items
+
+class AttrPlugin(BaseAdminPlugin):
+    show_attr = False
+    active_attrs = ('show_attr',)
+
+    def get_items(self, items):
+        items.append('attr')
+        return items
+
+class ParamPlugin(BaseAdminPlugin):
+    active_params = ('_param_',)
+
+    def get_items(self, items):
+        items.append('param')
+        return items
+
+class PluginActivationTest(TestCase):
+
+    def get_site(self):
+        site = AdminSite('test', 'test_app')
+        site.register_view(r"^test/$", HookTestView, 'test')
+        site.register_plugin(GetOnlyPlugin, HookTestView)
+        site.register_plugin(AttrPlugin, HookTestView)
+        site.register_plugin(ParamPlugin, HookTestView)
+        return site
+
+    def test_active_methods(self):
+        c = self.get_site().get_view_class(HookTestView)
+        self.assertEqual(c(self.get_factory().get('test/')).get_items(), ['view', 'get'])
+        view = c(self.get_factory().post('test/'))
+        self.assertEqual(view.base_plugins, [None, None, None])
+        self.assertEqual(view.get_items(), ['view'])
+
+    def test_active_attrs(self):
+        site = self.get_site()
+        site.register(HookTestView, type('AttrOption', (object,), {'show_attr': True}))
+        c = site.get_view_class(HookTestView)
+        self.assertEqual(c(self.get_factory().get('test/')).get_items(), ['view', 'attr', 'get'])
+
+    def test_active_params(self):
+        c = self.get_site().get_view_class(HookTestView)
+        self.assertEqual(c(self.get_factory().get('test/', {'_param_a': 1})).get_items(), \
+            ['view', 'param', 'get'])
+
+class HookProfileTest(TestCase):
+
+    def test_profile(self):
+        site = AdminSite('test', 'test_app')
+        site.register_view(r"^test/$", HookTestView, 'test')
+        site.register_plugin(AppendPlugin, HookTestView)
+        site.register_plugin(LazyPlugin, HookTestView)
+        site.register(HookTestView, type('ProfileOption', (object,), {'enable_profile': True}))
+
+        request = self.get_factory().get('test/')
+        connection.use_debug_cursor = None
+        response = site.get_view_class(HookTestView).as_view()(request)
+        self.assertEqual(response.content, 'lazy,view,append')
+        self.assertIn(PROFILE_HEADER, response)
+        self.assertEqual(connection.use_debug_cursor, None)
+
+        stats = dict([((s['hook'], s['plugin']), s['calls']) for s in request.hook_profiler.get_stats()])
+        self.assertEqual(stats, {('get_items', 'view'): 1, ('get_items', 'AppendPlugin'): 1,
+            ('get_items', 'LazyPlugin'): 1})
+
+    def test_thread_profile(self):
+        profiler = HookProfiler(self.get_factory().get('test/'))
+        started, event = threading.Event(), threading.Event()
+
+        def outer():
+            started.set()
+            event.wait(5)
+
+        # A hook called in another thread is not an inner call of the running hook
+        thread = threading.Thread(target=profiler.call, args=('outer', 'view', outer))
+        thread.start()
+        started.wait(5)
+        profiler.call('inner', 'view', time.sleep, 0.05)
+        event.set()
+        thread.join()
+
+        stats = dict([(s['hook'], s['time']) for s in profiler.get_stats()])
+        self.assertTrue(stats['outer'] >= stats['inner'] >= 45, stats)
@@ -0,0 +1,253 @@
+import threading
+
+from exadmin.tests.base import TestCase
+from django.contrib.auth.models import User, Group
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from exadmin.sites import AdminSite
+from exadmin.views import ListAdminView
+from exadmin.views.dashboard import Dashboard, HtmlWidget, PartialListWidget
+
+class BlockWidget(object):
+
+    def __init__(self, id, event=None):
+        self.id = id
+        self.event = event
+        self.rendered = None
+
+    def render(self):
+        # The id is swapped while rendering, as widgets cached for permissions do
+        widget_id, self.id = self.id, 'swapped'
+        try:
+            if self.event is not None:
+                self.event.wait(5)
+        finally:
+            self.id = widget_id
+        return 'widget%s' % self.id
+
+    def render_placeholder(self, message):
+        return 'placeholder%s' % self.id
+
+class UserListWidget(PartialListWidget):
+    template = 'admin/widgets/list.html'
+    connection = None
+
+    def setup(self):
+        super(UserListWidget, self).setup()
+        self.list_view = self.get_list_view(User, {})
+
+    def render(self):
+        # A thread opens its own connection, which is a new and empty database for
+        # the in-memory sqlite of tests, so the connection of test is shared
+        if self.connection is not None:
+            connections[DEFAULT_DB_ALIAS] = self.connection
+        return super(UserListWidget, self).render()
+
+class DashboardRenderTest(TestCase):
+
+    def get_view(self, **opts):
+        site = AdminSite('test', 'test_app')
+        site.register(Dashboard, type('ThreadDashboard', (object,), dict({
+            'widget_render': 'thread', 'widget_render_timeout': 0.5}, **opts)))
+        site.register(User, type('UserListAdmin', (object,), {'list_display': ('username',), \
+            'url_for_result': lambda self, result: '#%s' % result.pk}))
+        return site.get_view_class(Dashboard)(self.get_factory().get('/'))
+
+    def test_thread_render(self):
+        view = self.get_view()
+        event = threading.Event()
+        widgets = [BlockWidget(i) for i in range(3)] + [BlockWidget(3, event)]
+        try:
+            view.render_widgets(widgets)
+        finally:
+            event.set()
+        self.assertEqual([w.rendered for w in widgets], ['widget0', 'widget1', 'widget2', 'placeholder3'])
+
+    def test_timed_out_widgets(self):
+        event = threading.Event()
+        try:
+            blocked = [BlockWidget(0, event), BlockWidget(1, event)]
+            self.get_view(widget_render_workers=2).render_widgets(blocked)
+            self.assertEqual([w.rendered for w in blocked], ['placeholder0', 'placeholder1'])
+
+            # Widgets still rendering for the last request do not hold up this one
+            widgets = [BlockWidget(2), BlockWidget(3)]
+            self.get_view(widget_render_workers=2).render_widgets(widgets)
+            self.assertEqual([w.rendered for w in widgets], ['widget2', 'widget3'])
+        finally:
+            event.set()
+
+    def test_thread_db_widget(self):
+        for i in range(3):
+            User.objects.create(username='user%d' % i)
+        # One worker, the shared connection is not used by two threads at once
+        view = self.get_view(widget_render_workers=1, widget_render_timeout=5)
+        widgets = [UserListWidget(view, {'id': i}) for i in range(2)]
+        connection = connections[DEFAULT_DB_ALIAS]
+        connection.allow_thread_sharing = True
+        try:
+            for widget in widgets:
+                widget.connection = connection
+            view.render_widgets(widgets)
+        finally:
+            connection.allow_thread_sharing = False
+        for widget in widgets:
+            self.assertIn('user2', widget.rendered)
+            self.assertIn('id="%s"' % widget.id, widget.rendered)
+
+    def test_ajax_render(self):
+        from exadmin.models import UserWidget
+
+        request = self.get_factory().get('/')
+        request.user = User.objects.create(username='ajax', is_superuser=True)
+        site = AdminSite('test', 'test_app')
+        site.register(Dashboard, type('AjaxDashboard', (object,), {'widget_render': 'ajax'}))
+        view = site.get_view_class(Dashboard)(request)
+        user_widget = UserWidget(user=request.user, page_id=view.get_page_id(), widget_type='html')
+        user_widget.set_value({'title': 'Html', 'content': '<p>content</p>', 'refresh': 30})
+        user_widget.save()
+
+        # The page has the frame of widget only, with its url and refresh seconds
+        widget = view.get_widget(user_widget)
+        view.render_widgets([widget])
+        self.assertIn('widget-frame', widget.widget)
+        self.assertIn('data-widget-url="/?_widget=%s"' % widget.id, widget.widget)
+        self.assertIn('data-widget-refresh="30"', widget.widget)
+        self.assertIn('Loading...', widget.widget)
+        self.assertNotIn('<p>content</p>', widget.widget)
+
+        # The widget url loads the widget in place of the frame
+        html = view.get_widget_response(str(widget.id)).content
+        self.assertIn('<p>content</p>', html)
+        self.assertIn('id="%s" data-widget-url="/?_widget=%s"' % (widget.id, widget.id), html)
+        self.assertNotIn('widget-frame', html)
+
+class UserHtmlWidget(HtmlWidget):
+    cache_timeout = 60
+    cache_models = (User,)
+
+class WidgetCacheTest(TestCase):
+
+    def get_widget(self, id=1, user=None):
+        site = AdminSite('test', 'test_app')
+        dashboard = site.get_view_class(Dashboard)(self.get_factory(user).get('/'))
+        return UserHtmlWidget(dashboard, {'id': id, 'title': 'Html', 'content': '<p>content</p>'})
+
+    def test_widget_cache(self):
+        from django.core.cache import cache
+        cache.clear()
+
+        html = self.get_widget().widget
+        self.assertIn('<p>content</p>', html)
+        widget = self.get_widget()
+        self.assertEqual(widget.widget, html)
+        self.assertTrue(widget.cached)
+
+        User.objects.create(username='widget')
+        widget = self.get_widget()
+        self.assertEqual(widget.get_cached(), None)
+        cache.clear()
+
+    def test_shared_widget_cache(self):
+        from django.core.cache import cache
+        cache.clear()
+
+        html = self.get_widget(1).widget
+        # Same widget of another user with the same permissions
+        widget = self.get_widget(2, User(username='other', is_superuser=True))
+        self.assertTrue(widget.get_cached())
+        self.assertIn('id="1" data-widget-url="/?_widget=1"', html)
+        self.assertIn('id="2" data-widget-url="/?_widget=2"', widget.widget)
+        self.assertNotIn('EXADMIN_WIDGET_ID', widget.widget)
+        cache.clear()
+
+class DashboardInitTest(TestCase):
+
+    def test_init_widgets(self):
+        from exadmin.models import UserSettings, UserWidget
+
+        site = AdminSite('test', 'test_app')
+        site.register(Dashboard, type('InitDashboard', (object,), {'widgets': [
+            [{'type': 'html', 'content': 'a'}, {'type': 'html', 'refresh': 'bad'}],
+            [{'type': 'qbutton'}, {'type': 'html', 'content': 'b'}],
+        ]}))
+        request = self.get_factory().get('/')
+        request.user = User.objects.create(username='init', is_superuser=True)
+        view = site.get_view_class(Dashboard)(request)
+
+        # Widgets of other users and pages, and of the page without position, are not loaded
+        other = UserWidget(user=User.objects.create(username='other'), page_id=view.get_page_id(), widget_type='html')
+        other.set_value({'type': 'html', 'content': 'other'})
+        other.save()
+        UserWidget(user=request.user, page_id='/other/', widget_type='html').save()
+        old = UserWidget(user=request.user, page_id=view.get_page_id(), widget_type='html')
+        old.set_value({'type': 'html', 'content': 'old'})
+        old.save()
+
+        # Portal lookup, last widget id, insert and load of widgets, delete of the failed
+        # widget (collect and delete), and the portal position
+        with self.assertNumQueries(7):
+            widgets = view.get_widgets()
+        self.assertEqual([[w.widget_type for w in col] for col in widgets], [['html'], ['qbutton', 'html']])
+        self.assertTrue(old.id < min([w.id for col in widgets for w in col]))
+        self.assertEqual([len(col) for col in widgets], [1, 2])
+        self.assertEqual(UserWidget.objects.filter(user=request.user, page_id=view.get_page_id()).count(), 4)
+        self.assertEqual(UserSettings.objects.get(user=request.user, key=view.get_portal_key()).value, \
+            '|'.join([','.join([str(w.id) for w in col]) for col in widgets]))
+
+        # Portal position and widgets of page
+        with self.assertNumQueries(2):
+            self.assertEqual([[w.id for w in col] for col in view.get_widgets()], \
+                [[w.id for w in col] for col in widgets])
+
+class WidgetErrorTest(TestCase):
+
+    def test_widget_error(self):
+        from exadmin.models import UserSettings, UserWidget
+        from exadmin.views.dashboard import WidgetErrorBox
+
+        request = self.get_factory().get('/')
+        request.user = User.objects.create(username='error', is_superuser=True)
+        site = AdminSite('test', 'test_app')
+        view = site.get_view_class(Dashboard)(request)
+        widget = UserWidget(user=request.user, page_id=view.get_page_id(), widget_type='html')
+        widget.set_value({'title': 'Broken', 'refresh': 'bad'})
+        widget.save()
+        UserSettings(user=request.user, key=view.get_portal_key(), value=str(widget.id)).save()
+
+        # The page and the widget url show the same box
+        box = view.get_widgets()[0][0]
+        self.assertTrue(isinstance(box, WidgetErrorBox))
+        response = view.get_widget_response(str(widget.id))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, box.widget)
+        self.assertIn('Broken', box.widget)
+        self.assertIn('This widget failed to load.', box.widget)
+
+class PartialListWidgetTest(TestCase):
+
+    def setUp(self):
+        for i in range(15):
+            User.objects.create(username='user%d' % i, is_staff=bool(i % 2))
+
+    def test_widget_plugins(self):
+        from exadmin.plugins.actions import ActionPlugin
+        from exadmin.plugins.filters import FilterPlugin
+        from exadmin.plugins.relate import ListRelateDisplayPlugin
+        from exadmin.views.dashboard import Dashboard, PartialListWidget
+
+        site = AdminSite('test', 'test_app')
+        site.register(User, type('UserPartialAdmin', (object,), {'list_display': ('username',), \
+            'url_for_result': lambda self, result: '#%s' % result.pk}))
+        site.register(Group, object)
+        for plugin in (ActionPlugin, FilterPlugin, ListRelateDisplayPlugin):
+            site.register_plugin(plugin, ListAdminView)
+        dashboard = site.get_view_class(Dashboard)(self.get_factory().get('/'))
+        widget = PartialListWidget(dashboard, {'id': 1})
+        self.assertEqual(widget.get_list_plugins(), [FilterPlugin, ListRelateDisplayPlugin])
+
+        group = Group.objects.create(name='group')
+        group.user_set.add(*User.objects.filter(username__in=['user2', 'user7']))
+        view = widget.get_list_view(User, {'_rel_groups__id__exact': group.pk})
+        headers, results, count_label = view.get_partial_results(view.base_list_display, 5)
+        self.assertEqual(sorted([r.cells[0].text for r in results]), ['user2', 'user7'])
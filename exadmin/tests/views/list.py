@@ -0,0 +1,261 @@
+from exadmin.tests.base import TestCase
+from django.contrib.auth.models import User, Group
+
+from exadmin.sites import AdminSite
+from exadmin.views import ListAdminView
+
+class UserListAdmin(object):
+    list_display = ('username', 'groups', 'user_permissions')
+    list_per_page = 50
+
+    def url_for_result(self, result):
+        return '#%s' % result.pk
+
+class ListPrefetchTest(TestCase):
+
+    def setUp(self):
+        groups = [Group.objects.create(name='group%d' % i) for i in range(3)]
+        for i in range(60):
+            user = User.objects.create(username='user%d' % i)
+            user.groups.add(*groups[:i % 3 + 1])
+
+    def get_view(self):
+        site = AdminSite('test', 'test_app')
+        site.register(User, UserListAdmin)
+        view = site.get_view_class(ListAdminView, site._registry[User])(self.get_factory().get('/'))
+        view.make_result_list()
+        return view
+
+    def test_prefetch_lookups(self):
+        self.assertEqual(self.get_view().get_prefetch_lookups(), ['groups', 'user_permissions'])
+
+    def test_result_queries(self):
+        view = self.get_view()
+        # Rows are loaded by make_result_list, one query for each many to many column
+        with self.assertNumQueries(2):
+            results = view.results()
+        self.assertEqual(len(results), 50)
+        self.assertIn(results[0].cells[1].text, (u'group0', u'group0, group1', u'group0, group1, group2'))
+
+class ListCacheTest(TestCase):
+
+    def test_plugin_filter_key(self):
+        from django.core.cache import cache
+        from exadmin.plugins.relate import ListRelateDisplayPlugin
+        cache.clear()
+
+        group = Group.objects.create(name='group')
+        for i in range(4):
+            user = User.objects.create(username='user%d' % i)
+            if i % 2:
+                user.groups.add(group)
+        site = AdminSite('test', 'test_app')
+        site.register(User, type('UserCacheAdmin', (UserListAdmin,), {
+            'list_display': ('username',), 'ordering': ('username',), 'list_cache_timeout': 60}))
+        site.register_plugin(ListRelateDisplayPlugin, ListAdminView)
+
+        def get_usernames(params):
+            view = site.get_view_class(ListAdminView, site._registry[User])(self.get_factory().get('/', params))
+            view.make_result_list()
+            return [obj.username for obj in view.result_list], view.result_count
+
+        self.assertEqual(get_usernames({}), (['user0', 'user1', 'user2', 'user3'], 4))
+        self.assertEqual(get_usernames({'_rel_groups__id__exact': group.pk}), (['user1', 'user3'], 2))
+        cache.clear()
+
+class SettingsListAdmin(object):
+    list_display = ('key', 'user', 'user_name')
+    list_projection = True
+
+    def user_name(self, obj):
+        return obj.user.username
+    user_name.field_depends = ('user__username',)
+
+    def url_for_result(self, result):
+        return '#%s' % result.pk
+
+class ListProjectionTest(TestCase):
+
+    def setUp(self):
+        from exadmin.models import UserSettings
+        for i in range(3):
+            user = User.objects.create(username='user%d' % i)
+            UserSettings.objects.create(user=user, key='key%d' % i, value='{}')
+
+    def get_view(self, **attrs):
+        from exadmin.models import UserSettings
+        site = AdminSite('test', 'test_app')
+        site.register(UserSettings, type('SettingsAdmin', (SettingsListAdmin,), attrs))
+        return site.get_view_class(ListAdminView, site._registry[UserSettings])(self.get_factory().get('/'))
+
+    def test_projection(self):
+        view = self.get_view()
+        self.assertEqual(view.get_list_projection(['-key']), (['user'], ['id', 'key', 'user']))
+        view.make_result_list()
+        self.assertEqual(view.list_queryset.query.deferred_loading, (set(['id', 'key', 'user']), False))
+        self.assertEqual(view.list_queryset.query.select_related, {'user': {}})
+
+    def test_unknown_depends(self):
+        # The columns used by a method without field_depends are unknown, so all are loaded
+        view = self.get_view(list_display=('key', '__str__'))
+        self.assertEqual(view.get_list_projection(['-key']), None)
+        view.make_result_list()
+        self.assertEqual(view.list_queryset.query.deferred_loading, (set(), True))
+
+    def test_cached_rows(self):
+        from django.core.cache import cache
+        cache.clear()
+
+        for i in range(2):
+            view = self.get_view(list_cache_timeout=60, ordering=('key',))
+            view.make_result_list()
+            self.assertEqual([obj.key for obj in view.result_list], ['key0', 'key1', 'key2'])
+            self.assertNotIn('value', view.result_list[0].__dict__)
+            self.assertEqual(view.result_list[0].user.username, 'user0')
+        cache.clear()
+
+class CellRenderTest(TestCase):
+
+    def setUp(self):
+        for i in range(5):
+            User.objects.create(username='user%d' % i, email='user%d@example.com' % i)
+
+    def get_results(self, **attrs):
+        site = AdminSite('test', 'test_app')
+        site.register(User, type('UserCellAdmin', (UserListAdmin,), dict({
+            'list_display': ('username', 'email', 'is_staff'), 'ordering': ('username',)}, **attrs)))
+        view = site.get_view_class(ListAdminView, site._registry[User])(self.get_factory().get('/'))
+        view.make_result_list()
+        self.assertEqual(view._cell_renders, {})
+
+        compiled = []
+        get_column_render = view.get_column_render
+        def column_render(field_name):
+            compiled.append(field_name)
+            return get_column_render(field_name)
+        view.get_column_render = column_render
+
+        results = view.results()
+        # Cells are rendered by the renders compiled for the first row
+        self.assertEqual(compiled, ['username', 'email', 'is_staff'])
+        self.assertEqual(sorted(view._cell_renders), ['email', 'is_staff', 'username'])
+        return [[c.wraps for c in row.cells] for row in results]
+
+    def test_first_column_link(self):
+        results = self.get_results()
+        self.assertEqual(len(results), 5)
+        self.assertEqual(results[0], [[u'<a href="#1">%s</a>'], [], []])
+
+    def test_display_links(self):
+        results = self.get_results(list_display_links=('email', 'is_staff'))
+        self.assertEqual(results[4], [[], [u'<a href="#5">%s</a>'], [u'<a href="#5">%s</a>']])
+
+class CountLabelTest(TestCase):
+
+    def test_capped_labels(self):
+        for i in range(8):
+            User.objects.create(username='user%d' % i)
+        site = AdminSite('test', 'test_app')
+        site.register(User, type('UserCappedAdmin', (UserListAdmin,), {
+            'list_display': ('username',), 'list_count': 'capped', 'list_count_cap': 3}))
+
+        view = site.get_view_class(ListAdminView, site._registry[User])(self.get_factory().get('/'))
+        view.make_result_list()
+        self.assertEqual((view.result_count, view.result_count_label), (3, u'3+'))
+        self.assertEqual(view.full_result_count_label, u'3+')
+
+    def test_capped_query(self):
+        from django.db import connection
+        from exadmin.util import capped_count
+
+        for i in range(8):
+            User.objects.create(username='user%d' % i)
+        queryset = User.objects.filter(username__startswith='user').order_by('username')
+        debug_cursor, connection.use_debug_cursor = connection.use_debug_cursor, True
+        try:
+            del connection.queries[:]
+            self.assertEqual(capped_count(queryset, 3), 4)
+            self.assertEqual(capped_count(queryset, 10), 8)
+            self.assertEqual(capped_count(queryset.none(), 3), 0)
+        finally:
+            connection.use_debug_cursor = debug_cursor
+        # The rows are counted over a limited subquery, without ordering
+        self.assertEqual(len(connection.queries), 2)
+        sql = connection.queries[0]['sql']
+        self.assertTrue(sql.startswith('SELECT COUNT(*) FROM (SELECT'))
+        self.assertIn('LIMIT 4', sql)
+        self.assertNotIn('ORDER BY', sql)
+
+class KeysetPaginationTest(TestCase):
+
+    def test_microsecond_cursor(self):
+        import datetime
+        from django.utils import timezone
+        from exadmin.views.list import CURSOR_VAR
+
+        for i in range(10):
+            User.objects.create(username='user%d' % i, date_joined=timezone.make_aware( \
+                datetime.datetime(2013, 1, 1, 10, 0, 0, 500000 + i), timezone.utc))
+        site = AdminSite('test', 'test_app')
+        site.register(User, type('UserKeysetAdmin', (UserListAdmin,), {
+            'list_display': ('username',), 'ordering': ('date_joined',), 'list_per_page': 3,
+            'list_pagination': 'keyset'}))
+
+        usernames, params = [], {}
+        for page in range(4):
+            view = site.get_view_class(ListAdminView, site._registry[User])(self.get_factory().get('/', params))
+            # Only the first page is counted, the next pages take the count of cursor
+            with self.assertNumQueries(page and 1 or 2):
+                view.make_result_list()
+            self.assertEqual(view.result_count, 10)
+            self.assertEqual(view.keyset_fields, [('date_joined', False), ('pk', True)])
+            usernames.extend([obj.username for obj in view.result_list])
+            params = {CURSOR_VAR: view.next_cursor}
+        self.assertEqual(usernames, ['user%d' % i for i in range(10)])
+        self.assertFalse(view.has_next)
+
+    def test_relation_ordering(self):
+        from exadmin.models import UserSettings
+
+        def get_keyset_fields(ordering):
+            site = AdminSite('test', 'test_app')
+            site.register(UserSettings, type('SettingsKeysetAdmin', (object,), {
+                'list_display': ('key',), 'ordering': ordering, 'list_pagination': 'keyset'}))
+            view = site.get_view_class(ListAdminView, site._registry[UserSettings])(self.get_factory().get('/'))
+            view.make_result_list()
+            return view.keyset_fields
+
+        # A relation is ordered by the ordering of related model, so it is paged by offset
+        self.assertEqual(get_keyset_fields(('user',)), None)
+        self.assertEqual(get_keyset_fields(('user__username',)), [('user__username', False), ('pk', True)])
+
+class PartialListTest(TestCase):
+
+    def setUp(self):
+        for i in range(15):
+            User.objects.create(username='user%d' % i, is_staff=bool(i % 2))
+
+    def test_partial_results(self):
+        from exadmin.plugins.actions import ActionPlugin
+        from exadmin.plugins.filters import FilterPlugin
+
+        site = AdminSite('test', 'test_app')
+        site.register(User, type('UserPartialAdmin', (object,), {
+            'list_display': ('username', 'email', 'is_staff', 'date_joined'), 'list_filter': ('is_staff',),
+            'url_for_result': lambda self, result: '#%s' % result.pk}))
+        site.register_plugin(ActionPlugin, ListAdminView)
+        site.register_plugin(FilterPlugin, ListAdminView)
+
+        view_class = site.get_view_class(ListAdminView, site._registry[User], list_partial=True, \
+            plugin_classes=[FilterPlugin])
+        self.assertEqual([issubclass(p, FilterPlugin) for p in view_class.plugin_classes], [True])
+        self.assertNotEqual(view_class, site.get_view_class(ListAdminView, site._registry[User]))
+
+        view = view_class(self.get_factory().get('/', {'_p_is_staff__exact': '1', 'o': 'username'}))
+        with self.assertNumQueries(1):
+            headers, results, count_label = view.get_partial_results(view.base_list_display[:3], 5)
+        self.assertEqual([unicode(h.text) for h in headers], ['username', 'e-mail address', 'staff status'])
+        self.assertEqual(headers[0].menus, [])
+        self.assertEqual([r.cells[0].text for r in results], ['user1', 'user11', 'user13', 'user3', 'user5'])
+        self.assertEqual(count_label, u'5+')
+        self.assertEqual(view.list_queryset.query.deferred_loading[1], False)
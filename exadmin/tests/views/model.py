@@ -1,7 +1,111 @@
 from exadmin.tests.base import TestCase
+from django.contrib.auth.models import User, Group, Permission
+
+from exadmin.layout import Fieldset
+from exadmin.sites import AdminSite
+from exadmin.views import CreateAdminView
 
 class DeleteTest(TestCase):
 
     def test_delete(self):
         c = self.get_client()
         response = c.get('/')
+
+class FormClassCacheTest(TestCase):
+
+    def test_form_class_cache(self):
+        site = AdminSite('test', 'test_app')
+        site.register(User, type('UserFormAdmin', (object,), {
+            'exclude': ('password', 'groups', 'user_permissions'), 'readonly_fields': ('last_login', 'date_joined'),
+            'form_class_cache': True}))
+
+        def get_form(user=None):
+            request = self.get_factory().get('/')
+            request.user = user or request.user
+            return site.get_view_class(CreateAdminView, site._registry[User])(request).get_model_form()
+
+        form_class = get_form()
+        self.assertNotIn('last_login', form_class.base_fields)
+        self.assertIs(get_form(), form_class)
+
+        staff = User.objects.create(username='staff', is_staff=True)
+        staff.user_permissions.add(Permission.objects.get(codename='add_user'))
+        self.assertIsNot(get_form(staff), form_class)
+
+        site.register(Group)
+        self.assertIsNot(get_form(), form_class)
+
+    def test_active_plugins(self):
+        from django import forms
+        from exadmin.views import BaseAdminPlugin, ModelFormAdminView
+
+        class TextareaPlugin(BaseAdminPlugin):
+            def init_request(self, *args, **kwargs):
+                return '_textarea' in self.request.GET
+            def get_field_attrs(self, attrs, db_field, **kwargs):
+                return dict(attrs, widget=forms.Textarea)
+
+        site = AdminSite('test', 'test_app')
+        site.register(User, type('UserFormAdmin', (object,), {'fields': ('username',), 'form_class_cache': True}))
+        site.register_plugin(TextareaPlugin, ModelFormAdminView)
+
+        def get_form(params):
+            view_class = site.get_view_class(CreateAdminView, site._registry[User])
+            return view_class(self.get_factory().get('/', params)).get_model_form()
+
+        # The plugin can be made for both, and is only active with the param
+        form_class = get_form({})
+        self.assertNotIsInstance(form_class.base_fields['username'].widget, forms.Textarea)
+        self.assertIsInstance(get_form({'_textarea': 1}).base_fields['username'].widget, forms.Textarea)
+        self.assertIs(get_form({}), form_class)
+
+    def test_formfield_calls(self):
+        from exadmin.views import BaseAdminPlugin, ModelFormAdminView
+
+        calls = []
+        class CountPlugin(BaseAdminPlugin):
+            def formfield_for_dbfield(self, formfield, db_field, **kwargs):
+                calls.append(db_field.name)
+                return formfield
+
+        def get_calls(cache):
+            site = AdminSite('test', 'test_app')
+            site.register(User, type('UserFormAdmin', (object,), {'form_class_cache': cache}))
+            site.register_plugin(CountPlugin, ModelFormAdminView)
+            del calls[:]
+            for i in range(3):
+                # The form class is made by init_request
+                site.get_view_class(CreateAdminView, site._registry[User])(self.get_factory().get('/'))
+            return len(calls)
+
+        # Form fields are made for every view, or once for the cached form class
+        calls_per_view = get_calls(True)
+        self.assertTrue(calls_per_view > 0)
+        self.assertEqual(get_calls(False), calls_per_view * 3)
+
+class FormLayoutTest(TestCase):
+
+    def test_compiled_layout(self):
+        form_layout = (Fieldset('Name', 'username', 'email'),)
+        site = AdminSite('test', 'test_app')
+        site.register(User, type('UserLayoutAdmin', (object,), {
+            'exclude': ('password', 'groups', 'user_permissions'), 'form_layout': form_layout}))
+
+        def get_layout():
+            view = site.get_view_class(CreateAdminView, site._registry[User])(self.get_factory().get('/'))
+            view.form_obj = view.get_model_form()()
+            return view.get_form_layout()
+
+        layout = get_layout()
+        self.assertEqual(len(site._form_layout_cache), 1)
+        fieldsets = layout[0].fields
+        self.assertEqual([f.legend for f in fieldsets], ['Name', 'Other Fields'])
+        self.assertIsNot(fieldsets[0], form_layout[0])
+
+        fieldsets[0].fields.append('first_name')
+        fieldsets.pop()
+        layout = get_layout()
+        self.assertEqual(len(site._form_layout_cache), 1)
+        self.assertEqual([f.legend for f in layout[0].fields], ['Name', 'Other Fields'])
+        self.assertEqual(layout[0].fields[0].fields, ['username', 'email'])
+        self.assertEqual(form_layout[0].fields, ['username', 'email'])
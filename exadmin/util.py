@@ -1,9 +1,12 @@
-from django.db import models
+import re
+
+from django.db import models, connections, DatabaseError
 from django.db.models.sql.constants import LOOKUP_SEP
 from django.db.models.deletion import Collector
+from django.db.models.sql.datastructures import EmptyResultSet
 from django.db.models.related import RelatedObject
 from django.forms.forms import pretty_name
-from django.utils import formats
+from django.utils import formats, dateformat
 from django.utils.html import escape
 from django.utils.safestring import mark_safe
 from django.utils.text import capfirst
@@ -325,28 +328,42 @@ def boolean_icon(field_val):
     return mark_safe(u'<img src="%s" alt="%s" />' % (icon_url, field_val))
 
 def display_for_field(value, field):
+    return get_field_formatter(field)(value)
+
+def get_field_formatter(field):
+    """
+    Returns the function formats values of field for display, the type checks of
+    field are done once, so it can be reused for all values of a column.
+    """
     from exadmin.views.list import EMPTY_CHANGELIST_VALUE
 
+    def not_none(formatter):
+        return lambda value: EMPTY_CHANGELIST_VALUE if value is None else formatter(value)
+
     if field.flatchoices:
-        return dict(field.flatchoices).get(value, EMPTY_CHANGELIST_VALUE)
+        choices = dict(field.flatchoices)
+        return lambda value: choices.get(value, EMPTY_CHANGELIST_VALUE)
     # NullBooleanField needs special-case null-handling, so it comes
     # before the general null test.
     elif isinstance(field, models.BooleanField) or isinstance(field, models.NullBooleanField):
-        return boolean_icon(value)
-    elif value is None:
-        return EMPTY_CHANGELIST_VALUE
+        return boolean_icon
     elif isinstance(field, models.DateTimeField):
-        return formats.localize(timezone.localtime(value))
-    elif isinstance(field, models.DateField) or isinstance(field, models.TimeField):
-        return formats.localize(value)
+        format = formats.get_format('DATETIME_FORMAT')
+        return not_none(lambda value: dateformat.format(timezone.localtime(value), format))
+    elif isinstance(field, models.DateField):
+        format = formats.get_format('DATE_FORMAT')
+        return not_none(lambda value: dateformat.format(value, format))
+    elif isinstance(field, models.TimeField):
+        format = formats.get_format('TIME_FORMAT')
+        return not_none(lambda value: dateformat.time_format(value, format))
     elif isinstance(field, models.DecimalField):
-        return formats.number_format(value, field.decimal_places)
+        return not_none(lambda value: formats.number_format(value, field.decimal_places))
     elif isinstance(field, models.FloatField):
-        return formats.number_format(value)
+        return not_none(formats.number_format)
     elif isinstance(field.rel, models.ManyToManyRel):
-        return ', '.join([smart_unicode(obj) for obj in value.all()])
+        return not_none(lambda value: ', '.join([smart_unicode(obj) for obj in value.all()]))
     else:
-        return smart_unicode(value)
+        return not_none(smart_unicode)
 
 
 class NotRelationField(Exception):
@@ -439,3 +456,59 @@ def get_limit_choices_to_from_path(model, path):
         return limit_choices_to # already a Q
     else:
         return models.Q(**limit_choices_to) # convert dict to Q
+
+def estimate_count(queryset):
+    """
+    Returns the rows number of queryset estimated from database statistics, without
+    scanning the table. Returns None if the database can not estimate it. Only
+    PostgreSQL estimates filtered querysets, SQLite needs ``ANALYZE`` to be run.
+    """
+    connection = connections[queryset.db]
+    cursor = connection.cursor()
+    table = queryset.model._meta.db_table
+    vendor = connection.vendor
+
+    if queryset.query.where:
+        if vendor != 'postgresql':
+            return None
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+        cursor.execute('EXPLAIN ' + sql, params)
+        match = re.search(r'rows=(\d+)', cursor.fetchone()[0])
+        return match and int(match.group(1)) or None
+
+    if vendor == 'postgresql':
+        cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [table])
+    elif vendor == 'mysql':
+        cursor.execute('SELECT table_rows FROM information_schema.tables '
+            'WHERE table_schema = DATABASE() AND table_name = %s', [table])
+    elif vendor == 'sqlite':
+        # The first number of an index stat is the rows of table
+        try:
+            cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [table])
+        except DatabaseError:
+            return None
+    else:
+        return None
+
+    row = cursor.fetchone()
+    if not row or row[0] is None:
+        return None
+    count = int(float(str(row[0]).split(' ')[0]))
+    return count > 0 and count or None
+
+def capped_count(queryset, cap):
+    """
+    Returns the rows number of queryset, but at most ``cap + 1``. The rows are counted
+    over a subquery limited to ``cap + 1`` rows, as ``count()`` ignores the slice of
+    queryset, so the database stops scanning after them.
+    """
+    if isinstance(queryset, models.query.EmptyQuerySet):
+        return 0
+    queryset = queryset.order_by().values_list('pk', flat=True)[:cap + 1]
+    try:
+        sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    except EmptyResultSet:
+        return 0
+    cursor = connections[queryset.db].cursor()
+    cursor.execute('SELECT COUNT(*) FROM (%s) capped_count' % sql, params)
+    return cursor.fetchone()[0]
@@ -7,7 +7,7 @@ from edit import CreateAdminView, UpdateAdminView, ModelFormAdminView
 from delete import DeleteAdminView
 from detail import DetailAdminView
 from dashboard import Dashboard, BaseWidget, widget_manager
-from website import IndexView, LoginView, LogoutView, UserSettingView
+from website import IndexView, LoginView, LogoutView, UserSettingView, ProfileView
 
 __all__ = (
     'BaseAdminObject',
@@ -23,6 +23,7 @@ site.register_view(r'^login/$', LoginView, name='login')
 site.register_view(r'^logout/$', LogoutView, name='logout')
 
 site.register_view(r'^settings/user$', UserSettingView, name='user_settings')
+site.register_view(r'^profile/$', ProfileView, name='profile')
 
 site.register_modelview(r'^$', ListAdminView, name='%s_%s_changelist')
 site.register_modelview(r'^add/$', CreateAdminView, name='%s_%s_add')
@@ -1,5 +1,5 @@
 import copy
-import functools, datetime, decimal
+import functools, datetime, decimal, threading, time
 from functools import update_wrapper
 from inspect import getargspec
 
@@ -9,7 +9,9 @@ from django.conf import settings
 from django.contrib import messages
 from django.core.exceptions import ValidationError
 from django.core.serializers.json import DjangoJSONEncoder
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
+from django.db import connection
 from django.http import HttpResponse
 from django.template import Context, Template
 from django.template.response import TemplateResponse
@@ -21,34 +23,90 @@ from django.utils.http import urlencode
 from django.utils.itercompat import is_iterable
 from django.utils.safestring import mark_safe
 from django.utils.text import capfirst
-from django.utils.translation import ugettext as _
+from django.utils.translation import ugettext as _, get_language
 from django.views.decorators.csrf import csrf_protect
 from django.views.generic import View
+from exadmin.layout import freeze_layout, copy_layout
+from exadmin.sites import MergeAdminMetaclass
 from exadmin.util import static
 
 
 csrf_protect_m = method_decorator(csrf_protect)
 
+PROFILE_CACHE_KEY = 'exadmin_profile_%s'
+PROFILE_HEADER = 'X-Exadmin-Profile'
+
 class IncorrectPluginArg(Exception):
     pass
 
+# Argument styles of plugin filter methods, resolved once when the filter
+# table of a merged view class is built.
+FILTER_NOARG = 0    # def hook(self)
+FILTER_VALUE = 1    # def hook(self, result, *args, **kwargs)
+FILTER_LAZY = 2     # def hook(self, __, *args, **kwargs)
+
+def get_filter_style(fm):
+    fargs = getargspec(fm)[0]
+    if len(fargs) == 1:
+        # Only self arg
+        return FILTER_NOARG
+    elif fargs[1] == '__':
+        return FILTER_LAZY
+    else:
+        return FILTER_VALUE
+
+def get_hook_filters(plugin_classes, tag):
+    """
+    Return the ordered filter tuple of hook ``tag``, each item is
+    ``(plugin index, argument style)`` sorted by the ``priority`` of the methods.
+    """
+    filters = []
+    for i, p in enumerate(plugin_classes):
+        fm = getattr(p, tag, None)
+        if callable(fm):
+            filters.append((getattr(fm, 'priority', 10), i, get_filter_style(fm)))
+    return tuple([(i, style) for priority, i, style in sorted(filters, key=lambda x:x[0])])
+
+def get_filter_hooks(view_class, plugin_classes):
+    """
+    Build the filter dispatch table of a merged admin view class, it maps every
+    ``filter_hook`` method name to the filters returned by ``get_hook_filters``.
+    """
+    tags = set()
+    for klass in view_class.mro():
+        for value in klass.__dict__.values():
+            tag = getattr(value, 'hook_name', None)
+            if tag:
+                tags.add(tag)
+    return dict([(tag, get_hook_filters(plugin_classes, tag)) for tag in tags])
+
 def filter_chain(filters, token, func, *args, **kwargs):
-    if token == -1:
-        return func()
+    """
+    Call ``func`` through the bound plugin filters ``filters[:token+1]``, the
+    last filter is the nearest one to ``func``.
+
+    Filters are applied in a flat loop, only the plugin methods which take the
+    ``__`` arg need the inner part of chain as a callable.
+    """
+    end = 0
+    while end <= token and filters[end][0] != FILTER_LAZY:
+        end += 1
+
+    if end > token:
+        result = func()
     else:
-        def _inner_method():
-            fm = filters[token]
-            fargs = getargspec(fm)[0]
-            if len(fargs) == 1:
-                # Only self arg
-                result = func()
-                if result is None:
-                    return fm()
-                else:
-                    raise IncorrectPluginArg(_(u'Plugin filter method need a arg to receive parent method result.'))
-            else:
-                return fm(func if fargs[1] == '__' else func(), *args, **kwargs)
-        return filter_chain(filters, token-1, _inner_method, *args, **kwargs)
+        result = filters[end][1](lambda: filter_chain(filters[end+1:token+1], token-end-1, func, *args, **kwargs), \
+            *args, **kwargs)
+
+    for i in xrange(end-1, -1, -1):
+        style, fm = filters[i]
+        if style == FILTER_VALUE:
+            result = fm(result, *args, **kwargs)
+        elif result is None:
+            result = fm()
+        else:
+            raise IncorrectPluginArg(_(u'Plugin filter method need a arg to receive parent method result.'))
+    return result
 
 def filter_hook(func):
     tag = func.__name__
@@ -59,15 +117,124 @@ def filter_hook(func):
         def _inner_method():
             return func(self, *args, **kwargs)
 
+        if self.profiler is not None:
+            _inner_method = self.profiler.wrap(tag, 'view', _inner_method)
+
         if self.plugins:
-            filters = [(getattr(getattr(p, tag), 'priority', 10), getattr(p, tag)) \
-                for p in self.plugins if callable(getattr(p, tag, None))]
-            filters = [f for p,f in sorted(filters, key=lambda x:x[0])]
-            return filter_chain(filters, len(filters)-1, _inner_method, *args, **kwargs)
-        else:
-            return _inner_method()
+            filters = self.get_filters(tag)
+            if filters:
+                return filter_chain(filters, len(filters)-1, _inner_method, *args, **kwargs)
+        return _inner_method()
+    method.hook_name = tag
     return method
 
+class HookProfiler(object):
+    """
+    Record calls, wall time and db queries of every (hook, plugin) pair in an admin
+    request. Time and queries of a plugin method exclude the inner part of filter
+    chain it called, so they point to the plugin itself. Hooks may be called from
+    the threads rendering widgets, the call stack is kept per thread.
+    """
+    keep_requests = 20
+    header_items = 5
+
+    def __init__(self, request):
+        self.request = request
+        self.stats = {}
+        self.discard = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._start = time.time()
+        self._start_queries = len(connection.queries)
+
+    def call(self, hook, name, func, *args, **kwargs):
+        # Queries are only logged with a debug cursor, it is turned on for the profiled
+        # calls only, so queries out of hooks and blocks are not counted without DEBUG
+        use_debug_cursor = connection.use_debug_cursor
+        connection.use_debug_cursor = True
+        start, queries = time.time(), len(connection.queries)
+        stack = self.get_stack()
+        stack.append([0.0, 0])
+        try:
+            return func(*args, **kwargs)
+        finally:
+            connection.use_debug_cursor = use_debug_cursor
+            cost, query_count = time.time() - start, len(connection.queries) - queries
+            inner_cost, inner_queries = stack.pop()
+            with self._lock:
+                stat = self.stats.setdefault((hook, name), [0, 0.0, 0])
+                stat[0] += 1
+                stat[1] += cost - inner_cost
+                stat[2] += query_count - inner_queries
+            if stack:
+                stack[-1][0] += cost
+                stack[-1][1] += query_count
+
+    def get_stack(self):
+        """
+        The stack of calls in the current thread, with the time and queries of their
+        inner calls.
+        """
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def get_name(self, obj):
+        if isinstance(obj, BaseAdminView):
+            return 'view'
+        klass = obj.__class__
+        # Plugins merged with admin options are named by the option classes
+        while isinstance(klass, MergeAdminMetaclass):
+            klass = klass.__bases__[-1]
+        return klass.__name__
+
+    def wrap(self, hook, name, func):
+        def method(*args, **kwargs):
+            return self.call(hook, name, func, *args, **kwargs)
+        return method
+
+    def get_stats(self):
+        with self._lock:
+            stats = [{'hook': hook, 'plugin': name, 'calls': calls, 'time': round(cost * 1000, 3), 'queries': queries} \
+                for (hook, name), (calls, cost, queries) in self.stats.items()]
+        stats.sort(key=lambda s: s['time'], reverse=True)
+        return stats
+
+    def get_summary(self, stats):
+        return '; '.join(['%(hook)s@%(plugin)s=%(calls)d/%(time).1fms/%(queries)dq' % s \
+            for s in stats[:self.header_items]])
+
+    def finish(self, response=None):
+        """
+        Put the summary to response header and save the profile of request,
+        template responses are finished after rendered, as blocks are profiled too.
+        """
+        if response is not None and hasattr(response, 'add_post_render_callback') and not response.is_rendered:
+            response.add_post_render_callback(self.finish)
+            return
+
+        if self.discard:
+            return
+
+        stats = self.get_stats()
+        if response is not None:
+            response[PROFILE_HEADER] = 'total=%.1fms/%dq; %s' % ((time.time() - self._start) * 1000, \
+                len(connection.queries) - self._start_queries, self.get_summary(stats))
+
+        user = getattr(self.request, 'user', None)
+        if user is not None and user.is_authenticated():
+            key = PROFILE_CACHE_KEY % user.pk
+            profiles = cache.get(key) or []
+            profiles.insert(0, {
+                'path': self.request.get_full_path(),
+                'method': self.request.method,
+                'time': round((time.time() - self._start) * 1000, 3),
+                'queries': len(connection.queries) - self._start_queries,
+                'stats': stats,
+            })
+            cache.set(key, profiles[:self.keep_requests])
+
 def inclusion_tag(file_name, context_class=Context, takes_context=False):
     def wrap(func):
         @functools.wraps(func)
@@ -119,11 +286,16 @@ class BaseAdminObject(object):
         return self.get_view(view_class, self.admin_site._registry.get(model), *args, **kwargs)
 
     def get_admin_url(self, name, *args, **kwargs):
-        return reverse('%s:%s' % (self.admin_site.app_name, name), args=args, kwargs=kwargs)
+        if kwargs:
+            return reverse('%s:%s' % (self.admin_site.app_name, name), args=args, kwargs=kwargs)
+        return self.admin_site.reverse('%s:%s' % (self.admin_site.app_name, name), *args)
 
     def get_model_url(self, model, name, *args, **kwargs):
-        return reverse('%s:%s_%s_%s' % (self.admin_site.app_name, model._meta.app_label, model._meta.module_name, name), \
-            args=args, kwargs=kwargs, current_app=self.admin_site.name)
+        if kwargs:
+            return reverse('%s:%s_%s_%s' % (self.admin_site.app_name, model._meta.app_label, model._meta.module_name, name), \
+                args=args, kwargs=kwargs, current_app=self.admin_site.name)
+        return self.admin_site.reverse('%s:%s_%s_%s' % (self.admin_site.app_name, model._meta.app_label, \
+            model._meta.module_name, name), *args, current_app=self.admin_site.name)
 
     def get_model_perm(self, model, name):
         return '%s.%s_%s' % (model._meta.app_label, name, model._meta.module_name)
@@ -181,6 +353,30 @@ class BaseAdminObject(object):
 
 class BaseAdminPlugin(BaseAdminObject):
 
+    # Declarative activation, checked before the plugin is instantiated.
+    # Lower case http methods the plugin works for, None for all methods.
+    active_methods = None
+    # Request params (or param prefixes) one of them must be present, None for always.
+    active_params = None
+    # Plugin attrs (merged from admin options) that all must be truthy.
+    active_attrs = ()
+
+    @classmethod
+    def can_active(cls, admin_view):
+        """
+        Check the activation declares of plugin class, plugin will not be created
+        for the request if return ``False``.
+        """
+        if cls.active_methods is not None and admin_view.request_method not in cls.active_methods:
+            return False
+        for attr in cls.active_attrs:
+            if not getattr(cls, attr, None):
+                return False
+        if cls.active_params is not None:
+            keys = admin_view.request.REQUEST.keys()
+            return any([k.startswith(p) for p in cls.active_params for k in keys])
+        return True
+
     def __init__(self, admin_view):
         self.admin_view = admin_view
         self.admin_site = admin_view.admin_site
@@ -195,32 +391,58 @@ class BaseAdminPlugin(BaseAdminObject):
 class BaseAdminView(BaseAdminObject, View):
     """ Base Admin view, support some comm attrs."""
 
+    plugin_classes = []
+    filter_hooks = {}
+    enable_profile = False
+
     def __init__(self, request, *args, **kwargs):
         self.request = request
         self.request_method = request.method.lower()
         self.user = request.user
 
-        self.base_plugins = [p(self) for p in getattr(self, "plugin_classes", [])]
+        # Views of the same request share one profiler
+        self.profiler = getattr(request, 'hook_profiler', None)
+        if self.profiler is None and self.enable_profile:
+            self.profiler = request.hook_profiler = HookProfiler(request)
+
+        self.base_plugins = [p(self) if p.can_active(self) else None for p in self.plugin_classes]
 
         self.args = args
         self.kwargs = kwargs
         self.init_plugin(*args, **kwargs)
         self.init_request(*args, **kwargs)
 
+    @classonlymethod
+    def setup_class(cls):
+        """
+        Called once the merged view class is made by the admin site, which is when urls
+        of site are loaded, views set up the process wide parts of their options here.
+        """
+        pass
+
     @classonlymethod
     def as_view(cls):
         def view(request, *args, **kwargs):
-            self = cls(request, *args, **kwargs)
+            try:
+                self = cls(request, *args, **kwargs)
 
-            if hasattr(self, 'get') and not hasattr(self, 'head'):
-                self.head = self.get
+                if hasattr(self, 'get') and not hasattr(self, 'head'):
+                    self.head = self.get
 
-            if self.request_method in self.http_method_names:
-                handler = getattr(self, self.request_method, self.http_method_not_allowed)
-            else:
-                handler = self.http_method_not_allowed
+                if self.request_method in self.http_method_names:
+                    handler = getattr(self, self.request_method, self.http_method_not_allowed)
+                else:
+                    handler = self.http_method_not_allowed
 
-            return handler(request, *args, **kwargs)
+                response = handler(request, *args, **kwargs)
+            except Exception:
+                if getattr(request, 'hook_profiler', None) is not None:
+                    request.hook_profiler.finish()
+                raise
+
+            if self.profiler is not None:
+                self.profiler.finish(response)
+            return response
 
         # take name and docstring from class
         update_wrapper(view, cls, updated=())
@@ -234,7 +456,10 @@ class BaseAdminView(BaseAdminObject, View):
 
     def init_plugin(self, *args, **kwargs):
         plugins = []
-        for p in self.base_plugins:
+        actives = set()
+        for i, p in enumerate(self.base_plugins):
+            if p is None:
+                continue
             p.request = self.request
             p.user = self.user
             p.args = self.args
@@ -242,7 +467,27 @@ class BaseAdminView(BaseAdminObject, View):
             result = p.init_request(*args, **kwargs)
             if result is not False:
                 plugins.append(p)
+                actives.add(i)
         self.plugins = plugins
+        self._active_plugins = actives
+        self._filters = {}
+
+    def get_filters(self, tag):
+        """
+        Return the bound filter methods of hook ``tag`` from the activated plugins,
+        resolved from the ``filter_hooks`` table of merged view class.
+        """
+        filters = self._filters.get(tag)
+        if filters is None:
+            hook_filters = self.filter_hooks.get(tag)
+            if hook_filters is None:
+                hook_filters = get_hook_filters(self.plugin_classes, tag)
+            filters = tuple([(style, getattr(self.base_plugins[i], tag)) \
+                for i, style in hook_filters if i in self._active_plugins])
+            if self.profiler is not None:
+                filters = tuple([(style, self.profiler.wrap(tag, self.profiler.get_name(fm.im_self), fm)) for style, fm in filters])
+            self._filters[tag] = filters
+        return filters
 
     @filter_hook
     def get_context(self):
@@ -402,6 +647,23 @@ class ModelAdminView(CommAdminView):
         context.update(new_context)
         return context
 
+    def get_compiled_layout(self, layout_attrs, shape, compile):
+        """
+        Returns a working copy of the layout plan made by ``compile()``, which builds the
+        layout on a ``copy_layout`` of the option layouts in ``layout_attrs``. The plan is
+        compiled once for the admin class, the form ``shape`` and the language, unless a
+        layout is set on the view instance, by a plugin for example, then it is compiled
+        for the request.
+        """
+        if [attr for attr in layout_attrs if attr in self.__dict__]:
+            return compile()
+
+        key = (self.__class__, layout_attrs, shape, get_language())
+        cache = self.admin_site._form_layout_cache
+        if key not in cache:
+            cache[key] = freeze_layout(compile())
+        return copy_layout(cache[key])
+
     @filter_hook
     def get_object(self, object_id):
         """
@@ -417,8 +679,11 @@ class ModelAdminView(CommAdminView):
             return None
 
     def model_admin_url(self, name, *args, **kwargs):
-        return reverse("%s:%s_%s_%s" % (self.admin_site.app_name, self.opts.app_label, \
-            self.module_name, name), args=args, kwargs=kwargs)
+        if kwargs:
+            return reverse("%s:%s_%s_%s" % (self.admin_site.app_name, self.opts.app_label, \
+                self.module_name, name), args=args, kwargs=kwargs)
+        return self.admin_site.reverse("%s:%s_%s_%s" % (self.admin_site.app_name, self.opts.app_label, \
+            self.module_name, name), *args)
 
     def get_model_perms(self):
         """
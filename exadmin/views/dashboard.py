@@ -1,16 +1,26 @@
 import copy
+import hashlib
+import logging
+import time
+from multiprocessing import TimeoutError
+from multiprocessing.pool import ThreadPool
 
 from django import forms
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied
 from django.core.urlresolvers import reverse
-from django.db import models
+from django.db import connection, models
 from django.db.models.base import ModelBase
 from django.forms.forms import DeclarativeFieldsMetaclass
 from django.forms.util import flatatt
+from django.http import Http404, HttpResponse
+from django.middleware.csrf import get_token
 from django.template import loader
 from django.template.context import RequestContext
 from django.test.client import RequestFactory
 from django.utils.encoding import force_unicode, smart_unicode
+from django.utils import simplejson, timezone, translation
+from django.utils.decorators import classonlymethod
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext as _
 from django.views.decorators.cache import never_cache
@@ -20,7 +30,13 @@ from exadmin.models import UserSettings, UserWidget
 from exadmin.sites import site
 from exadmin.views.base import CommAdminView, filter_hook, csrf_protect_m
 from exadmin.views.edit import CreateAdminView
-from exadmin.views.list import ListAdminView
+from exadmin.views.list import ListAdminView, connect_list_cache, get_list_cache_version
+
+WIDGET_CACHE_KEY = 'exadmin_widget_%s'
+# Rendered in place of the csrf token of cached widgets, replaced by the token of request
+WIDGET_CSRF_PLACEHOLDER = 'EXADMIN_WIDGET_CSRF_TOKEN'
+# Rendered in place of the id of widgets cached for users with the same permissions
+WIDGET_ID_PLACEHOLDER = 'EXADMIN_WIDGET_ID'
 
 
 class WidgetTypeSelect(forms.Widget):
@@ -157,14 +173,25 @@ class BaseWidget(forms.Form):
     widget_icon = 'icon-plus-sign-alt'
     base_title = None
 
+    # Seconds to cache the rendered html and media of widget, 0 for no cache. The cache
+    # is per user, or shared by users with the same permissions for 'perms' scope, and
+    # is expired by saving or deleting objects of ``cache_models``.
+    cache_timeout = 0
+    cache_scope = 'user'
+    cache_models = ()
+
     id = forms.IntegerField(_('Widget ID'), widget=forms.HiddenInput)
     title = forms.CharField(_('Widget Title'), required=False)
+    refresh = forms.IntegerField(label=_('Refresh Seconds'), min_value=0, required=False)
 
     def __init__(self, dashboard, data):
         self.dashboard = dashboard
         self.admin_site = dashboard.admin_site
         self.request = dashboard.request
         self.user = dashboard.request.user
+        self.rendered = None
+        self.value_hash = hashlib.md5(simplejson.dumps(dict([(k, v) for k, v in data.items() if k != 'id']), \
+            sort_keys=True, default=smart_unicode)).hexdigest()
         self.convert(data)
         super(BaseWidget, self).__init__(data)
 
@@ -180,15 +207,87 @@ class BaseWidget(forms.Form):
 
         self.id = self.cleaned_data['id']
         self.title = self.cleaned_data['title'] or self.base_title
+        self.refresh = self.cleaned_data['refresh']
 
         if not (self.user.is_superuser or self.has_perm()):
             raise PermissionDenied
 
     @property
     def widget(self):
-        context = {'widget_id': self.id, 'widget_title': self.title, 'form': self}
-        self.context(context)
-        return loader.render_to_string(self.template, context, context_instance=RequestContext(self.request))
+        if self.rendered is None:
+            self.rendered = self.render()
+        return self.rendered
+
+    def get_base_context(self):
+        return {'widget_id': self.id, 'widget_title': self.title, 'form': self,
+            'widget_url': self.dashboard.get_widget_url(self.id), 'widget_refresh': self.refresh}
+
+    def render(self):
+        cached = self.get_cached()
+        shared = self.cache_key and self.cache_scope == 'perms'
+        if cached is None:
+            if shared:
+                widget_id, data = self.id, self.data
+                self.id, self.data = WIDGET_ID_PLACEHOLDER, dict(data.items(), id=WIDGET_ID_PLACEHOLDER)
+            try:
+                context = self.get_base_context()
+                if self.cache_key:
+                    context['csrf_token'] = WIDGET_CSRF_PLACEHOLDER
+                self.context(context)
+                html = loader.render_to_string(self.template, context, context_instance=RequestContext(self.request))
+            finally:
+                if shared:
+                    self.id, self.data = widget_id, data
+            if self.cache_key:
+                self.cached = (html, self.media())
+                cache.set(self.cache_key, self.cached, self.cache_timeout)
+        else:
+            html = cached[0]
+        if self.cache_key:
+            html = html.replace(WIDGET_CSRF_PLACEHOLDER, get_token(self.request) or '')
+        if shared:
+            html = html.replace(WIDGET_ID_PLACEHOLDER, str(self.id))
+        return html
+
+    def get_cache_models(self):
+        return list(self.cache_models)
+
+    def get_cache_key(self):
+        """
+        Key of the cached widget, made of the widget type and params, the widget id
+        and user, or for 'perms' scope the page and the permissions of user, the
+        language and the versions of ``cache_models``. Widgets of 'perms' scope are
+        shared by the same widgets of users, the id is put in the html on render.
+        """
+        if self.cache_scope == 'perms':
+            scope = (self.dashboard.get_page_id(), self.user.is_superuser or sorted(self.user.get_all_permissions()))
+        else:
+            scope = (self.id, self.user.pk)
+        versions = [get_list_cache_version(m) for m in self.get_cache_models()]
+        key = (self.widget_type, self.value_hash, scope, translation.get_language(), versions)
+        return WIDGET_CACHE_KEY % hashlib.md5(repr(key)).hexdigest()
+
+    def get_cached(self):
+        """
+        The cached html and media of widget, None if they are not cached.
+        """
+        if not hasattr(self, 'cache_key'):
+            self.cache_key = self.cache_timeout and self.get_cache_key() or None
+            self.cached = self.cache_key and cache.get(self.cache_key)
+        return self.cached
+
+    def get_media(self):
+        cached = self.get_cached()
+        return cached[1] if cached else self.media()
+
+    def render_placeholder(self, message, frame=False):
+        """
+        The box of widget with a message as content, a frame is loaded from the widget
+        url by the page.
+        """
+        context = self.get_base_context()
+        context.update({'widget_frame': frame, 'content': u'<p class="muted">%s</p>' % message})
+        return loader.render_to_string(BaseWidget.template, context, context_instance=RequestContext(self.request))
 
     def context(self, context):
         pass
@@ -215,6 +314,8 @@ class BaseWidget(forms.Form):
 class HtmlWidget(BaseWidget):
     widget_type = 'html'
     description = 'Html Content Widget, can write any html content in widget.'
+    cache_timeout = 24*3600
+    cache_scope = 'perms'
 
     content = forms.CharField(label=_('Html Content'), widget=exwidgets.AdminTextareaWidget, required=False)
 
@@ -292,6 +393,9 @@ class ModelBaseWidget(BaseWidget):
     def has_perm(self):
         return self.dashboard.has_model_perm(self.model, self.model_perm)
 
+    def get_cache_models(self):
+        return [self.model] + super(ModelBaseWidget, self).get_cache_models()
+
     def filte_choices_model(self, model, modeladmin):
         return self.dashboard.has_model_perm(model, self.model_perm)
 
@@ -320,12 +424,46 @@ class PartialBaseWidget(BaseWidget):
         req = self.get_factory().post(path, data, **extra)
         return self.setup_request(req)
 
+class PartialListWidget(PartialBaseWidget):
+    """
+    Widget shows the first ``list_rows`` rows and ``list_columns`` columns of a list,
+    by a partial list view with only the plugins of ``get_list_plugins``.
+    """
+    list_columns = 5
+    list_rows = 10
+    # Hooks of the list plugins which filter or scope the rows of list
+    list_plugin_hooks = ('get_list_queryset', 'queryset')
+
+    def get_list_plugins(self):
+        """
+        The list plugins of site with ``list_plugin_hooks``, so the rows are the rows
+        of the list page, as filtered by FilterPlugin or ListRelateDisplayPlugin.
+        """
+        return [p for p in self.admin_site.get_plugins(ListAdminView) \
+            if [h for h in self.list_plugin_hooks if hasattr(p, h)]]
+
+    def get_list_view(self, model, params):
+        req = self.make_get_request("", params)
+        return self.get_view_class(ListAdminView, model, list_partial=True, \
+            plugin_classes=self.get_list_plugins())(req)
+
+    def context(self, context):
+        list_view = self.list_view
+        fields = list_view.base_list_display[:self.list_columns]
+        headers, results, count_label = list_view.get_partial_results(fields, self.list_rows)
+
+        context['result_headers'] = headers
+        context['results'] = [r.cells for r in results]
+        context['result_count'] = count_label
+
 @widget_manager.register
 class QuickBtnWidget(BaseWidget):
     widget_type = 'qbutton'
     description = 'Quick button Widget, quickly open any page.'
     template = "admin/widgets/qbutton.html"
     base_title = "Quick Buttons"
+    cache_timeout = 24*3600
+    cache_scope = 'perms'
 
     def convert(self, data):
         self.q_btns = data.pop('btns', [])
@@ -357,7 +495,7 @@ class QuickBtnWidget(BaseWidget):
         context.update({ 'btns': btns })
 
 @widget_manager.register
-class ListWidget(ModelBaseWidget, PartialBaseWidget):
+class ListWidget(ModelBaseWidget, PartialListWidget):
     widget_type = 'list'
     description = 'Any Objects list Widget.'
     template = "admin/widgets/list.html"
@@ -372,22 +510,10 @@ class ListWidget(ModelBaseWidget, PartialBaseWidget):
         if not self.title:
             self.title = self.model._meta.verbose_name_plural
 
-        req = self.make_get_request("", self.list_params)
-        self.list_view = self.get_view_class(ListAdminView, self.model, list_per_page=10)(req)
+        self.list_view = self.get_list_view(self.model, self.list_params)
 
     def context(self, context):
-        list_view = self.list_view
-        list_view.make_result_list()
-
-        base_fields = list_view.base_list_display
-        if len(base_fields) > 5:
-            base_fields = base_fields[0:5]
-
-        context['result_headers'] = [c for c in list_view.result_headers().cells if c.field_name in base_fields]
-        context['results'] = [[o for i,o in \
-            enumerate(filter(lambda c:c.field_name in base_fields, r.cells))] \
-            for r in list_view.results()]
-        context['result_count'] = list_view.result_count
+        super(ListWidget, self).context(context)
         context['page_url'] = self.model_admin_url('changelist')
 
 @widget_manager.register
@@ -423,18 +549,85 @@ class AddFormWidget(ModelBaseWidget, PartialBaseWidget):
         media.add_js([self.static('exadmin/js/quick-form.js'),])
         return media
 
+WIDGET_VAR = '_widget'
+
+def _render_widget(widget, language, tz):
+    # Language and timezone are activated per thread
+    translation.activate(language)
+    timezone.activate(tz)
+    try:
+        return widget.render()
+    finally:
+        translation.deactivate()
+        timezone.deactivate()
+        # Connections are per thread, do not keep it open in the pool
+        connection.close()
+
+class WidgetErrorBox(object):
+    """
+    Box shown in place of a widget failed to setup, in the page and from the widget url.
+    """
+    template = 'admin/widgets/error.html'
+
+    def __init__(self, dashboard, user_widget, error):
+        self.dashboard = dashboard
+        self.id = user_widget.id
+        self.title = user_widget.get_value().get('title') or user_widget.widget_type
+        if isinstance(error, PermissionDenied):
+            self.message = _('You do not have permission to view this widget.')
+        else:
+            self.message = _('This widget failed to load.')
+        self.rendered = None
+
+    @property
+    def widget(self):
+        if self.rendered is None:
+            self.rendered = self.render()
+        return self.rendered
+
+    def render(self):
+        return loader.render_to_string(self.template, {'widget_id': self.id, 'widget_title': self.title, \
+            'message': self.message}, context_instance=RequestContext(self.dashboard.request))
+
+    def get_media(self):
+        return forms.Media()
+
 class Dashboard(CommAdminView):
 
     widgets = []
     title = "Dashboard"
     icon = None
 
+    # None to render widgets one by one in the request, 'thread' to render them on a
+    # thread pool of at most ``widget_render_workers`` threads for the request. A widget
+    # not rendered in ``widget_render_timeout`` seconds is shown as a placeholder.
+    # 'ajax' renders only the frames of widgets, they are loaded by the page from the
+    # widget url.
+    widget_render = None
+    widget_render_workers = 4
+    widget_render_timeout = 10
+
+    @classonlymethod
+    def setup_class(cls):
+        super(Dashboard, cls).setup_class()
+        # Cached widgets are expired by the objects saved of their models
+        for widget_class in widget_manager._widgets.values():
+            if widget_class.cache_timeout:
+                models = list(widget_class.cache_models)
+                if issubclass(widget_class, ModelBaseWidget):
+                    models.extend(cls.admin_site._registry.keys())
+                for model in models:
+                    connect_list_cache(model)
+
     def get_page_id(self):
         return self.request.path
 
     def get_portal_key(self):
         return "dashboard:%s:pos" % self.get_page_id()
 
+    def get_widget_url(self, widget_id):
+        return '%s?%s=%s' % (self.request.path, WIDGET_VAR, widget_id)
+
     @filter_hook
     def get_widget(self, widget_or_id, data=None):
         try:
@@ -448,22 +641,41 @@ class Dashboard(CommAdminView):
 
     @filter_hook
     def get_init_widget(self):
+        """
+        Create the default widgets of page in one insert, and save the portal position.
+        Widgets failed to setup for the user are deleted together.
+        """
+        page_id = self.get_page_id()
         portal = []
-        widgets = self.widgets
-        for col in widgets:
+        widgets = []
+        for col in self.widgets:
+            for opts in col:
+                widget = UserWidget(user=self.user, page_id=page_id, widget_type=opts['type'])
+                widget.set_value(opts)
+                widgets.append(widget)
+
+        if widgets:
+            user_widgets = UserWidget.objects.filter(user=self.user, page_id=page_id)
+            last_id = user_widgets.aggregate(last_id=models.Max('id'))['last_id'] or 0
+            UserWidget.objects.bulk_create(widgets)
+            # bulk_create does not set ids, load the widgets of user and page created
+            # after the last one in order
+            widgets = list(user_widgets.filter(id__gt=last_id).order_by('id')[:len(widgets)])
+
+        failed = []
+        for col in self.widgets:
             portal_col = []
             for opts in col:
+                widget = widgets.pop(0)
                 try:
-                    widget = UserWidget(user=self.user, page_id=self.get_page_id(), widget_type=opts['type'])
-                    widget.set_value(opts)
-                    widget.save()
                     portal_col.append(self.get_widget(widget))
                 except (PermissionDenied, WidgetDataError):
-                    widget.delete()
-                    continue
+                    failed.append(widget.id)
             portal.append(portal_col)
+        if failed:
+            UserWidget.objects.filter(id__in=failed).delete()
 
-        UserSettings(user=self.user, key="dashboard:%s:pos" % self.get_page_id(), \
+        UserSettings(user=self.user, key=self.get_portal_key(), \
             value='|'.join([','.join([str(w.id) for w in col]) for col in portal])).save()
 
         return portal
@@ -474,22 +686,62 @@ class Dashboard(CommAdminView):
         if len(portal_pos) and portal_pos[0].value:
             portal_pos = portal_pos[0].value
             widgets = []
+            # The portal position and the widgets are in two tables, they are loaded
+            # by two queries, the widgets of the page in one
             user_widgets = dict([(uw.id, uw) for uw in UserWidget.objects.filter(user=self.user, page_id=self.get_page_id())])
             for col in portal_pos.split('|'):
                 ws = []
                 for wid in col.split(','):
+                    widget = None
                     try:
                         widget = user_widgets.get(int(wid))
                         if widget:
                             ws.append(self.get_widget(widget))
                     except Exception, e:
-                        import logging
-                        logging.error(e,exc_info=True)
+                        logging.error(e, exc_info=True)
+                        if widget:
+                            ws.append(WidgetErrorBox(self, widget, e))
                 widgets.append(ws)
             return widgets
         else:
             return self.get_init_widget()
 
+    @filter_hook
+    def render_widgets(self, widgets):
+        """
+        Render the widgets on a thread pool of the request, and wait each of them till
+        the timeout, or render their frames only. Widgets rendered here are not rendered
+        again by the template.
+
+        Threads render copies of widgets, a widget timed out is still rendering on its
+        copy when the placeholder is made from the widget. The pool is closed after the
+        wait, its threads end when the widgets timed out are rendered, they never hold
+        up the widgets of other requests.
+        """
+        widgets = [w for w in widgets if not isinstance(w, WidgetErrorBox)]
+        if self.widget_render == 'ajax':
+            for widget in widgets:
+                widget.rendered = widget.render_placeholder( \
+                    u'<i class="icon icon-spinner icon-spin"></i> %s' % _('Loading...'), True)
+            return
+        if self.widget_render != 'thread' or len(widgets) < 2:
+            return
+        language, tz = translation.get_language(), timezone.get_current_timezone()
+        pool = ThreadPool(min(self.widget_render_workers, len(widgets)))
+        try:
+            results = [(w, pool.apply_async(_render_widget, (copy.copy(w), language, tz))) for w in widgets]
+
+            deadline = time.time() + self.widget_render_timeout
+            for widget, result in results:
+                try:
+                    widget.rendered = result.get(max(deadline - time.time(), 0))
+                except TimeoutError:
+                    logging.warning('Widget %s of %s is not rendered in %ss' % \
+                        (widget.id, self.get_page_id(), self.widget_render_timeout))
+                    widget.rendered = widget.render_placeholder(_('This widget is taking too long to load.'))
+        finally:
+            pool.close()
+
     @filter_hook
     def get_title(self):
         return self.title
@@ -503,9 +755,30 @@ class Dashboard(CommAdminView):
         context.update(new_context)
         return context
 
+    @filter_hook
+    def get_widget_response(self, widget_id):
+        """
+        Html of one widget of the page, used to load and refresh widgets on their own.
+        """
+        try:
+            user_widget = UserWidget.objects.get(user=self.user, page_id=self.get_page_id(), id=int(widget_id))
+        except (ValueError, UserWidget.DoesNotExist):
+            raise Http404
+        try:
+            widget = self.get_widget(user_widget)
+        except (PermissionDenied, WidgetDataError), e:
+            widget = WidgetErrorBox(self, user_widget, e)
+        if widget is None:
+            raise Http404
+        return HttpResponse(widget.widget)
+
     @never_cache
     def get(self, request):
+        if WIDGET_VAR in request.GET:
+            return self.get_widget_response(request.GET[WIDGET_VAR])
+
         self.widgets = self.get_widgets()
+        self.render_widgets([w for ws in self.widgets for w in ws])
         context = self.get_context()
         context.update({
             'icon': self.icon,
@@ -546,6 +819,6 @@ class Dashboard(CommAdminView):
         media.add_css({'screen': [self.static('exadmin/css/form.css'), self.static('exadmin/css/dashboard.css')]})
         for ws in self.widgets:
             for widget in ws:
-                media = media + widget.media()
+                media = media + widget.get_media()
         return media
         
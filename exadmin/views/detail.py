@@ -1,5 +1,3 @@
-import copy
-
 from django import forms
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import PermissionDenied, ObjectDoesNotExist
@@ -13,7 +11,7 @@ from django.utils.html import escape
 from django.utils.safestring import mark_safe
 from django.utils.translation import ugettext as _
 from django.utils.html import conditional_escape
-from exadmin.layout import FormHelper, Layout, Fieldset, Container, Column, Field
+from exadmin.layout import FormHelper, Layout, Fieldset, Container, Column, Field, copy_layout
 from exadmin.util import unquote, lookup_field, display_for_field, boolean_icon, label_for_field
 
 from base import ModelAdminView, filter_hook, csrf_protect_m
@@ -115,11 +113,16 @@ class DetailAdminView(ModelAdminView):
 
     @filter_hook
     def get_form_layout(self):
-        layout = copy.deepcopy(self.detail_layout or self.form_layout)
+        fields = self.form_obj.fields.keys()
+        return self.get_compiled_layout(('detail_layout', 'form_layout'), tuple(fields), \
+            lambda: self.compile_form_layout(fields))
+
+    def compile_form_layout(self, fields):
+        layout = copy_layout(self.detail_layout or self.form_layout)
 
         if layout is None:
             layout = Layout(Container(
-                    Fieldset("", *self.form_obj.fields.keys(), css_class="unsort no_title"), css_class="form-horizontal"
+                    Fieldset("", *fields, css_class="unsort no_title"), css_class="form-horizontal"
                     ))
         elif type(layout) in (list, tuple) and len(layout) > 0:
             if isinstance(layout[0], Column):
@@ -132,7 +135,7 @@ class DetailAdminView(ModelAdminView):
             if self.detail_show_all:
                 rendered_fields = [i[1] for i in layout.get_field_names()]
                 container = layout[0].fields
-                other_fieldset = Fieldset(_(u'Other Fields'), *[f for f in self.form_obj.fields.keys() if f not in rendered_fields])
+                other_fieldset = Fieldset(_(u'Other Fields'), *[f for f in fields if f not in rendered_fields])
 
                 if len(other_fieldset.fields):
                     if len(container) and isinstance(container[0], Column):
@@ -1,5 +1,3 @@
-import copy
-
 from django import forms
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import PermissionDenied
@@ -12,7 +10,7 @@ from django.utils.html import escape
 from django.template import loader
 from django.utils.translation import ugettext as _
 from exadmin import widgets
-from exadmin.layout import FormHelper, Layout, Fieldset, Container, Column, Field
+from exadmin.layout import FormHelper, Layout, Fieldset, Container, Column, Field, copy_layout
 from exadmin.util import unquote
 from exadmin.views.detail import DetailAdminUtil
 
@@ -50,12 +48,24 @@ class ReadOnlyField(Field):
             html += loader.render_to_string(self.template, {'field': field, 'result': result})
         return html
 
+def _form_key_value(value):
+    if isinstance(value, (list, tuple)):
+        return tuple([_form_key_value(v) for v in value])
+    if isinstance(value, dict):
+        return tuple(sorted([(k, _form_key_value(v)) for k, v in value.items()]))
+    # Callbacks are bound methods of the view
+    return getattr(value, 'im_func', value)
+
 class ModelFormAdminView(ModelAdminView):
     form = forms.ModelForm
     formfield_overrides = {}
     readonly_fields = ()
     style_fields = {}
     relfield_style = None
+    # Cache the form and formset classes made by factories in the site, the formfield
+    # callbacks then must depend on nothing of request but the active plugins and the
+    # permissions of user.
+    form_class_cache = False
 
     save_as = False
     save_on_top = False
@@ -133,6 +143,27 @@ class ModelFormAdminView(ModelAdminView):
     def valid_forms(self):
         return self.form_obj.is_valid()
 
+    def get_form_class(self, factory, *args, **kwargs):
+        """
+        Returns ``factory(*args, **kwargs)``. With ``form_class_cache`` the class is
+        made once for the view class, the factory args, the active plugins and the
+        permissions of user, until the registry of site is changed.
+        """
+        if not self.form_class_cache:
+            return factory(*args, **kwargs)
+
+        perms = self.user.is_superuser or frozenset(self.user.get_all_permissions())
+        key = (self.__class__, factory, args, tuple(sorted([(k, _form_key_value(v)) for k, v in kwargs.items()])), \
+            tuple(sorted(self._active_plugins)), perms)
+        try:
+            hash(key)
+        except TypeError:
+            return factory(*args, **kwargs)
+        cache = self.admin_site._form_class_cache
+        if key not in cache:
+            cache[key] = factory(*args, **kwargs)
+        return cache[key]
+
     @filter_hook
     def get_model_form(self, **kwargs):
         """
@@ -157,12 +188,16 @@ class ModelFormAdminView(ModelAdminView):
             "formfield_callback": self.formfield_for_dbfield,
         }
         defaults.update(kwargs)
-        return modelform_factory(self.model, **defaults)
+        return self.get_form_class(modelform_factory, self.model, **defaults)
 
     @filter_hook
     def get_form_layout(self):
-        layout = copy.deepcopy(self.form_layout)
         fields = self.form_obj.fields.keys() + list(self.get_readonly_fields())
+        return self.get_compiled_layout(('form_layout',), tuple(fields), \
+            lambda: self.compile_form_layout(fields))
+
+    def compile_form_layout(self, fields):
+        layout = copy_layout(self.form_layout)
 
         if layout is None:
             layout = Layout(Container(
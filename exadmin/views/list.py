@@ -1,16 +1,28 @@
+import base64
+import datetime
+import hashlib
+import uuid
+
+from django.core.cache import cache
 from django.core.exceptions import PermissionDenied, ObjectDoesNotExist
 from django.core.paginator import InvalidPage, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import Q, signals
+from django.db.models.query import prefetch_related_objects
+from django.db.models.sql.datastructures import EmptyResultSet
 from django.http import HttpResponseRedirect
 from django.template.response import SimpleTemplateResponse, TemplateResponse
 from django.utils.datastructures import SortedDict
+from django.utils.decorators import classonlymethod
 from django.utils.encoding import force_unicode, smart_unicode
+from django.utils import simplejson
 from django.utils.html import escape, conditional_escape
 from django.utils.safestring import mark_safe
 from django.utils.text import capfirst
 from django.utils.translation import ugettext as _
 
-from exadmin.util import lookup_field, display_for_field, label_for_field, boolean_icon
+from exadmin.util import label_for_field, boolean_icon, estimate_count, capped_count, get_field_formatter, quote
 
 from base import ModelAdminView, filter_hook, inclusion_tag, csrf_protect_m
 
@@ -18,15 +30,66 @@ from base import ModelAdminView, filter_hook, inclusion_tag, csrf_protect_m
 ALL_VAR = 'all'
 ORDER_VAR = 'o'
 PAGE_VAR = 'p'
+CURSOR_VAR = 'c'
 TO_FIELD_VAR = 't'
 COL_LIST_VAR = '_cols'
 ERROR_FLAG = 'e'
 
 DOT = '.'
 
+# Keyset pagination cursor directions
+CURSOR_NEXT = 'n'
+CURSOR_PREV = 'p'
+
 # Text to display within change-list table cells if the value is blank.
 EMPTY_CHANGELIST_VALUE = _('None')
 
+# List result cache settings
+LIST_CACHE_KEY = 'exadmin_list_%s'
+LIST_CACHE_VERSION_KEY = 'exadmin_list_version_%s_%s'
+LIST_CACHE_ATTRS = ('result_count', 'count_approximate', 'result_count_label', 'can_show_all', 'multi_page',
+    'has_more', 'has_prev', 'has_next', 'prev_cursor', 'next_cursor', '_full_result_count', 'full_count_approximate')
+
+_list_cache_models = set()
+
+def connect_list_cache(model):
+    """
+    Connect the handlers which expire the cached results of model when its objects are
+    saved or deleted. Views with caches connect their models in ``setup_class``, so the
+    handlers are connected in every process of site, not only the ones read a cache.
+    """
+    if model not in _list_cache_models:
+        _list_cache_models.add(model)
+        uid = 'exadmin_list_cache_%s_%s' % (model._meta.app_label, model._meta.module_name)
+        signals.post_save.connect(invalidate_list_cache, sender=model, dispatch_uid=uid)
+        signals.post_delete.connect(invalidate_list_cache, sender=model, dispatch_uid=uid)
+
+def get_list_cache_version(model):
+    """
+    Version of the cached list results of model, changed when any object of model
+    is saved or deleted, so all cached results of model are expired together.
+    """
+    key = LIST_CACHE_VERSION_KEY % (model._meta.app_label, model._meta.module_name)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex
+        cache.set(key, version, 30*24*3600)
+    connect_list_cache(model)
+    return version
+
+def invalidate_list_cache(sender, **kwargs):
+    cache.delete(LIST_CACHE_VERSION_KEY % (sender._meta.app_label, sender._meta.module_name))
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    """
+    Keeps the microseconds of datetime and time values, ``DjangoJSONEncoder`` cuts
+    them to milliseconds, then the seek predicate skips or repeats the rows.
+    """
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super(CursorJSONEncoder, self).default(o)
+
 class FakeMethodField(object):
     """
     This class used when a column is an model function, wrap function as a fake field to display in select columns.
@@ -38,41 +101,69 @@ class FakeMethodField(object):
         self.primary_key = False
 
 class ResultRow(dict):
-    pass
+    __slots__ = ('cells',)
+
+def _lazy_list(name):
+    """
+    List attribute of result item, allocated on first use, as most cells never
+    have wraps, buttons or menus.
+    """
+    def get(self):
+        value = getattr(self, name)
+        if value is None:
+            value = []
+            setattr(self, name, value)
+        return value
+
+    def set(self, value):
+        setattr(self, name, value)
+    return property(get, set)
 
 class ResultItem(object):
+    __slots__ = ('text', 'tag', 'allow_tags', 'is_display_link', 'row', 'field_name', 'field', 'attr', 'value',
+        'export', '_classes', '_wraps', '_tag_attrs', '_btns', '_menus', '_label', '_tagattrs')
 
     def __init__(self, field_name, row):
-        self.classes = []
         self.text = '&nbsp;'
-        self.wraps = []
         self.tag = 'td'
-        self.tag_attrs = []
         self.allow_tags = False
-        self.btns = []
-        self.menus = []
         self.is_display_link = False
         self.row = row
         self.field_name = field_name
         self.field = None
         self.attr = None
         self.value = None
+        self.export = False
+        self._classes = self._wraps = self._tag_attrs = self._btns = self._menus = None
+        self._label = self._tagattrs = None
+
+    classes = _lazy_list('_classes')
+    wraps = _lazy_list('_wraps')
+    tag_attrs = _lazy_list('_tag_attrs')
+    btns = _lazy_list('_btns')
+    menus = _lazy_list('_menus')
 
     @property
     def label(self):
-        text = mark_safe(self.text) if self.allow_tags else conditional_escape(self.text)
-        if force_unicode(text) == '':
-            text = mark_safe('&nbsp;')
-        for wrap in self.wraps:
-            text = mark_safe(wrap % text)
-        return text
+        # Made once, when the template reads it after plugins have changed the item
+        if self._label is None:
+            text = mark_safe(self.text) if self.allow_tags else conditional_escape(self.text)
+            if force_unicode(text) == '':
+                text = mark_safe('&nbsp;')
+            for wrap in self._wraps or ():
+                text = mark_safe(wrap % text)
+            self._label = text
+        return self._label
 
     @property
     def tagattrs(self):
-        return '%s%s' % ((self.tag_attrs and ' '.join(self.tag_attrs) or ''),\
-            (self.classes and ' class="%s"' % ' '.join(self.classes) or ''))
+        if self._tagattrs is None:
+            self._tagattrs = '%s%s' % ((self._tag_attrs and ' '.join(self._tag_attrs) or ''),\
+                (self._classes and ' class="%s"' % ' '.join(self._classes) or ''))
+        return self._tagattrs
 
 class ResultHeader(ResultItem):
+    __slots__ = ('sortable', 'sorted', 'ascending', 'sort_priority', 'url_primary', 'url_remove', 'url_toggle')
 
     def __init__(self, field_name, row):
         super(ResultHeader, self).__init__(field_name, row)
@@ -94,16 +185,40 @@ class ListAdminView(ModelAdminView):
     list_display = ('__str__',)
     list_display_links = ()
     list_select_related = False
+    # Load only the columns and relations the list uses, methods in list_display
+    # declare the fields they use by ``field_depends`` attribute.
+    list_projection = False
     list_per_page = 50
     list_max_show_all = 200
     list_exclude = ()
     search_fields = ()
     paginator_class = Paginator
+    _change_permission = None
+    # 'page' for offset pagination, 'keyset' for seek pagination by ordering fields
+    list_pagination = 'page'
+    # Count strategy of rows: 'exact', 'capped' (count up to list_count_cap rows),
+    # 'estimated' (from database statistics) or 'lazy' (full_result_count counted when used)
+    list_count = 'exact'
+    list_count_cap = 10000
+    # Seconds to cache counts and the primary keys of pages, 0 for no cache. Cache is
+    # expired when objects of model saved or deleted, but not by queryset updates.
+    list_cache_timeout = 0
+    # Set for views of partial lists, made with an allowlist of plugins by
+    # ``admin_site.get_view_class(ListAdminView, option_class, list_partial=True,
+    # plugin_classes=[...])`` and read by ``get_partial_results``. Plugins skip their
+    # interface parts for them.
+    list_partial = False
     ordering = None
 
     # Change list templates
     object_list_template = None
 
+    @classonlymethod
+    def setup_class(cls):
+        super(ListAdminView, cls).setup_class()
+        if cls.list_cache_timeout:
+            connect_list_cache(cls.model)
+
     def init_request(self, *args, **kwargs):
 
         if not self.has_view_permission():
@@ -115,12 +230,14 @@ class ListAdminView(ModelAdminView):
         self.lookup_opts = self.opts
         self.list_display = self.get_list_display()
         self.list_display_links = self.get_list_display_links()
+        self._cell_renders = {}
 
         # Get page number parameters from the query string.
         try:
             self.page_num = int(request.GET.get(PAGE_VAR, 0))
         except ValueError:
             self.page_num = 0
+        self.cursor = self.list_pagination == 'keyset' and self.decode_cursor(request.GET.get(CURSOR_VAR)) or None
 
         # Get params from request
         self.show_all = ALL_VAR in request.GET
@@ -129,6 +246,8 @@ class ListAdminView(ModelAdminView):
 
         if PAGE_VAR in self.params:
             del self.params[PAGE_VAR]
+        if CURSOR_VAR in self.params:
+            del self.params[CURSOR_VAR]
         if ERROR_FLAG in self.params:
             del self.params[ERROR_FLAG]
 
@@ -159,25 +278,63 @@ class ListAdminView(ModelAdminView):
         self.list_queryset = self.get_list_queryset()
         self.ordering_field_columns = self.get_ordering_field_columns()
         self.paginator = self.get_paginator()
+        self.keyset_fields = self.list_pagination == 'keyset' and self.get_keyset_fields() or None
+
+        cache_key = self.list_cache_timeout and self.get_list_cache_key()
+        if cache_key:
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return self.load_list_cache(cached)
+
+        response = self.paginate_result_list()
+        if cache_key and response is None:
+            cache.set(cache_key, self.dump_list_cache(), self.list_cache_timeout)
+        return response
+
+    def paginate_result_list(self):
+        # Later pages of keyset pagination show the count made for the first page,
+        # which the cursor carries, instead of counting again.
+        carried_count = self.keyset_fields and not self.show_all and self.cursor and self.cursor[2]
 
         # Get the number of objects, with admin filters applied.
-        self.result_count = self.paginator.count
+        if carried_count:
+            self.result_count, self.count_approximate = carried_count
+            self.paginator._count = self.result_count
+        elif self.list_count in ('exact', 'lazy'):
+            self.result_count, self.count_approximate = self.paginator.count, None
+        else:
+            self.result_count, self.count_approximate = self.get_count(self.list_queryset)
+            self.paginator._count = self.result_count
+        self.result_count_label = self.get_count_label(self.result_count, self.count_approximate)
 
         # Get the total number of objects, with no admin filters applied.
         # Perform a slight optimization: Check to see whether any filters were
         # given. If not, use paginator.hits to calculate the number of objects,
         # because we've already done paginator.hits and the value is cached.
         if not self.list_queryset.query.where:
-            self.full_result_count = self.result_count
-        else:
-            self.full_result_count = self.base_queryset.count()
+            self.full_result_count, self.full_count_approximate = self.result_count, self.count_approximate
+        elif self.list_count != 'lazy' and not carried_count:
+            self.full_result_count, self.full_count_approximate = self.get_count(self.base_queryset)
 
-        self.can_show_all = self.result_count <= self.list_max_show_all
+        self.can_show_all = self.result_count <= self.list_max_show_all and not self.count_approximate
         self.multi_page = self.result_count > self.list_per_page
 
         # Get the list of objects to display on this page.
         if (self.show_all and self.can_show_all) or not self.multi_page:
             self.result_list = self.list_queryset._clone()
+        elif self.keyset_fields:
+            self.result_list = self.get_keyset_result_list()
+            self.has_more = self.has_next
+            return
+        elif self.count_approximate:
+            # Pages past the approximate count may exist, so look one row ahead
+            # instead of validating the page number.
+            offset = self.list_per_page * self.page_num
+            result_list = list(self.list_queryset[offset:offset + self.list_per_page + 1])
+            self.result_list = result_list[:self.list_per_page]
+            self.has_more = len(result_list) > self.list_per_page
+            self.paginator._count = max(self.result_count, offset + len(result_list))
+            return
         else:
             try:
                 self.result_list = self.paginator.page(self.page_num+1).object_list
@@ -189,6 +346,94 @@ class ListAdminView(ModelAdminView):
                 return HttpResponseRedirect(self.request.path + '?' + ERROR_FLAG + '=1')
         self.has_more = self.result_count > (self.list_per_page * self.page_num + len(self.result_list))
 
+    @filter_hook
+    def get_list_cache_key(self):
+        """
+        Key of the cached result of list, made of the model, the page, and the sql of
+        ``list_queryset`` and of ``queryset()``, so every filter, search and ordering
+        applied by plugins and the rows scope of user are in the key.
+        """
+        key = (self.__class__.__name__, get_list_cache_version(self.model), self.get_query_sql(self.list_queryset), \
+            self.get_query_sql(self.base_queryset), self.page_num, self.show_all, self.request.GET.get(CURSOR_VAR), \
+            self.list_per_page)
+        return LIST_CACHE_KEY % hashlib.md5(repr(key)).hexdigest()
+
+    def get_query_sql(self, queryset):
+        try:
+            return queryset.query.get_compiler(queryset.db).as_sql()
+        except EmptyResultSet:
+            return None
+
+    def dump_list_cache(self):
+        data = dict([(attr, getattr(self, attr)) for attr in LIST_CACHE_ATTRS if attr in self.__dict__])
+        data['paginator_count'] = self.paginator._count
+        data['pks'] = [obj.pk for obj in self.result_list]
+        return data
+
+    def load_list_cache(self, data):
+        for attr in LIST_CACHE_ATTRS:
+            if attr in data:
+                setattr(self, attr, data[attr])
+        self.paginator._count = data['paginator_count']
+        self.result_list = self.get_result_list_by_pks(data['pks'])
+
+    @filter_hook
+    def get_result_list_by_pks(self, pks):
+        """
+        Fetch the cached page rows by primary keys only, in the cached order. Rows load
+        the same relations and columns as ``list_queryset``.
+        """
+        queryset = self.base_queryset.filter(pk__in=pks)
+        queryset.query.select_related = self.list_queryset.query.select_related
+        field_names, defer = self.list_queryset.query.deferred_loading
+        queryset.query.deferred_loading = (set(field_names), defer)
+        objs = dict([(obj.pk, obj) for obj in queryset])
+        return [objs[pk] for pk in pks if pk in objs]
+
+    def _get_full_result_count(self):
+        if not hasattr(self, '_full_result_count'):
+            self._full_result_count = self.base_queryset.count()
+        return self._full_result_count
+
+    def _set_full_result_count(self, count):
+        self._full_result_count = count
+
+    # Counted on first use if not set by make_result_list, for 'lazy' list_count
+    full_result_count = property(_get_full_result_count, _set_full_result_count)
+    full_count_approximate = None
+
+    @property
+    def full_result_count_label(self):
+        return self.get_count_label(self.full_result_count, self.full_count_approximate)
+
+    @filter_hook
+    def get_count(self, queryset):
+        """
+        Returns the rows number of queryset as ``list_count`` strategy and how it is
+        approximate: None for exact, 'capped' or 'estimated'. Estimated counts are
+        only used for tables bigger than ``list_count_cap``.
+        """
+        if self.list_count == 'estimated':
+            count = estimate_count(queryset)
+            if count is not None and count > self.list_count_cap:
+                return count, 'estimated'
+        if self.list_count in ('capped', 'estimated'):
+            count = capped_count(queryset, self.list_count_cap)
+            if count > self.list_count_cap:
+                return self.list_count_cap, 'capped'
+            return count, None
+        return queryset.count(), None
+
+    def get_count_label(self, count, approximate):
+        """
+        The text to display a count of ``get_count``, counts must be displayed by it.
+        """
+        if approximate == 'capped':
+            return u'%s+' % count
+        elif approximate == 'estimated':
+            return _(u'about %s') % count
+        return count
+
     @filter_hook
     def get_result_list(self):
         return self.make_result_list()
@@ -204,11 +449,20 @@ class ListAdminView(ModelAdminView):
         """
         # First, get queryset from base class.
         queryset = self.queryset()
+        ordering = self.get_ordering()
+
+        projection = self.list_projection and not queryset.query.select_related \
+            and self.get_list_projection(ordering) or None
+        if projection is not None:
+            related, fields = projection
+            if related:
+                queryset = queryset.select_related(*related)
+            queryset = queryset.only(*fields)
 
         # Use select_related() if one of the list_display options is a field
         # with a relationship and the provided queryset doesn't already have
         # select_related defined.
-        if not queryset.query.select_related:
+        elif not queryset.query.select_related:
             if self.list_select_related:
                 queryset = queryset.select_related()
             else:
@@ -223,11 +477,59 @@ class ListAdminView(ModelAdminView):
                             break
 
         # Then, set queryset ordering.
-        queryset = queryset.order_by(*self.get_ordering())
+        queryset = queryset.order_by(*ordering)
         
         # Return the queryset.
         return queryset
 
+    @filter_hook
+    def get_list_projection(self, ordering):
+        """
+        Returns the relation paths to select_related and the model fields to load for
+        list_display, list_display_links and ordering. Returns None if any column is
+        a method without ``field_depends``, as the fields it uses are unknown.
+        """
+        related, fields = set(), set([self.opts.pk.name])
+
+        def add_path(path, select=True):
+            model, parts = self.model, path.split('__')
+            for i, name in enumerate(parts):
+                try:
+                    field = model._meta.get_field(name)
+                except models.FieldDoesNotExist:
+                    return i > 0
+                if isinstance(field.rel, models.ManyToManyRel):
+                    # Many to many values are not loaded with the row
+                    break
+                if i == 0:
+                    fields.add(field.name)
+                if not field.rel or not select:
+                    break
+                related.add('__'.join(parts[:i+1]))
+                model = field.rel.to
+            return True
+
+        for field_name in list(self.list_display) + list(self.list_display_links):
+            if callable(field_name) or not add_path(field_name):
+                if callable(field_name):
+                    attr = field_name
+                elif field_name in ('__str__', '__unicode__'):
+                    attr = getattr(self.model, '__unicode__', None)
+                elif hasattr(self, field_name):
+                    attr = getattr(self, field_name)
+                else:
+                    attr = getattr(self.model, field_name, None)
+                depends = getattr(getattr(attr, 'fget', attr), 'field_depends', None)
+                if depends is None:
+                    return None
+                for path in depends:
+                    add_path(path)
+
+        for field_name in ordering:
+            add_path(field_name.lstrip('-'), False)
+
+        return sorted(related), sorted(fields)
+
     # List ordering
     def _get_default_ordering(self):
         ordering = []
@@ -335,6 +637,9 @@ class ListAdminView(ModelAdminView):
         """
         methods = []
         for name in dir(self):
+            # Properties are not columns, and may be costly such as full_result_count
+            if isinstance(getattr(self.__class__, name, None), property):
+                continue
             try:
                 if getattr(getattr(self, name), 'is_column', False):
                     methods.append((name, getattr(self, name)))
@@ -406,6 +711,139 @@ class ListAdminView(ModelAdminView):
     def get_paginator(self):
         return self.paginator_class(self.list_queryset, self.list_per_page, 0, True)
 
+    def encode_cursor(self, direction, fields, obj):
+        """
+        Cursor is the direction and the ordering values of the row which the page
+        seeks from, the field names are kept to ignore it when the ordering changed.
+        The count of rows is kept too, so the next pages do not count again.
+        """
+        values = dict([(name, self.get_keyset_value(obj, name)) for name, desc in fields])
+        data = {'values': values, 'count': [self.result_count, self.count_approximate]}
+        return direction + base64.urlsafe_b64encode(simplejson.dumps(data, cls=CursorJSONEncoder))
+
+    def decode_cursor(self, cursor):
+        """
+        Returns (direction, values, count) of cursor, count is None if not valid.
+        """
+        if not cursor or cursor[0] not in (CURSOR_NEXT, CURSOR_PREV):
+            return None
+        try:
+            data = simplejson.loads(base64.urlsafe_b64decode(str(cursor[1:])))
+        except (TypeError, ValueError):
+            return None
+        if type(data) is not dict or type(data.get('values')) is not dict:
+            return None
+        count = data.get('count')
+        if not (type(count) is list and len(count) == 2 and type(count[0]) in (int, long) and \
+                count[0] >= 0 and count[1] in (None, 'capped', 'estimated')):
+            count = None
+        return cursor[0], data['values'], count and tuple(count)
+
+    def get_keyset_fields(self):
+        """
+        Returns (field name, descending) pairs of the list ordering used by keyset
+        pagination, ended with the primary key which ``get_ordering`` guarantees.
+        Returns None if rows can not be sought by the ordering, when a field is
+        nullable, a relation or not a model field, then the list is paginated by
+        offset.
+        """
+        fields = []
+        pk_names = ('pk', self.opts.pk.name, self.opts.pk.attname)
+        for field in self.list_queryset.query.order_by:
+            desc = field.startswith('-')
+            field = field.lstrip('-')
+            if field in pk_names:
+                fields.append(('pk', desc))
+                break
+            if not self.is_keyset_field(field):
+                return None
+            fields.append((field, desc))
+        else:
+            fields.append(('pk', True))
+        return fields
+
+    def is_keyset_field(self, field_name):
+        # NULL values are not compared by the seek predicate, and a relation is ordered
+        # by the ordering of related model, not by the key the predicate compares
+        opts, field = self.opts, None
+        for name in field_name.split('__'):
+            if field is not None:
+                if not field.rel:
+                    return False
+                opts = field.rel.to._meta
+            try:
+                field = opts.get_field_by_name(name)[0]
+            except models.FieldDoesNotExist:
+                return False
+            if not isinstance(field, models.Field) or field.null:
+                return False
+        return not field.rel
+
+    def get_keyset_value(self, obj, field_name):
+        value = obj
+        for name in field_name.split('__'):
+            if value is None:
+                break
+            value = getattr(value, name)
+        if isinstance(value, models.Model):
+            value = value.pk
+        return value
+
+    def seek_queryset(self, queryset, fields, values, backward=False):
+        """
+        Filter the rows after the row of ``values`` in the order of keyset ``fields``,
+        or the rows before it if ``backward``.
+        """
+        seek = None
+        for i, (name, desc) in enumerate(fields):
+            q = Q(**{'%s__%s' % (name, desc != backward and 'lt' or 'gt'): values[name]})
+            for n, d in fields[:i]:
+                q &= Q(**{n: values[n]})
+            seek = q if seek is None else seek | q
+        return queryset.filter(seek)
+
+    @filter_hook
+    def get_keyset_result_list(self):
+        """
+        Get the rows of current page by seeking from the cursor row, so the cost
+        of a page does not depend on how deep it is.
+        """
+        fields = self.keyset_fields
+        queryset = self.list_queryset.order_by(*[(desc and '-' or '') + name for name, desc in fields])
+        direction, values = self.cursor and self.cursor[:2] or (CURSOR_NEXT, None)
+        backward = direction == CURSOR_PREV
+
+        if values is not None and set(values.keys()) == set([name for name, desc in fields]):
+            queryset = self.seek_queryset(queryset, fields, values, backward)
+        else:
+            values = None
+
+        if backward:
+            queryset = queryset.reverse()
+
+        result_list = list(queryset[:self.list_per_page + 1])
+        has_more = len(result_list) > self.list_per_page
+        result_list = result_list[:self.list_per_page]
+        if backward:
+            result_list.reverse()
+            self.has_prev, self.has_next = has_more, True
+        else:
+            self.has_prev, self.has_next = values is not None, has_more
+
+        if result_list:
+            self.prev_cursor = self.encode_cursor(CURSOR_PREV, fields, result_list[0])
+            self.next_cursor = self.encode_cursor(CURSOR_NEXT, fields, result_list[-1])
+        else:
+            self.has_prev = self.has_next = False
+        return result_list
+
+    @filter_hook
+    def get_cursor_link(self, label, cursor, classes=''):
+        if cursor is None:
+            return mark_safe(u'<span class="this-page%s">%s</span> ' % (classes, label))
+        return mark_safe(u'<a href="%s" class="%s">%s</a> ' % \
+            (escape(self.get_query_string({CURSOR_VAR: cursor or None, PAGE_VAR: None})), classes.strip(), label))
+
     @filter_hook
     def get_page_number(self, i):
         if i == DOT:
@@ -502,50 +940,98 @@ class ListAdminView(ModelAdminView):
         row.cells = [self.result_header(field_name, row) for field_name in self.list_display]
         return row
 
-    @filter_hook
-    def result_item(self, obj, field_name, row):
+    def get_column_render(self, field_name):
         """
-        Generates the actual list of data.
+        Compile the render of a column, which fills the cell item with the value of
+        object. Field lookup, display options and formatter of field type are resolved
+        once per request, not for every cell.
         """
-        item = ResultItem(field_name, row)
         try:
-            f, attr, value = lookup_field(field_name, obj, self)
-        except (AttributeError, ObjectDoesNotExist):
-            item.text = EMPTY_CHANGELIST_VALUE
-        else:
-            if f is None:
-                item.allow_tags = getattr(attr, 'allow_tags', False)
-                boolean = getattr(attr, 'boolean', False)
+            f = self.opts.get_field(field_name)
+        except models.FieldDoesNotExist:
+            f = None
+
+        if f is None:
+            if callable(field_name):
+                admin_attr = field_name
+            elif hasattr(self, field_name) and field_name not in ('__str__', '__unicode__'):
+                admin_attr = getattr(self, field_name)
+            else:
+                admin_attr = None
+            # Display options of model methods are read from the model class
+            options = admin_attr or getattr(self.model, field_name, None)
+            allow_tags = getattr(options, 'allow_tags', False)
+            boolean = getattr(options, 'boolean', False)
+
+            def render(item, obj):
+                if admin_attr is not None:
+                    attr, value = admin_attr, admin_attr(obj)
+                else:
+                    attr = getattr(obj, field_name)
+                    value = attr() if callable(attr) else attr
                 if boolean:
-                    item.allow_tags = True
                     item.text = boolean_icon(value)
+                elif isinstance(value, models.Manager):
+                    # Reverse relation column
+                    item.text = ', '.join([smart_unicode(o) for o in value.all()])
                 else:
                     item.text = smart_unicode(value)
-            else:
-                if isinstance(f.rel, models.ManyToOneRel):
-                    field_val = getattr(obj, f.name)
-                    if field_val is None:
-                        item.text = EMPTY_CHANGELIST_VALUE
-                    else:
-                        item.text = field_val
-                else:
-                    item.text = display_for_field(value, f)
-                if isinstance(f, models.DateField)\
-                or isinstance(f, models.TimeField)\
-                or isinstance(f, models.ForeignKey):
-                    item.classes.append('nowrap')
-
-            item.field = f
-            item.attr = attr
-            item.value = value
-
-        # If list_display_links not defined, add the link tag to the first field
-        if (item.row['is_display_first'] and not self.list_display_links) \
-            or field_name in self.list_display_links:
-            url = self.url_for_result(obj)
-            item.row['is_display_first'] = False
-            item.wraps.append(u'<a href="%s">%%s</a>' % url)
+                item.allow_tags = allow_tags or boolean
+                item.attr, item.value = attr, value
+            return render
+
+        classes = isinstance(f, (models.DateField, models.TimeField, models.ForeignKey)) and ['nowrap'] or []
+        if isinstance(f.rel, models.ManyToOneRel):
+            formatter = lambda value: EMPTY_CHANGELIST_VALUE if value is None else value
+        else:
+            formatter = get_field_formatter(f)
+
+        def render(item, obj):
+            value = getattr(obj, field_name)
+            item.text = formatter(value)
+            item.classes.extend(classes)
+            item.field, item.value = f, value
+        return render
+
+    def get_cell_render(self, field_name):
+        """
+        Compile the render of a list cell: the column render of ``get_column_render``,
+        and the link to object for the columns of ``list_display_links``, or for the
+        first column if it is empty.
+        """
+        render = self.get_column_render(field_name)
+        url_for_result = self.url_for_result
+
+        def render_value(item, obj):
+            try:
+                render(item, obj)
+            except (AttributeError, ObjectDoesNotExist):
+                item.text = EMPTY_CHANGELIST_VALUE
+
+        if field_name in self.list_display_links:
+            def render_cell(item, obj):
+                render_value(item, obj)
+                item.wraps.append(u'<a href="%s">%%s</a>' % url_for_result(obj))
+        elif not self.list_display_links:
+            def render_cell(item, obj):
+                render_value(item, obj)
+                if item.row['is_display_first']:
+                    item.row['is_display_first'] = False
+                    item.wraps.append(u'<a href="%s">%%s</a>' % url_for_result(obj))
+        else:
+            render_cell = render_value
+        return render_cell
 
+    @filter_hook
+    def result_item(self, obj, field_name, row):
+        """
+        Generates the actual list of data.
+        """
+        item = ResultItem(field_name, row)
+        render = self._cell_renders.get(field_name)
+        if render is None:
+            render = self._cell_renders[field_name] = self.get_cell_render(field_name)
+        render(item, obj)
         return item
 
     @filter_hook
@@ -556,19 +1042,109 @@ class ListAdminView(ModelAdminView):
         row.cells = [self.result_item(obj, field_name, row) for field_name in self.list_display]
         return row
 
+    @filter_hook
+    def get_prefetch_lookups(self):
+        """
+        Returns the relations of list_display to load for all rows of page at once:
+        many to many and reverse relation columns, foreign key columns not joined by
+        select_related, and the relations in ``field_depends`` of method columns.
+        """
+        opts = self.opts
+        select_related = self.list_queryset.query.select_related
+        reverse_names = [r.get_accessor_name() for r in \
+            opts.get_all_related_objects() + opts.get_all_related_many_to_many_objects()]
+
+        names = []
+        for field_name in self.list_display:
+            if callable(field_name):
+                attr = field_name
+            elif hasattr(self, field_name) and field_name not in reverse_names:
+                attr = getattr(self, field_name)
+            else:
+                attr = getattr(self.model, field_name, None)
+                names.append(field_name)
+            names.extend(getattr(getattr(attr, 'fget', attr), 'field_depends', ()))
+
+        lookups = []
+        for name in names:
+            name = name.split('__')[0]
+            if name in lookups:
+                continue
+            if name in reverse_names:
+                lookups.append(name)
+                continue
+            try:
+                field = opts.get_field(name)
+            except models.FieldDoesNotExist:
+                continue
+            if isinstance(field.rel, models.ManyToManyRel):
+                lookups.append(name)
+            elif isinstance(field.rel, models.ManyToOneRel):
+                # select_related() without fields only follows not null foreign keys
+                if not (select_related is True and not field.null or \
+                    isinstance(select_related, dict) and name in select_related):
+                    lookups.append(name)
+        return lookups
+
+    def prefetch_result_list(self):
+        lookups = self.get_prefetch_lookups()
+        result_list = list(self.result_list)
+        if lookups and result_list:
+            prefetch_related_objects(result_list, lookups)
+        return result_list
+
     @filter_hook
     def results(self):
         results = []
-        for obj in self.result_list:
+        for obj in self.prefetch_result_list():
             results.append(self.result_row(obj))
         return results
 
+    @filter_hook
+    def get_partial_results(self, fields, limit):
+        """
+        Returns the headers and rows of ``fields`` columns of the first ``limit`` rows,
+        and the label of rows count. Rows are loaded by one query of the used columns,
+        rows are not counted and headers have no sort menus.
+        """
+        self.list_display = list(fields)
+        self.list_display_links = self.list_display[:1]
+        self.list_projection = True
+
+        self.base_queryset = self.queryset()
+        self.list_queryset = self.get_list_queryset()
+        result_list = list(self.list_queryset[:limit + 1])
+        self.result_list = result_list[:limit]
+        self.result_count = len(self.result_list)
+        self.result_count_label = self.get_count_label(self.result_count, \
+            len(result_list) > limit and 'capped' or None)
+
+        row = ResultRow()
+        headers = []
+        for field_name in self.list_display:
+            item = ResultHeader(field_name, row)
+            item.text = label_for_field(field_name, self.model, model_admin=self)
+            headers.append(item)
+        return headers, self.results(), self.result_count_label
+
     @filter_hook
     def url_for_result(self, result):
-        if self.has_change_permission(result):
-            return self.model_admin_url("change", getattr(result, self.pk_attname))
+        pk = quote(getattr(result, self.pk_attname))
+        if self.has_result_change_permission(result):
+            return self.model_admin_url("change", pk)
         else:
-            return self.model_admin_url("detail", getattr(result, self.pk_attname))
+            return self.model_admin_url("detail", pk)
+
+    def has_result_change_permission(self, obj):
+        """
+        Check the change permission of a result row. The model permission is checked
+        once for all rows, unless the admin options check it for each object.
+        """
+        if self.has_change_permission.im_func is not ModelAdminView.has_change_permission.im_func:
+            return self.has_change_permission(obj)
+        if self._change_permission is None:
+            self._change_permission = self.has_change_permission()
+        return self._change_permission
 
     # Media
     @filter_hook
@@ -588,6 +1164,11 @@ class ListAdminView(ModelAdminView):
         pagination_required = (not self.show_all or not self.can_show_all) and self.multi_page
         if not pagination_required:
             page_range = []
+        elif self.keyset_fields:
+            # Only links next to current page, without the page numbers
+            page_range = [self.get_cursor_link(_('First'), self.has_prev and '' or None),
+                self.get_cursor_link(_('Previous'), self.has_prev and self.prev_cursor or None, ' prev'),
+                self.get_cursor_link(_('Next'), self.has_next and self.next_cursor or None, ' next')]
         else:
             ON_EACH_SIDE = {'normal': 5, 'small': 3}.get(page_type, 3)
             ON_ENDS = 2
@@ -619,7 +1200,7 @@ class ListAdminView(ModelAdminView):
             'cl': self,
             'pagination_required': pagination_required,
             'show_all_url': need_show_all_link and self.get_query_string({ALL_VAR: ''}),
-            'page_range': map(self.get_page_number, page_range),
+            'page_range': self.keyset_fields and page_range or map(self.get_page_number, page_range),
             'ALL_VAR': ALL_VAR,
             '1': 1,
         }
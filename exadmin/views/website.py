@@ -3,9 +3,11 @@ from django.contrib.auth import REDIRECT_FIELD_NAME
 from django.views.decorators.cache import never_cache
 from django.contrib.auth.views import login
 from django.contrib.auth.views import logout
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
 from django.http import HttpResponse
 
-from base import BaseAdminView
+from base import BaseAdminView, PROFILE_CACHE_KEY
 from dashboard import Dashboard
 from exadmin.forms import AdminAuthenticationForm
 from exadmin.models import UserSettings
@@ -69,4 +71,20 @@ class LogoutView(BaseAdminView):
         return self.get(request)
 
 
-        
\ No newline at end of file
+        
+
+class ProfileView(BaseAdminView):
+    """
+    Return the hook profiles of latest requests of current user as json, profiles are
+    recorded by views which ``enable_profile``.
+    """
+
+    def init_request(self, *args, **kwargs):
+        if not self.user.is_superuser:
+            raise PermissionDenied
+        if self.profiler is not None:
+            self.profiler.discard = True
+
+    @never_cache
+    def get(self, request, *args, **kwargs):
+        return self.render_response(cache.get(PROFILE_CACHE_KEY % self.user.pk) or [])